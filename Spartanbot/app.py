@@ -1,8 +1,14 @@
 import os
+import logging
 from flask import Flask, render_template, redirect, url_for, flash
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 
+from database import init_database
+import migrations
+
+logger = logging.getLogger(__name__)
+
 class Base(DeclarativeBase):
     pass
 
@@ -10,18 +16,19 @@ db = SQLAlchemy(model_class=Base)
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
 
-# Configure database
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///instance/warzone_teams.db"
-
-# Initialize the app with the extension
-db.init_app(app)
+# Configure the database from DATABASE_URL (SQLite in the instance folder by default)
+init_database(app, db)
 
 # Import models
-from models import User, Team, TeamMember
+from models import User, Team, TeamMember, GuildMember, Tournament, TournamentEntry, BracketMatch
 
-# Create tables
+# Bring the schema up to date with the same migrations the bot runs
 with app.app_context():
-    db.create_all()
+    if os.getenv("DB_AUTO_MIGRATE", "1") == "1":
+        migrations.upgrade(db.engine, db.metadata)
+    else:
+        for version, name in migrations.pending(db.engine):
+            logger.warning(f"⚠️ Migración pendiente: {name}")
 
 @app.route('/')
 def index():
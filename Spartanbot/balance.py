@@ -0,0 +1,52 @@
+import numpy as np
+
+
+def balanced_teams(kd_ratios, team_size, max_swaps=1000):
+    """Split players into teams of team_size with K/D sums as even as possible.
+
+    Players are placed greedily (strongest first, each into the weakest team
+    that still has room) and the result is refined by swapping players between
+    the strongest and the weakest team while that narrows the gap. Every
+    accepted swap strictly lowers the sum of squared team totals, so the loop
+    always terminates.
+
+    Returns (teams, bench) as lists of indices into kd_ratios. Only complete
+    teams are formed; players beyond the last one, in registration order, go
+    to the bench.
+    """
+    kd = np.asarray(kd_ratios, dtype=float)
+    team_count = len(kd) // team_size
+    playing = team_count * team_size
+    bench = list(range(playing, len(kd)))
+    if team_count == 0:
+        return [], bench
+    kd = kd[:playing]
+
+    assignment = np.empty((team_count, team_size), dtype=int)
+    sums = np.zeros(team_count)
+    filled = np.zeros(team_count, dtype=int)
+    for player in np.argsort(-kd, kind='stable'):
+        team = int(np.argmin(np.where(filled < team_size, sums, np.inf)))
+        assignment[team, filled[team]] = player
+        filled[team] += 1
+        sums[team] += kd[player]
+
+    for _ in range(max_swaps):
+        high, low = int(np.argmax(sums)), int(np.argmin(sums))
+        gap = sums[high] - sums[low]
+        if gap <= 1e-9:
+            break
+
+        # Swapping players i (strong team) and j (weak team) moves delta[i, j]
+        # of K/D across; it helps when 0 < delta < gap and is best near gap / 2
+        delta = kd[assignment[high]][:, None] - kd[assignment[low]][None, :]
+        score = np.where((delta > 1e-9) & (delta < gap - 1e-9), np.abs(gap / 2 - delta), np.inf)
+        i, j = np.unravel_index(np.argmin(score), score.shape)
+        if not np.isfinite(score[i, j]):
+            break
+
+        assignment[high, i], assignment[low, j] = assignment[low, j], assignment[high, i]
+        sums[high] -= delta[i, j]
+        sums[low] += delta[i, j]
+
+    return [sorted(team.tolist()) for team in assignment], bench
@@ -0,0 +1,533 @@
+"""In-process load benchmark of the bot's hottest handlers.
+
+Drives the real handlers with fake interactions against a throwaway SQLite
+database, no Discord connection needed:
+
+    python benchmark.py --players 1000
+    python benchmark.py --players 1000 --json results.json
+    python benchmark.py --players 1000 --baseline results.json
+    python benchmark.py --memory 50000
+
+Each operation is run for every player at once (or --concurrency at a time)
+and reported with its throughput, p50/p95/p99 latency and database queries
+per operation. With --baseline the run fails if an operation got slower or
+needs more queries than in a previous --json run.
+
+--memory loads a synthetic guild of that many members once with the default
+member cache and once with LOW_MEMORY=1, each in its own process, and reports
+the figures /status/memory would show after startup.
+"""
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import logging
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+# main reads its configuration at import time, so the environment is set up
+# first: the benchmark never touches the bot's real database
+BENCH_DIR = tempfile.mkdtemp(prefix="spartanbot-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(BENCH_DIR, 'bench.db')}"
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ["COMMAND_FINGERPRINT_FILE"] = os.path.join(BENCH_DIR, "command_tree.sha256")
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+import discord
+from discord import app_commands
+from sqlalchemy import event
+
+import main
+
+GUILD_ID = 1100000000000000000
+CHANNEL_ID = 1100000000000000001
+BASE_USER_ID = 1200000000000000000
+
+_ids = itertools.count(1)
+
+
+def next_id():
+    """Snowflake-like ID created now, unique within the run"""
+    return discord.utils.time_snowflake(discord.utils.utcnow()) + next(_ids) % 4096
+
+
+class QueryCounter:
+    """Counts the SQL statements sent by the repository's engine"""
+
+    def __init__(self, engine):
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, 'before_cursor_execute', self._executed)
+
+    def _executed(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+class FakeUser:
+    def __init__(self, user_id, name):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.discriminator = "0"
+        self.mention = f"<@{user_id}>"
+        self.voice = None
+        self.mutual_guilds = []
+
+    # Discord users compare by ID
+    def __eq__(self, other):
+        return isinstance(other, FakeUser) and other.id == self.id
+
+    def __hash__(self):
+        return self.id >> 22
+
+
+class FakeMessage:
+    def __init__(self, api_latency, embed=None, view=None):
+        self.id = next_id()
+        self.channel = SimpleNamespace(id=CHANNEL_ID)
+        self.embeds = [embed] if embed is not None else []
+        self.view = view
+        self.edits = 0
+        self._api_latency = api_latency
+
+    @property
+    def components(self):
+        return [SimpleNamespace(children=list(self.view.children))] if self.view is not None else []
+
+    async def edit(self, embed=None, view=None, **kwargs):
+        await asyncio.sleep(self._api_latency)
+        if embed is not None:
+            self.embeds = [embed]
+        if view is not None:
+            self.view = view
+        self.edits += 1
+        return self
+
+    async def delete(self, delay=None):
+        await asyncio.sleep(self._api_latency)
+
+
+class FakeResponse:
+    """InteractionResponse that records what the handler answered"""
+
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._done = False
+        self.modal = None
+
+    def is_done(self):
+        return self._done
+
+    async def _respond(self):
+        if self._done:
+            raise discord.InteractionResponded(self._interaction)
+        self._done = True
+        await asyncio.sleep(self._interaction.api_latency)
+
+    async def defer(self, *, ephemeral=False, thinking=False):
+        await self._respond()
+
+    async def send_message(self, content=None, *, embed=None, view=None, **kwargs):
+        await self._respond()
+        message = FakeMessage(self._interaction.api_latency, embed, view)
+        self._interaction.replies.append((content, message))
+        return SimpleNamespace(message_id=message.id, resource=message)
+
+    async def edit_message(self, **kwargs):
+        await self._respond()
+
+    async def send_modal(self, modal):
+        await self._respond()
+        self.modal = modal
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def send(self, content=discord.utils.MISSING, *, embed=None, view=None, **kwargs):
+        await asyncio.sleep(self._interaction.api_latency)
+        message = FakeMessage(self._interaction.api_latency, embed, view)
+        self._interaction.replies.append((content or None, message))
+        return message
+
+
+class FakeInteraction(discord.Interaction):
+    """Just enough of a discord.Interaction for the handlers and the acknowledgement pipeline"""
+
+    def __init__(self, user, kind, message=None, api_latency=0.0):
+        self.id = next_id()
+        self.type = kind
+        self.user = user
+        self.message = message
+        self.guild_id = GUILD_ID
+        self.channel = SimpleNamespace(id=CHANNEL_ID)
+        self.api_latency = api_latency
+        self.replies = []  # (content, FakeMessage) of every response and follow-up
+        self._fake_response = FakeResponse(self)
+        self._fake_followup = FakeFollowup(self)
+
+    @property
+    def response(self):
+        return self._fake_response
+
+    @property
+    def followup(self):
+        return self._fake_followup
+
+    @property
+    def guild(self):
+        return None
+
+    async def edit_original_response(self, **kwargs):
+        await asyncio.sleep(self.api_latency)
+
+    async def delete_original_response(self):
+        await asyncio.sleep(self.api_latency)
+
+    def rejected(self):
+        """Whether the handler answered with a warning or error instead of doing the work"""
+        return any(content and content.startswith(("⚠️", "❌")) for content, _ in self.replies)
+
+
+class Result:
+    def __init__(self, name, latencies, elapsed, queries, errors, rejected):
+        self.name = name
+        self.latencies = sorted(latencies)
+        self.elapsed = elapsed
+        self.queries = queries
+        self.errors = errors
+        self.rejected = rejected
+
+    def percentile(self, q):
+        if not self.latencies:
+            return 0.0
+        return self.latencies[max(0, math.ceil(q * len(self.latencies)) - 1)]
+
+    def to_dict(self):
+        count = len(self.latencies)
+        return {
+            "operations": count,
+            "throughput": round(count / self.elapsed, 1) if self.elapsed else 0.0,
+            "p50_ms": round(self.percentile(0.50) * 1000, 2),
+            "p95_ms": round(self.percentile(0.95) * 1000, 2),
+            "p99_ms": round(self.percentile(0.99) * 1000, 2),
+            "max_ms": round(self.percentile(1.0) * 1000, 2),
+            "queries_per_op": round(self.queries / count, 2) if count else 0.0,
+            "errors": self.errors,
+            "rejected": self.rejected
+        }
+
+
+class Benchmark:
+    def __init__(self, players, concurrency, api_latency):
+        self.users = [FakeUser(BASE_USER_ID + i, f"bench{i}") for i in range(players)]
+        self.concurrency = concurrency or players
+        self.api_latency = api_latency
+        self.queries = QueryCounter(main.repository.engine)
+        self.teams = {}  # owner ID -> (TeamFinderView, FakeMessage)
+        self.dms = 0
+
+    def interaction(self, user, kind, message=None):
+        return FakeInteraction(user, kind, message, self.api_latency)
+
+    async def measure(self, name, operations):
+        """Run the operation coroutine functions concurrently and time each one"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        latencies = []
+        outcomes = []
+
+        async def timed(operation):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    outcomes.append(await operation())
+                except Exception as e:
+                    outcomes.append(e)
+                latencies.append(time.perf_counter() - started)
+
+        queries = self.queries.count
+        started = time.perf_counter()
+        await asyncio.gather(*(timed(operation) for operation in operations))
+        elapsed = time.perf_counter() - started
+
+        # Coalesced embed edits run after the handlers return, their queries belong to this operation
+        await main.edit_scheduler.drain(timeout=60)
+        await main.outbound.drain(timeout=60)
+
+        errors = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+        if errors:
+            print(f"⚠️ {name}: {len(errors)} errores, el primero: {errors[0]!r}", file=sys.stderr)
+        rejected = sum(1 for outcome in outcomes if isinstance(outcome, FakeInteraction) and outcome.rejected())
+        return Result(name, latencies, elapsed, self.queries.count - queries, len(errors), rejected)
+
+    async def register(self, index, user):
+        modal = main.RegistrationModal()
+        modal.activision_id._value = f"Bench{index}#{1000 + index}"
+        modal.kd_ratio._value = f"{0.5 + (index % 20) / 10:.1f}"
+        interaction = self.interaction(user, discord.InteractionType.modal_submit)
+        await modal.on_submit(interaction)
+        return interaction
+
+    async def search(self, user):
+        interaction = self.interaction(user, discord.InteractionType.application_command)
+        await main.buscar_equipo.callback(
+            interaction,
+            plataforma=app_commands.Choice(name="PC", value="PC"),
+            modo=main.SEARCH_MODE_CHOICES[0],
+            kd_minimo=0.0,
+            max_jugadores=app_commands.Choice(name="Squad (4)", value=4)
+        )
+        for _, message in interaction.replies:
+            if isinstance(message.view, main.TeamFinderView):
+                self.teams[user.id] = (message.view, message)
+        return interaction
+
+    async def join(self, user, owner):
+        view, message = self.teams[owner.id]
+        interaction = self.interaction(user, discord.InteractionType.component, message)
+        await view.join_team.callback(interaction)
+        return interaction
+
+    async def register_private(self, view, message, user):
+        interaction = self.interaction(user, discord.InteractionType.component, message)
+        await view.register.callback(interaction)
+        return interaction
+
+    async def register_tournament(self, index, view, message, user):
+        # The button only opens the modal, the entry is created when it is submitted
+        interaction = self.interaction(user, discord.InteractionType.component, message)
+        await view.register_team.callback(interaction)
+        modal = interaction.response.modal
+        modal.team_name._value = f"Bench Team {index}"
+        submit = self.interaction(user, discord.InteractionType.modal_submit, message)
+        await modal.on_submit(submit)
+        return submit
+
+    async def run(self):
+        async def send_dm(user_id, content):
+            await asyncio.sleep(self.api_latency)
+            self.dms += 1
+        main.send_dm = send_dm
+
+        users = self.users
+        results = [await self.measure("registrar", [
+            lambda i=i, user=user: self.register(i, user) for i, user in enumerate(users)
+        ])]
+        results.append(await self.measure("buscar_equipo", [
+            lambda user=user: self.search(user) for user in users
+        ]))
+        # Every player joins the next player's team, so each team gets one join
+        results.append(await self.measure("unirse", [
+            lambda user=user, owner=users[(i + 1) % len(users)]: self.join(user, owner)
+            for i, user in enumerate(users)
+        ]))
+
+        # Everyone signs up to the same private match and tournament: the worst case for one message
+        embed = discord.Embed(title="🎮 Partida Privada")
+        embed.add_field(name="✅ Jugadores Inscritos", value="0", inline=False)
+        private_view = main.PrivateMatchView(f"bench_{next_id()}", 4, embed)
+        private_message = FakeMessage(self.api_latency, embed, private_view)
+        results.append(await self.measure("partida_privada", [
+            lambda user=user: self.register_private(private_view, private_message, user) for user in users
+        ]))
+
+        tournament = await main.repository.create_tournament(
+            users[0].id, "Battle Royale", 4, "Benchmark", "single", guild_id=GUILD_ID, channel_id=CHANNEL_ID
+        )
+        embed = discord.Embed(title="🏆 Torneo")
+        embed.add_field(name="✅ Equipos Inscritos", value="0", inline=False)
+        tournament_view = main.TournamentView(tournament.id, users[0].id, 4)
+        tournament_message = FakeMessage(self.api_latency, embed, tournament_view)
+        results.append(await self.measure("torneo", [
+            lambda i=i, user=user: self.register_tournament(i, tournament_view, tournament_message, user)
+            for i, user in enumerate(users)
+        ]))
+
+        await main.outbound.stop()
+        return results
+
+
+def print_results(results, players, concurrency, api_latency):
+    print(
+        f"\n{players} jugadores · concurrencia {concurrency or players} · "
+        f"latencia API simulada {api_latency * 1000:.0f} ms · DB_MAX_WORKERS={main.repository._executor._max_workers}\n"
+    )
+    header = f"{'operación':<16}{'ops':>7}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'queries/op':>12}{'errores':>9}{'rechazos':>10}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        row = result.to_dict()
+        print(
+            f"{result.name:<16}{row['operations']:>7}{row['throughput']:>10}{row['p50_ms']:>10}"
+            f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}{row['queries_per_op']:>12}"
+            f"{row['errors']:>9}{row['rejected']:>10}"
+        )
+    print()
+
+
+# Shares of a synthetic guild's members sent with a presence, and playing Warzone
+ONLINE_SHARE = 0.25
+PLAYING_SHARE = 0.05
+
+
+def load_guild(members):
+    """Feed the bot a guild the way the gateway does at startup, returns the guild.
+
+    By default the guild is chunked: every member arrives with the online ones'
+    presences and is cached, then /jugadores is indexed from the cache. With
+    LOW_MEMORY only the GUILD_CREATE is processed, and /jugadores is filled
+    from the raw presence updates of the members who are playing.
+    """
+    state = main.bot._connection
+    guild = state._add_guild_from_data({
+        'id': str(GUILD_ID), 'name': "Benchmark", 'member_count': members, 'large': True,
+        'roles': [], 'channels': [], 'emojis': [], 'stickers': [], 'features': []
+    })
+
+    online = int(members * ONLINE_SHARE)
+    playing = int(members * PLAYING_SHARE)
+    for i in range(members):
+        user = {
+            'id': str(BASE_USER_ID + i), 'username': f"jugador{i}", 'discriminator': "0",
+            'global_name': f"Jugador {i}", 'avatar': None
+        }
+        presence = {
+            'user': {'id': user['id']}, 'guild_id': str(GUILD_ID), 'status': "online", 'client_status': {},
+            'activities': [{'name': "Call of Duty®: Warzone™", 'type': 0}] if i < playing else []
+        }
+        if state.member_cache_flags.joined:
+            data = {'user': user, 'roles': [], 'joined_at': "2024-01-01T00:00:00+00:00", 'deaf': False, 'mute': False, 'flags': 0}
+            member = discord.Member(data=data, guild=guild, state=state)
+            if i < online:
+                member._presence_update(discord.RawPresenceUpdateEvent(data=presence, state=state), user)
+            guild._add_member(member)
+        elif i < playing and main.JUGADORES_ENABLED:
+            raw = discord.RawPresenceUpdateEvent(data=presence, state=state)
+            main.presence_index.update(raw.guild_id, raw.user_id, raw.activities)
+
+    if state.member_cache_flags.joined and main.JUGADORES_ENABLED:
+        main.presence_index.rebuild(guild)
+    return guild
+
+
+def measure_memory(members):
+    """/status/memory figures after loading a guild of members, plus the RSS it added"""
+    gc.collect()
+    before = main.memory_stats()['rss_kb']
+    load_guild(members)
+    gc.collect()
+    stats = main.memory_stats()
+    return {
+        "low_memory": stats["low_memory"],
+        "members": members,
+        "rss_kb": stats["rss_kb"],
+        "rss_added_kb": stats["rss_kb"] - before,
+        "cached_members": stats["cached_members"],
+        "cached_users": stats["cached_users"],
+        "indexed_players": sum(main.presence_index.counts(GUILD_ID).values())
+    }
+
+
+def compare_memory(members):
+    """Run measure_memory in a fresh process per mode and print both"""
+    rows = []
+    for low_memory in ("0", "1"):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--memory-once", str(members)],
+            env={**os.environ, "LOW_MEMORY": low_memory}, capture_output=True, text=True, check=True
+        ).stdout
+        rows.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"\nGremio sintético de {members} miembros · {ONLINE_SHARE:.0%} conectados · {PLAYING_SHARE:.0%} jugando\n")
+    header = f"{'modo':<14}{'rss_kb':>10}{'rss añadido':>14}{'cached_members':>16}{'cached_users':>14}{'jugadores':>11}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(
+            f"{'LOW_MEMORY=1' if row['low_memory'] else 'por defecto':<14}{row['rss_kb']:>10}"
+            f"{row['rss_added_kb']:>14}{row['cached_members']:>16}{row['cached_users']:>14}{row['indexed_players']:>11}"
+        )
+    print()
+    return rows
+
+
+def regressions(current, baseline, tolerance):
+    """Descriptions of the operations that are slower or need more queries than in baseline"""
+    found = []
+    for name, row in current.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if row["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            found.append(f"{name}: p95 {before['p95_ms']} ms -> {row['p95_ms']} ms")
+        if row["throughput"] < before["throughput"] * (1 - tolerance):
+            found.append(f"{name}: {before['throughput']} ops/s -> {row['throughput']} ops/s")
+        if row["queries_per_op"] > before["queries_per_op"]:
+            found.append(f"{name}: {before['queries_per_op']} -> {row['queries_per_op']} queries/op")
+        if row["errors"] > before["errors"]:
+            found.append(f"{name}: {before['errors']} -> {row['errors']} errores")
+    return found
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de carga de los handlers del bot")
+    parser.add_argument("--players", type=int, default=1000, help="Jugadores simulados, una operación de cada tipo por jugador")
+    parser.add_argument("--concurrency", type=int, default=0, help="Operaciones simultáneas (por defecto todas a la vez)")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Milisegundos que tarda cada llamada simulada a Discord")
+    parser.add_argument("--json", help="Guarda los resultados en este fichero")
+    parser.add_argument("--baseline", help="Resultados de --json con los que comparar")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Empeoramiento de p95 y ops/s tolerado frente a --baseline")
+    parser.add_argument("--memory", type=int, help="Compara la memoria de ambos modos con un gremio de tantos miembros")
+    parser.add_argument("--memory-once", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def run():
+    args = parse_args()
+    if args.memory or args.memory_once:
+        try:
+            if args.memory_once:
+                print(json.dumps(measure_memory(args.memory_once)))
+            else:
+                compare_memory(args.memory)
+        finally:
+            main.repository.shutdown()
+            shutil.rmtree(BENCH_DIR, ignore_errors=True)
+        return
+
+    api_latency = args.api_latency / 1000
+    try:
+        results = asyncio.run(Benchmark(args.players, args.concurrency, api_latency).run())
+    finally:
+        main.repository.shutdown()
+        shutil.rmtree(BENCH_DIR, ignore_errors=True)
+
+    print_results(results, args.players, args.concurrency, api_latency)
+    current = {result.name: result.to_dict() for result in results}
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(current, file, indent=2)
+
+    failed = any(result.errors for result in results)
+    if args.baseline:
+        with open(args.baseline) as file:
+            found = regressions(current, json.load(file), args.tolerance)
+        for regression in found:
+            print(f"❌ Regresión en {regression}")
+        failed = failed or bool(found)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    run()
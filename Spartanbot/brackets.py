@@ -0,0 +1,215 @@
+BYE = 0  # Slot value for an empty seat; real entries are positive IDs
+
+WINNERS = 'W'
+LOSERS = 'L'
+GRAND_FINAL = 'F'
+
+
+def seed_order(size):
+    """Seeds (1-based) in bracket order so that seed 1 and 2 can only meet in the final"""
+    order = [1, 2]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [seed for s in order for seed in (s, total - s)]
+    return order[:size]
+
+
+class Match:
+    """One bracket match. winner_to/loser_to are (match number, slot) or None"""
+
+    __slots__ = ('number', 'bracket', 'round', 'position', 'slots', 'winner', 'loser',
+                 'winner_to', 'loser_to')
+
+    def __init__(self, number, bracket, round, position, slots=None, winner=None, loser=None,
+                 winner_to=None, loser_to=None):
+        self.number = number
+        self.bracket = bracket
+        self.round = round
+        self.position = position
+        self.slots = list(slots) if slots else [None, None]
+        self.winner = winner
+        self.loser = loser
+        self.winner_to = winner_to
+        self.loser_to = loser_to
+
+    @property
+    def playable(self):
+        """Both entries known and the result not reported yet"""
+        return self.winner is None and all(slot not in (None, BYE) for slot in self.slots)
+
+    def to_record(self):
+        """Column values used to persist the match"""
+        return {
+            'number': self.number,
+            'bracket': self.bracket,
+            'round': self.round,
+            'position': self.position,
+            'slot1': self.slots[0],
+            'slot2': self.slots[1],
+            'winner': self.winner,
+            'loser': self.loser,
+            'winner_to': self.winner_to[0] if self.winner_to else None,
+            'winner_to_slot': self.winner_to[1] if self.winner_to else None,
+            'loser_to': self.loser_to[0] if self.loser_to else None,
+            'loser_to_slot': self.loser_to[1] if self.loser_to else None
+        }
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(
+            record.number, record.bracket, record.round, record.position,
+            slots=[record.slot1, record.slot2],
+            winner=record.winner,
+            loser=record.loser,
+            winner_to=(record.winner_to, record.winner_to_slot) if record.winner_to else None,
+            loser_to=(record.loser_to, record.loser_to_slot) if record.loser_to else None
+        )
+
+    def __repr__(self):
+        return f'<Match {self.number} {self.bracket}{self.round}.{self.position} {self.slots} -> {self.winner}>'
+
+
+class Bracket:
+    """Single or double elimination bracket with byes and automatic advancement.
+
+    Matches are numbered in display order (winners rounds, then losers rounds,
+    then the grand final and its reset) and linked to the match their winner
+    and loser move on to. Reporting a result only touches the matches along
+    those links, and report() returns their numbers so callers can persist and
+    re-render just the affected part of the bracket.
+    """
+
+    def __init__(self, matches, double=False):
+        self.matches = {match.number: match for match in matches}
+        self.double = double
+
+    @classmethod
+    def from_records(cls, records, double=False):
+        return cls([Match.from_record(record) for record in records], double=double)
+
+    @classmethod
+    def build(cls, seeded_entries, double=False):
+        """Create a bracket for entry IDs ordered from seed 1 down"""
+        if len(seeded_entries) < 2:
+            raise ValueError("A bracket needs at least two entries")
+
+        size = 2
+        while size < len(seeded_entries):
+            size *= 2
+        rounds = size.bit_length() - 1
+
+        matches = []
+        number = 0
+
+        def add(bracket, round, count):
+            nonlocal number
+            created = []
+            for position in range(count):
+                number += 1
+                created.append(Match(number, bracket, round, position))
+            matches.extend(created)
+            return created
+
+        winners = [add(WINNERS, r, size >> r) for r in range(1, rounds + 1)]
+        for r in range(rounds - 1):
+            for match in winners[r]:
+                match.winner_to = (winners[r + 1][match.position // 2].number, match.position % 2)
+
+        if double:
+            losers = []
+            for j in range(1, rounds):
+                count = size >> (j + 1)
+                losers.append(add(LOSERS, 2 * j - 1, count))
+                losers.append(add(LOSERS, 2 * j, count))
+            final = add(GRAND_FINAL, 1, 1)[0]
+            reset = add(GRAND_FINAL, 2, 1)[0]
+            final.winner_to = (reset.number, 0)
+            final.loser_to = (reset.number, 1)
+            winners[-1][0].winner_to = (final.number, 0)
+
+            if losers:
+                # Losers of the first winners round meet each other
+                for match in winners[0]:
+                    match.loser_to = (losers[0][match.position // 2].number, match.position % 2)
+                # Later winners rounds drop into the even losers rounds, mirrored to avoid rematches
+                for r in range(1, rounds):
+                    target = losers[2 * r - 1]
+                    for match in winners[r]:
+                        position = match.position if r % 2 == 0 else len(target) - 1 - match.position
+                        match.loser_to = (target[position].number, 1)
+                for i, round_matches in enumerate(losers[:-1]):
+                    following = losers[i + 1]
+                    for match in round_matches:
+                        if i % 2 == 0:
+                            match.winner_to = (following[match.position].number, 0)
+                        else:
+                            match.winner_to = (following[match.position // 2].number, match.position % 2)
+                losers[-1][0].winner_to = (final.number, 1)
+            else:
+                winners[-1][0].loser_to = (final.number, 1)
+
+        bracket = cls(matches, double=double)
+
+        entries = list(seeded_entries)
+        first_round = winners[0]
+        for i, seed in enumerate(seed_order(size)):
+            entry = entries[seed - 1] if seed <= len(entries) else BYE
+            bracket._place(first_round[i // 2].number, i % 2, entry, set())
+        return bracket
+
+    def _place(self, number, slot, entry, changed):
+        match = self.matches[number]
+        match.slots[slot] = entry
+        changed.add(number)
+        self._resolve_byes(match, changed)
+
+    def _resolve_byes(self, match, changed):
+        if match.winner is not None or None in match.slots:
+            return
+        first, second = match.slots
+        if first != BYE and second != BYE:
+            return  # A real match, wait for the result
+        winner = first if second == BYE else second
+        self._finish(match, winner, BYE, changed)
+
+    def _finish(self, match, winner, loser, changed):
+        match.winner = winner
+        match.loser = loser
+        changed.add(match.number)
+        if match.bracket == GRAND_FINAL and match.round == 1 and winner == match.slots[0]:
+            # The winners bracket champion has not lost yet, so there is no reset match
+            loser = BYE
+        if match.winner_to:
+            self._place(match.winner_to[0], match.winner_to[1], winner, changed)
+        if match.loser_to:
+            self._place(match.loser_to[0], match.loser_to[1], loser, changed)
+
+    def report(self, number, winner):
+        """Record the winner of a match, advance both entries and return the changed match numbers"""
+        match = self.matches.get(number)
+        if match is None:
+            raise ValueError(f"Match {number} does not exist")
+        if not match.playable:
+            raise ValueError(f"Match {number} is not ready to be played")
+        if winner not in match.slots:
+            raise ValueError(f"Entry {winner} is not playing match {number}")
+
+        loser = match.slots[1] if match.slots[0] == winner else match.slots[0]
+        changed = set()
+        self._finish(match, winner, loser, changed)
+        return changed
+
+    @property
+    def final(self):
+        return max(self.matches.values(), key=lambda match: match.number)
+
+    @property
+    def champion(self):
+        winner = self.final.winner
+        return winner if winner not in (None, BYE) else None
+
+    def ordered(self):
+        return [self.matches[number] for number in sorted(self.matches)]
+
+    def playable(self):
+        return [match for match in self.ordered() if match.playable]
@@ -0,0 +1,58 @@
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def tree_fingerprint(tree):
+    """Digest of the global commands exactly as they would be sent to Discord"""
+    commands = sorted(
+        (command.to_dict(tree) for command in tree.get_commands()),
+        key=lambda command: (command.get('type', 1), command['name'])
+    )
+    return hashlib.sha256(json.dumps(commands, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class CommandSync:
+    """Syncs the command tree only when it changed since the last successful sync.
+
+    Global syncs are slow and rate limited by Discord, and on_ready runs again
+    after every reconnect that cannot resume. The fingerprint of the last tree
+    Discord accepted is kept in a file next to the database, keyed by the
+    application ID so switching tokens still syncs.
+    """
+
+    def __init__(self, tree, path):
+        self.tree = tree
+        self.path = path
+
+    def _stored(self):
+        try:
+            with open(self.path) as file:
+                return file.read().strip()
+        except OSError:
+            return None
+
+    def _store(self, key):
+        # Written to a temporary file first so a crash never leaves half a fingerprint
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w') as file:
+            file.write(key)
+        os.replace(temporary, self.path)
+
+    async def sync(self, force=False):
+        """Sync if the tree changed (or force), returns the number of commands synced or None if skipped"""
+        key = f"{self.tree.client.application_id}:{tree_fingerprint(self.tree)}"
+        if not force and self._stored() == key:
+            logger.info("🌐 Comandos sin cambios, no es necesario sincronizar")
+            return None
+
+        synced = await self.tree.sync()
+        try:
+            self._store(key)
+        except OSError as e:
+            logger.warning(f"Could not store command tree fingerprint: {e}")
+        logger.info(f"🌐 {len(synced)} comandos sincronizados")
+        return len(synced)
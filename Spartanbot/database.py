@@ -0,0 +1,71 @@
+import logging
+import os
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Relative SQLite paths are resolved inside the Flask instance folder
+DEFAULT_DATABASE_URL = "sqlite:///warzone_teams.db"
+
+# Applied to every new SQLite connection: WAL lets the web threads read while
+# the bot writes, NORMAL sync is safe under WAL, and the busy timeout makes
+# writers wait for the lock instead of failing with "database is locked"
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_KB", "20000")),
+    "temp_store": "MEMORY"
+}
+
+
+def database_url():
+    """DATABASE_URL from the environment, with the postgres:// alias some hosts use normalised"""
+    url = os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL)
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def engine_options(url):
+    """Engine keyword arguments for the backend of url"""
+    if url.startswith("sqlite"):
+        return {"connect_args": {"timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000, "check_same_thread": False}}
+
+    options = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": True
+    }
+    if url.startswith("postgresql"):
+        statement_timeout = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"))
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+    return options
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def init_database(app, db):
+    """Configure app's database from the environment and bind db to it"""
+    url = database_url()
+    app.config["SQLALCHEMY_DATABASE_URI"] = url
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(url)
+    os.makedirs(app.instance_path, exist_ok=True)
+    db.init_app(app)
+
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name == "sqlite":
+            event.listen(engine, "connect", _apply_sqlite_pragmas)
+        logger.info(f"🗄️ Base de datos: {engine.dialect.name} ({engine.url.render_as_string(hide_password=True)})")
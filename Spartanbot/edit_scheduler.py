@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import time
+from collections import OrderedDict
+
+from outbound import PRIORITY_EDIT
+
+logger = logging.getLogger(__name__)
+
+
+def message_items(components):
+    """Flatten a message's action rows into the items a view would hold"""
+    return [child for row in components for child in getattr(row, 'children', [row])]
+
+
+def payload_hash(embeds=None, items=()):
+    """Stable digest of what a message edit would display.
+
+    items are the view's children or the message's flattened components;
+    both are hashed by component type so a sent view and the message it
+    produced give the same digest.
+    """
+    data = {
+        "embeds": [embed.to_dict() for embed in embeds or []],
+        "components": [
+            [int(getattr(item.type, 'value', item.type)), getattr(item, 'custom_id', None),
+             getattr(item, 'label', None), getattr(item, 'disabled', None)]
+            for item in items
+        ]
+    }
+    return hashlib.blake2b(json.dumps(data, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+
+class EditScheduler:
+    """Coalesces and de-duplicates edits of bot messages.
+
+    Handlers call schedule() with a render callable instead of editing the
+    message themselves. At most one edit per message is sent per window: a
+    burst of clicks only replaces the pending render, and the render that runs
+    when the window elapses reflects the latest state. Edits whose rendered
+    payload matches what the message already shows are skipped. With an
+    outbound scheduler the edits are sent through it at edit priority.
+    """
+
+    def __init__(self, window=1.0, max_tracked=10000, outbound=None):
+        self.window = window
+        self.outbound = outbound
+        self.max_tracked = max_tracked
+        self._pending = {}
+        self._flushing = set()  # Flushes past their delay, rendering or sending
+        self._last_edit = {}
+        self._last_hash = OrderedDict()
+        self.requested = 0
+        self.coalesced = 0
+        self.skipped = 0
+        self.sent = 0
+        self.failed = 0
+
+    def schedule(self, message, render):
+        """Queue an edit of message; render() returns (or awaits to) the edit kwargs"""
+        self.requested += 1
+        if message.id not in self._last_hash:
+            # Seeded from what the message shows, components included, so the
+            # first render is compared against the same shape it produces
+            self._remember(message.id, payload_hash(message.embeds, message_items(message.components)))
+
+        pending = self._pending.get(message.id)
+        if pending is not None:
+            pending[1] = render
+            pending[0] = message
+            self.coalesced += 1
+            return
+
+        self._pending[message.id] = [message, render]
+        task = asyncio.create_task(self._flush(message.id))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _flush(self, message_id):
+        delay = self._last_edit.get(message_id, 0.0) + self.window - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        message, render = self._pending.pop(message_id)
+        # The window starts now, not when the edit is sent: a click while this
+        # flush renders or sends waits for the next window instead of firing at once
+        previous_edit = self._last_edit.get(message_id)
+        self._last_edit[message_id] = time.monotonic()
+        try:
+            payload = render()
+            if inspect.isawaitable(payload):
+                payload = await payload
+
+            # An edit without a view keeps the message's components; view=None removes them
+            if 'view' in payload:
+                items = payload['view'].children if payload['view'] is not None else []
+            else:
+                items = message_items(message.components)
+            digest = payload_hash(
+                [payload['embed']] if 'embed' in payload else payload.get('embeds', message.embeds),
+                items
+            )
+            if digest == self._last_hash.get(message_id):
+                # Nothing was sent, so the window of the previous edit still applies
+                if previous_edit is None:
+                    self._last_edit.pop(message_id, None)
+                else:
+                    self._last_edit[message_id] = previous_edit
+                self.skipped += 1
+                return
+
+            if self.outbound is not None:
+                channel_id = getattr(message, 'channel', None) and message.channel.id
+                await self.outbound.request(
+                    f"channel:{channel_id}", lambda: message.edit(**payload), priority=PRIORITY_EDIT
+                )
+            else:
+                await message.edit(**payload)
+            self._remember(message_id, digest)
+            self.sent += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Error editing message {message_id}: {e}")
+
+    async def drain(self, timeout=5.0):
+        """Wait up to timeout seconds for pending edits to be sent, returns how many are left"""
+        deadline = time.monotonic() + timeout
+        while self._flushing and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        return len(self._flushing)
+
+    def _remember(self, message_id, digest):
+        self._last_hash[message_id] = digest
+        self._last_hash.move_to_end(message_id)
+        while len(self._last_hash) > self.max_tracked:
+            old_id, _ = self._last_hash.popitem(last=False)
+            self._last_edit.pop(old_id, None)
+
+    def stats(self):
+        return {
+            "window": self.window,
+            "requested": self.requested,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "skipped_noop": self.skipped,
+            "failed": self.failed,
+            "edits_saved": self.coalesced + self.skipped,
+            "pending": len(self._pending)
+        }
@@ -0,0 +1,133 @@
+import asyncio
+import itertools
+import json
+from collections import deque
+
+from aiohttp import web
+
+# Team lifecycle events pushed to the web dashboard
+SEARCH_CREATED = 'search_created'
+PLAYER_JOINED = 'player_joined'
+SEARCH_CANCELLED = 'search_cancelled'
+SEARCH_EXPIRED = 'search_expired'
+TEAM_FULL = 'team_full'
+
+
+class Subscription:
+    """One subscriber's bounded buffer of encoded events"""
+
+    def __init__(self, guild_id, buffer_size):
+        self.guild_id = guild_id
+        self.queue = asyncio.Queue(maxsize=buffer_size)
+        self.closed = False
+
+    def close(self):
+        # Whatever is still buffered is dropped, the stream ends at the sentinel
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class EventBus:
+    """In-process pub/sub of team events for the SSE stream.
+
+    publish() encodes an event once and appends the same bytes to every
+    matching subscriber's buffer without awaiting anything, so the bot's
+    handlers never wait on web clients. A subscriber whose buffer is full is
+    too slow to keep up and is disconnected instead of growing without bound;
+    browsers reconnect on their own and resume from Last-Event-ID using the
+    short replay log.
+    """
+
+    def __init__(self, buffer_size=64, max_subscribers=2000, replay_size=256):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._replay = deque(maxlen=replay_size)  # (event id, guild_id, frame)
+        self._ids = itertools.count(1)
+        self.published = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def publish(self, event, guild_id=None, **data):
+        event_id = next(self._ids)
+        payload = json.dumps({"type": event, "guild_id": guild_id and str(guild_id), **data}, default=str)
+        frame = f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n".encode()
+        self._replay.append((event_id, guild_id, frame))
+        self.published += 1
+
+        for subscription in list(self._subscribers):
+            if subscription.guild_id is not None and subscription.guild_id != guild_id:
+                continue
+            try:
+                subscription.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                self._subscribers.discard(subscription)
+                subscription.close()
+                self.dropped += 1
+
+    def subscribe(self, guild_id=None, last_event_id=None):
+        """New subscription, or None when the subscriber limit is reached"""
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        subscription = Subscription(guild_id, self.buffer_size)
+        if last_event_id is not None:
+            missed = [
+                frame for event_id, event_guild_id, frame in self._replay
+                if event_id > last_event_id and (guild_id is None or event_guild_id == guild_id)
+            ]
+            for frame in missed[-self.buffer_size:]:
+                subscription.queue.put_nowait(frame)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._subscribers.discard(subscription)
+
+    def close(self):
+        """End every stream, used on shutdown"""
+        for subscription in list(self._subscribers):
+            subscription.close()
+        self._subscribers.clear()
+
+    def stats(self):
+        return {
+            "subscribers": len(self._subscribers),
+            "max_subscribers": self.max_subscribers,
+            "buffer_size": self.buffer_size,
+            "published": self.published,
+            "dropped_slow_consumers": self.dropped
+        }
+
+
+async def stream(request, bus, guild_id=None, heartbeat=15.0):
+    """Serve bus as text/event-stream until the client leaves or is dropped"""
+    last_event_id = request.headers.get('Last-Event-ID')
+    subscription = bus.subscribe(guild_id, int(last_event_id) if last_event_id and last_event_id.isdigit() else None)
+    if subscription is None:
+        return web.json_response({"error": "Demasiadas conexiones"}, status=503)
+
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop nginx from buffering the stream
+    })
+    try:
+        await response.prepare(request)
+        await response.write(b"retry: 3000\n\n")
+        while True:
+            try:
+                frame = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                frame = b": ping\n\n"  # Keeps proxies from closing an idle connection
+            if frame is None:
+                break
+            await response.write(frame)
+    except ConnectionResetError:
+        pass
+    finally:
+        bus.unsubscribe(subscription)
+    return response
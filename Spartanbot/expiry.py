@@ -0,0 +1,75 @@
+import heapq
+import itertools
+from collections import namedtuple
+
+# What expires: kind is one of the constants below, key identifies it within
+# the kind, and the message (if known) gets its buttons disabled
+SEARCH = 'search'
+PRIVATE_MATCH = 'private_match'
+TOURNAMENT = 'tournament'
+
+ExpiringItem = namedtuple('ExpiringItem', 'kind key channel_id message_ids views')
+
+
+class ExpiryHeap:
+    """Deadlines of everything that expires, in a single min-heap.
+
+    One background task pops whatever is due instead of keeping a sleeping
+    task per search. Rescheduling or cancelling does not search the heap:
+    the current deadline of each item lives in a dict and stale heap entries
+    are discarded when they surface, so every operation is O(log n).
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._items = {}  # (kind, key) -> (deadline, ExpiringItem)
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, kind_key):
+        return kind_key in self._items
+
+    def schedule(self, item, deadline):
+        """Expire item at deadline (epoch seconds), replacing any earlier deadline"""
+        self._items[(item.kind, item.key)] = (deadline, item)
+        heapq.heappush(self._heap, (deadline, next(self._sequence), item.kind, item.key))
+
+    def get(self, kind, key):
+        current = self._items.get((kind, key))
+        return current[1] if current is not None else None
+
+    def touch(self, kind, key, deadline):
+        """Move the deadline of an already scheduled item"""
+        current = self._items.get((kind, key))
+        if current is not None:
+            self.schedule(current[1], deadline)
+
+    def cancel(self, kind, key):
+        self._items.pop((kind, key), None)
+
+    def pop_due(self, now):
+        """Remove and return the items whose deadline has passed"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, kind, key = heapq.heappop(self._heap)
+            current = self._items.get((kind, key))
+            if current is not None and current[0] == deadline:
+                del self._items[(kind, key)]
+                due.append(current[1])
+        # Entries left behind by reschedules and cancels are dropped lazily above;
+        # rebuild once they outnumber the live ones so the heap stays bounded
+        if len(self._heap) > 2 * len(self._items) + 1024:
+            self._heap = [
+                (deadline, next(self._sequence), kind, key)
+                for (kind, key), (deadline, _) in self._items.items()
+            ]
+            heapq.heapify(self._heap)
+        return due
+
+    def counts(self):
+        counts = {}
+        for kind, _ in self._items:
+            counts[kind] = counts.get(kind, 0) + 1
+        return counts
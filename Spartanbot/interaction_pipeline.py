@@ -0,0 +1,210 @@
+import asyncio
+import functools
+import logging
+from types import SimpleNamespace
+
+import discord
+
+from metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+
+ACK_DEADLINE = 3.0  # Discord drops interactions not acknowledged within 3 seconds
+AT_RISK = 2.5       # Acknowledgements slower than this are close to the deadline
+
+ack_seconds = histogram(
+    'interaction_ack_seconds', 'Time from interaction creation to its acknowledgement', 'handler'
+)
+total_seconds = histogram(
+    'interaction_total_seconds', 'Time from interaction creation to the end of its handler', 'handler'
+)
+errors = counter('interaction_errors_total', 'Interactions whose handler raised', 'handler')
+over_budget = {}
+
+
+def _elapsed(interaction):
+    return (discord.utils.utcnow() - interaction.created_at).total_seconds()
+
+
+class _Acknowledgement:
+    """Shared state of one interaction: who acknowledged it and when"""
+
+    def __init__(self, interaction, handler):
+        self.interaction = interaction
+        self.handler = handler
+        self.lock = asyncio.Lock()
+        self.deferred = False
+        self.placeholder = None  # Visibility of a "thinking" message no follow-up has replaced yet
+
+    def record(self):
+        ack_seconds.observe(self.handler, _elapsed(self.interaction))
+
+    async def defer(self, ephemeral):
+        async with self.lock:
+            response = self.interaction.response
+            if response.is_done():
+                return
+            # Slash commands and modals opened by them can only show a "thinking"
+            # message, component interactions are deferred silently
+            thinking = (
+                self.interaction.type is discord.InteractionType.application_command
+                or self.interaction.message is None
+            )
+            await response.defer(ephemeral=ephemeral, thinking=thinking)
+            self.deferred = True
+            if thinking:
+                self.placeholder = ephemeral
+            self.record()
+
+    async def settle(self, ephemeral):
+        """Make the next follow-up come out with the visibility the handler asked for.
+
+        The first follow-up after a "thinking" defer replaces the thinking
+        message and keeps its visibility whatever its own ephemeral flag says.
+        When the two differ the thinking message is resolved first, so the
+        follow-up is sent as a new message that honours its flag. Must be
+        called with the lock held.
+        """
+        placeholder, self.placeholder = self.placeholder, None
+        if placeholder is None or placeholder == ephemeral:
+            return
+        if placeholder:
+            await self.interaction.edit_original_response(content="✅")
+        else:
+            # A public "thinking" message cannot become private, it is removed instead
+            await self.interaction.delete_original_response()
+
+
+class _DeferredResponse:
+    """Stand-in for Interaction.response that turns responses after a defer into follow-ups"""
+
+    def __init__(self, ack):
+        self._ack = ack
+        self._response = ack.interaction.response
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    async def send_message(self, content=None, *, ephemeral=False, delete_after=None, **kwargs):
+        async with self._ack.lock:
+            if not self._response.is_done():
+                result = await self._response.send_message(
+                    content, ephemeral=ephemeral, delete_after=delete_after, **kwargs
+                )
+                self._ack.record()
+                return result
+            await self._ack.settle(ephemeral)
+
+        message = await self._ack.interaction.followup.send(
+            content if content is not None else discord.utils.MISSING,
+            ephemeral=ephemeral, wait=True, **kwargs
+        )
+        if delete_after is not None:
+            await message.delete(delay=delete_after)
+        return SimpleNamespace(message_id=message.id, resource=message)
+
+    async def edit_message(self, **kwargs):
+        async with self._ack.lock:
+            if not self._response.is_done():
+                result = await self._response.edit_message(**kwargs)
+                self._ack.record()
+                return result
+        return await self._ack.interaction.edit_original_response(**kwargs)
+
+    async def send_modal(self, modal):
+        async with self._ack.lock:
+            result = await self._response.send_modal(modal)
+            self._ack.record()
+            return result
+
+    async def defer(self, *, ephemeral=False, thinking=False):
+        await self._ack.defer(ephemeral)
+
+
+class _DeferredInteraction:
+    """Proxy of a discord.Interaction whose response goes through _DeferredResponse"""
+
+    def __init__(self, interaction, ack):
+        self._interaction = interaction
+        self.response = _DeferredResponse(ack)
+
+    def __getattr__(self, name):
+        return getattr(self._interaction, name)
+
+
+def acknowledged(ephemeral=True, ack_budget=0.0, budget=10.0):
+    """Acknowledge an interaction before (or while) its handler runs.
+
+    ack_budget is how long after the interaction was created the handler may
+    take to respond by itself before it is deferred: 0 defers right away and
+    None never defers (handlers that open a modal, which has to be the first
+    response). ephemeral applies to the "thinking" message of a deferred
+    slash command; it can be a callable of the command's arguments, e.g.
+    lambda publico=False, **_: not publico. Commands that answer both
+    publicly and privately should defer ephemerally: a private "thinking"
+    message can be resolved before a public follow-up, a public one can only
+    be deleted. Once deferred, the handler's send_message/edit_message
+    calls are sent as follow-ups. Acknowledgement and total handler time are
+    recorded per handler, and runs over budget seconds are logged.
+
+    Works on slash commands, ui.button callbacks and Modal.on_submit.
+    """
+    def decorator(func):
+        handler = func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            # The interaction is the first argument of commands and the second of methods
+            index = 0 if isinstance(args[0], discord.Interaction) else 1
+            interaction = args[index]
+            ack = _Acknowledgement(interaction, handler)
+            args = args[:index] + (_DeferredInteraction(interaction, ack),) + args[index + 1:]
+            private = ephemeral(**kwargs) if callable(ephemeral) else ephemeral
+
+            watchdog = None
+            if ack_budget is not None:
+                if ack_budget <= 0:
+                    await ack.defer(private)
+                else:
+                    async def defer_late():
+                        await asyncio.sleep(max(0.0, ack_budget - _elapsed(interaction)))
+                        await ack.defer(private)
+                    watchdog = asyncio.create_task(defer_late())
+
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                errors.inc(handler)
+                raise
+            finally:
+                if watchdog is not None:
+                    watchdog.cancel()
+                total = _elapsed(interaction)
+                total_seconds.observe(handler, total)
+                if total > budget:
+                    over_budget[handler] = over_budget.get(handler, 0) + 1
+                    logger.warning(f"Interaction {handler} took {total:.2f}s (budget {budget:.1f}s)")
+
+        return wrapper
+    return decorator
+
+
+def stats():
+    """Per-handler acknowledgement and total latency"""
+    acks = ack_seconds.series()
+    totals = total_seconds.series()
+    errors_by_handler = {labels['handler']: value for _, labels, value in errors.samples()}
+    return {
+        handler: {
+            "count": totals.get(handler, {}).get('count', 0),
+            "ack_p50": ack_seconds.quantile(handler, 0.50),
+            "ack_p95": ack_seconds.quantile(handler, 0.95),
+            "ack_at_risk": ack_seconds.count_above(handler, AT_RISK),
+            "ack_missed": ack_seconds.count_above(handler, ACK_DEADLINE),
+            "total_p50": total_seconds.quantile(handler, 0.50),
+            "total_p95": total_seconds.quantile(handler, 0.95),
+            "over_budget": over_budget.get(handler, 0),
+            "errors": errors_by_handler.get(handler, 0)
+        }
+        for handler in sorted(set(acks) | set(totals))
+    }
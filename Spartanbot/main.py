@@ -2,15 +2,42 @@ import os
 import logging
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 from dotenv import load_dotenv
 import asyncio
+import math
 import re
-from datetime import datetime
+import time
+from datetime import datetime, timedelta, timezone
 from flask import Flask, render_template, redirect, url_for, flash
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
-import threading
+import sys
+import click
+from flask.cli import AppGroup
+from aiohttp import web
+from types import SimpleNamespace
+
+from profile_cache import DisplayNameCache, ProfileCache
+from balance import balanced_teams
+from command_sync import CommandSync
+from edit_scheduler import EditScheduler
+import events
+from events import PLAYER_JOINED, SEARCH_CANCELLED, SEARCH_CREATED, SEARCH_EXPIRED, TEAM_FULL, EventBus
+from expiry import PRIVATE_MATCH, SEARCH, TOURNAMENT, ExpiringItem, ExpiryHeap
+import interaction_pipeline
+from interaction_pipeline import acknowledged
+from presence import BLACK_OPS, OTHER_COD, WARZONE, PresenceIndex
+from outbound import PRIORITY_DM, PRIORITY_EDIT, PRIORITY_INTERACTION, PRIORITY_MESSAGE, OutboundScheduler
+from database import init_database
+import metrics
+import migrations
+import runtime
+from brackets import BYE, GRAND_FINAL, LOSERS, Bracket
+from matchmaking import MatchmakingQueue
+from repository import Repository
+from response_cache import ResponseCache
+from team_index import OpenTeamIndex
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
@@ -25,18 +52,142 @@ if not TOKEN:
     logger.error("No Discord token found in environment variables!")
     exit(1)
 
+# /jugadores is the only feature that needs presences; turning it off drops the
+# presences intent and with it the presence of every online member
+JUGADORES_ENABLED = os.getenv("JUGADORES_ENABLED", "1") == "1"
+
+# LOW_MEMORY=1 stops caching members: guilds are not chunked at startup,
+# /jugadores is fed from raw presence events, and member lists and display
+# names are fetched on demand instead
+LOW_MEMORY = os.getenv("LOW_MEMORY", "0") == "1"
+# With LOW_MEMORY the startup re-sync of member rows downloads one guild's member
+# list every MEMBER_SYNC_INTERVAL seconds instead of every guild's at once
+MEMBER_SYNC_INTERVAL = float(os.getenv("MEMBER_SYNC_INTERVAL", "30"))
+
 # Set up bot with necessary intents
 # Using default intents only to avoid privileged intent errors
 intents = discord.Intents.default()
 intents.members = True  # For checking server members
-intents.presences = True  # For checking activities/games
+intents.presences = JUGADORES_ENABLED  # For checking activities/games
+
+# Sent with every gateway identify, so reconnects keep it without another presence update
+bot_options = {"activity": discord.Game(name="Warzone | /buscar_equipo")}
+if LOW_MEMORY:
+    bot_options.update({
+        "member_cache_flags": discord.MemberCacheFlags.none(),
+        "chunk_guilds_at_startup": False,
+        "enable_raw_presences": JUGADORES_ENABLED
+    })
+
+# AUTO_SHARD=1 runs an AutoShardedBot with one gateway connection per shard.
+# SHARD_COUNT fixes the total number of shards (Discord's recommendation
+# otherwise) and SHARD_IDS picks the ones this process runs, so shards can be
+# split across processes
+AUTO_SHARD = os.getenv("AUTO_SHARD", "0") == "1"
+SHARD_COUNT = int(os.getenv("SHARD_COUNT")) if os.getenv("SHARD_COUNT") else None
+SHARD_IDS = [int(shard_id) for shard_id in os.getenv("SHARD_IDS", "").split(",") if shard_id.strip()] or None
+
+if SHARD_IDS and not SHARD_COUNT:
+    logger.error("SHARD_IDS requires SHARD_COUNT to be set!")
+    exit(1)
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+if AUTO_SHARD:
+    bot = commands.AutoShardedBot(
+        command_prefix="!", intents=intents, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS, **bot_options
+    )
+else:
+    bot = commands.Bot(command_prefix="!", intents=intents, **bot_options)
 tree = bot.tree
 
+# Slash commands are synced only when the tree's fingerprint changed since the
+# last sync; FORCE_COMMAND_SYNC=1 or /sincronizar_comandos sync regardless
+FORCE_COMMAND_SYNC = os.getenv("FORCE_COMMAND_SYNC", "0") == "1"
+COMMAND_FINGERPRINT_FILE = os.getenv(
+    "COMMAND_FINGERPRINT_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "command_tree.sha256")
+)
+command_sync = CommandSync(tree, COMMAND_FINGERPRINT_FILE)
+
 # Use dictionary for active team searches
 # These get stored in the database but we keep an in-memory copy for performance
 team_searches = {}  # Track active team searches
+open_teams = OpenTeamIndex()  # Searches with free slots, by platform/mode and K/D minimum
+
+# Seconds after an interaction is created that a handler with mixed public and
+# ephemeral replies may take to respond by itself before it is deferred
+ACK_BUDGET = float(os.getenv("INTERACTION_ACK_BUDGET", "1.0"))
+
+# The website and status endpoints are served from the bot's own event loop
+PROCESS_STARTED = time.monotonic()
+HTTP_HOST = os.getenv("HTTP_HOST", "0.0.0.0")
+HTTP_PORT = int(os.getenv("PORT", "8080"))
+HTTP_THREADS = int(os.getenv("HTTP_THREADS", "8"))
+SHUTDOWN_GRACE = float(os.getenv("SHUTDOWN_GRACE", "10"))
+
+# Side effects of handlers (DMs, edits, announcements) are queued here by priority
+# instead of being awaited inline, so interaction responses never wait behind them
+outbound = OutboundScheduler(
+    concurrency=int(os.getenv("OUTBOUND_CONCURRENCY", "4")),
+    max_retries=int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+)
+
+# Embed edits of team, private match and tournament messages go through here
+# so bursts of clicks become one edit per window and no-op edits are dropped
+edit_scheduler = EditScheduler(window=float(os.getenv("EMBED_EDIT_WINDOW", "1.0")), outbound=outbound)
+
+# Team lifecycle events for the /api/stream server-sent events endpoint
+team_events = EventBus(
+    buffer_size=int(os.getenv("STREAM_BUFFER_SIZE", "64")),
+    max_subscribers=int(os.getenv("STREAM_MAX_SUBSCRIBERS", "2000"))
+)
+
+# Players waiting in /cola, grouped into teams by the matchmaker task
+MATCHMAKING_INTERVAL = float(os.getenv("MATCHMAKING_INTERVAL", "5"))
+matchmaking_queue = MatchmakingQueue(
+    max_kd_spread=float(os.getenv("MATCHMAKING_KD_SPREAD", "0.5")),
+    spread_growth=float(os.getenv("MATCHMAKING_SPREAD_GROWTH", "0.05"))
+)
+loop_watcher = None  # Task sampling event loop lag for /metrics
+member_sync = None  # LOW_MEMORY task re-syncing member rows guild by guild after startup
+startup_done = False  # on_ready work that must only happen once per process
+searches_rehydrated = False  # Restored from the database once per process, not on every reconnect
+
+# Seconds until an untouched search, private match or tournament is closed
+EXPIRY_TTL = {
+    SEARCH: int(os.getenv("SEARCH_TTL", str(6 * 3600))),
+    PRIVATE_MATCH: int(os.getenv("PRIVATE_MATCH_TTL", str(12 * 3600))),
+    TOURNAMENT: int(os.getenv("TOURNAMENT_TTL", str(7 * 24 * 3600)))  # Since its last registration or result
+}
+EXPIRY_INTERVAL = float(os.getenv("EXPIRY_INTERVAL", "60"))
+expiring = ExpiryHeap()
+expired_total = {kind: 0 for kind in EXPIRY_TTL}
+
+# Members playing Call of Duty per guild, maintained from presence updates for /jugadores
+PRESENCE_SAMPLE_INTERVAL = float(os.getenv("PRESENCE_SAMPLE_INTERVAL", "300"))
+presence_index = PresenceIndex(history_size=int(os.getenv("PRESENCE_HISTORY_SIZE", "2016")))
+
+# Display names of members missing from the cache, fetched for player lists
+member_names = DisplayNameCache(
+    maxsize=int(os.getenv("MEMBER_NAME_CACHE_SIZE", "2000")),
+    ttl=float(os.getenv("MEMBER_NAME_CACHE_TTL", "120"))
+)
+
+# Choices shared by the team search commands
+PLATFORM_CHOICES = [
+    app_commands.Choice(name="PC", value="PC"),
+    app_commands.Choice(name="Xbox", value="Xbox"),
+    app_commands.Choice(name="PlayStation", value="PlayStation"),
+    app_commands.Choice(name="Crossplay", value="Crossplay")
+]
+
+SEARCH_MODE_CHOICES = [
+    app_commands.Choice(name="Battle Royale", value="Battle Royale"),
+    app_commands.Choice(name="Resurgimiento", value="Resurgimiento"),
+    app_commands.Choice(name="Ranked BR", value="Ranked BR"),
+    app_commands.Choice(name="Ranked Multijugador", value="Ranked Multijugador"),
+    app_commands.Choice(name="Zombies", value="Zombies"),
+    app_commands.Choice(name="Saqueo", value="Saqueo")
+]
 
 # Regular expression pattern for Activision ID validation
 ACTIVISION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_]{3,16}#[0-9]{1,10}$')
@@ -56,6 +207,7 @@ class RegistrationModal(discord.ui.Modal, title='Registrar Activision ID'):
         required=True
     )
 
+    @acknowledged()
     async def on_submit(self, interaction: discord.Interaction):
         activision_id = self.activision_id.value
 
@@ -79,69 +231,149 @@ class RegistrationModal(discord.ui.Modal, title='Registrar Activision ID'):
             )
             return
 
-        with app.app_context():
-            try:
-                # Check if user exists in database
-                existing_user = User.query.filter_by(discord_id=str(interaction.user.id)).first()
-
-                if existing_user:
-                    # Update existing user
-                    existing_user.activision_id = activision_id
-                    existing_user.kd_ratio = kd
-                    existing_user.username = interaction.user.name
-                    existing_user.discriminator = interaction.user.discriminator or ""
-                    existing_user.updated_at = datetime.utcnow()
-                else:
-                    # Create new user
-                    new_user = User(
-                        discord_id=str(interaction.user.id),
-                        username=interaction.user.name,
-                        discriminator=interaction.user.discriminator or "",
-                        activision_id=activision_id,
-                        kd_ratio=kd
-                    )
-                    db.session.add(new_user)
-
-                # Commit changes
-                db.session.commit()
-                logger.info(f"User {interaction.user.id} saved to database with Activision ID: {activision_id}")
-            except Exception as e:
-                db.session.rollback()
-                logger.error(f"Error saving user to database: {e}")
-                await interaction.response.send_message(
-                    "❌ Error al guardar tus datos. Por favor, inténtalo de nuevo más tarde.",
-                    ephemeral=True
-                )
-                return
+        try:
+            await repository.upsert_user(
+                discord_id=interaction.user.id,
+                username=interaction.user.name,
+                discriminator=interaction.user.discriminator or "",
+                activision_id=activision_id,
+                kd_ratio=kd,
+                guild_ids=[guild.id for guild in interaction.user.mutual_guilds]
+                + ([interaction.guild_id] if interaction.guild_id else [])
+            )
+            logger.info(f"User {interaction.user.id} saved to database with Activision ID: {activision_id}")
+        except Exception as e:
+            logger.error(f"Error saving user to database: {e}")
+            await interaction.response.send_message(
+                "❌ Error al guardar tus datos. Por favor, inténtalo de nuevo más tarde.",
+                ephemeral=True
+            )
+            return
 
         await interaction.response.send_message(
             f"✅ Registrado correctamente!\nActivision ID: `{activision_id}`\nK/D Ratio: `{kd}`", 
             ephemeral=True
         )
 
+def paginated_embeds(title, description, color, fields, per_embed=25):
+    """Spread (name, value) fields over as many embeds as needed (25 fields max each)"""
+    pages = [fields[i:i + per_embed] for i in range(0, len(fields), per_embed)] or [[]]
+    embeds = []
+    for number, page in enumerate(pages, 1):
+        embed = discord.Embed(
+            title=title if len(pages) == 1 else f"{title} ({number}/{len(pages)})",
+            description=description,
+            color=color
+        )
+        for name, value in page:
+            embed.add_field(name=name, value=value, inline=False)
+        embeds.append(embed)
+    return embeds
+
+async def send_embeds(interaction, embeds, ephemeral=False):
+    """Answer an interaction with one message per embed"""
+    await interaction.response.send_message(embed=embeds[0], ephemeral=ephemeral)
+    for embed in embeds[1:]:
+        await outbound.request(
+            f"interaction:{interaction.id}",
+            lambda embed=embed: interaction.followup.send(embed=embed, ephemeral=ephemeral),
+            priority=PRIORITY_INTERACTION
+        )
+
+async def send_dm(user_id, content):
+    """Send a direct message, looking the user up in the cache before asking the API"""
+    user = bot.get_user(user_id) or await bot.fetch_user(user_id)
+    try:
+        await user.send(content)
+    except discord.errors.Forbidden:
+        logger.warning(f"Could not send DM to {user.name} - messages may be disabled")
+
+def roster_field(roster):
+    """Render the 👥 Equipo embed field (name, value) from a TeamRoster"""
+    lines = [f"<@{roster.owner.discord_id}> (Líder) - `{roster.owner.activision_id}`"]
+    for member in roster.members:
+        lines.append(f"- <@{member.discord_id}> - `{member.activision_id}` (K/D {member.kd_ratio})")
+
+    name = f"👥 Equipo ({len(roster.members) + 1}/{roster.max_players})"
+    return name, "\n".join(lines)
+
+def search_embed(search, leader=None):
+    """Embed of a team search built from its team_searches entry and the leader's profile"""
+    owner = f"<@{search['owner_id']}>"
+    embed = discord.Embed(
+        title="📣 BÚSQUEDA DE EQUIPO",
+        description=f"{owner} busca equipo para Warzone",
+        color=0x00ff00
+    )
+    embed.add_field(name="🖥️ Plataforma", value=search['platform'], inline=True)
+    embed.add_field(name="🎮 Modo", value=search['mode'], inline=True)
+    embed.add_field(name="📊 K/D Mínimo", value=str(search['kd_min']), inline=True)
+    embed.add_field(name=f"👥 Equipo (1/{search['max_players']})", value=f"{owner} (Líder)", inline=False)
+    if leader:
+        embed.add_field(name="👑 Líder K/D", value=str(leader.kd_ratio), inline=True)
+        embed.add_field(name="🆔 Activision ID", value=f"`{leader.activision_id}`", inline=True)
+    if search.get('description'):
+        embed.add_field(name="📝 Descripción", value=search['description'], inline=False)
+    if search.get('voice_channel_id'):
+        voice_channel = bot.get_channel(search['voice_channel_id'])
+        embed.add_field(
+            name="🔊 Canal de Voz",
+            value=f"🔊 {voice_channel.name}" if voice_channel else "Canal desconocido",
+            inline=False
+        )
+    return embed
+
+def expire_after(kind, key, channel_id, message_ids, views, since=None):
+    """Close kind/key once its TTL has passed since `since` (epoch seconds, default now)"""
+    started = since if since is not None else time.time()
+    expiring.schedule(
+        ExpiringItem(kind, key, channel_id, tuple(message_ids), tuple(views)),
+        started + EXPIRY_TTL[kind]
+    )
+
+def utc_timestamp(value):
+    """Epoch seconds of a naive UTC datetime stored by the models"""
+    return value.replace(tzinfo=timezone.utc).timestamp() if value else None
+
+def shard_of(guild_id):
+    """Shard that receives the events of guild_id"""
+    return (int(guild_id) >> 22) % (bot.shard_count or 1)
+
+def owns_guild(guild_id):
+    """Whether this process runs the shard of guild_id; rows without a guild belong to shard 0"""
+    if not SHARD_IDS:
+        return True
+    if guild_id is None:
+        return 0 in SHARD_IDS
+    return (int(guild_id) >> 22) % SHARD_COUNT in SHARD_IDS
+
+def search_id_for(owner_discord_id, team_id):
+    """In-memory key of a team search, derived from its Team row"""
+    return f"{owner_discord_id}_{team_id}"
+
 class TeamFinderView(discord.ui.View):
     def __init__(self, owner_id, search_id, max_players=4, voice_channel_id=None):
         super().__init__(timeout=None)
-        self.members_joined = []
+        self.members_joined = []  # Discord IDs of the members, owner excluded
         self.owner_id = owner_id
         self.search_id = search_id
         self.max_players = max_players
         self.voice_channel_id = voice_channel_id
 
     @discord.ui.button(label="Unirse", style=discord.ButtonStyle.success, emoji="✅", custom_id="join_team")
+    @acknowledged()
     async def join_team(self, interaction: discord.Interaction, button: discord.ui.Button):
         discord_id = str(interaction.user.id)
 
         # Check if user is registered in the database
-        with app.app_context():
-            user = User.query.filter_by(discord_id=discord_id).first()
+        user = await repository.get_profile(discord_id)
 
-            if not user or not user.activision_id:
-                await interaction.response.send_message(
-                    "⚠️ Necesitas registrar tu Activision ID primero. Usa `/registrar`",
-                    ephemeral=True
-                )
-                return
+        if not user or not user.activision_id:
+            await interaction.response.send_message(
+                "⚠️ Necesitas registrar tu Activision ID primero. Usa `/registrar`",
+                ephemeral=True
+            )
+            return
 
         # Check if team is full
         if len(self.members_joined) >= self.max_players - 1:  # -1 because owner is not in the list
@@ -152,7 +384,7 @@ class TeamFinderView(discord.ui.View):
             return
 
         # Check if user is already in this team
-        if interaction.user.id in [member.id for member in self.members_joined]:
+        if interaction.user.id in self.members_joined:
             await interaction.response.send_message(
                 "⚠️ Ya estás en este equipo.",
                 ephemeral=True
@@ -168,23 +400,25 @@ class TeamFinderView(discord.ui.View):
             return
 
         # Add user to team
-        self.members_joined.append(interaction.user)
+        self.members_joined.append(interaction.user.id)
+        open_teams.update_slots(self.search_id, self.max_players - 1 - len(self.members_joined))
 
         # Get search details for notifications
         search = team_searches[self.search_id]
 
         # Add user to team in database if the team exists in DB
         if 'team_id' in search:
-            with app.app_context():
-                team = Team.query.get(search['team_id'])
-                if team:
-                    team_member = TeamMember(
-                        team_id=team.id,
-                        user_id=user.id
-                    )
-                    db.session.add(team_member)
-                    db.session.commit()
-                    logger.info(f"User {interaction.user.id} joined team {team.id}")
+            team_member = await repository.add_member(search['team_id'], user.id)
+            if team_member:
+                logger.info(f"User {interaction.user.id} joined team {team_member.team_id}")
+
+        players = len(self.members_joined) + 1
+        team_events.publish(
+            PLAYER_JOINED, search.get('guild_id'), team_id=search.get('team_id'),
+            players=players, max_players=self.max_players
+        )
+        if players >= self.max_players:
+            team_events.publish(TEAM_FULL, search.get('guild_id'), team_id=search.get('team_id'))
 
         # Notify user
         await interaction.response.send_message(
@@ -194,58 +428,43 @@ class TeamFinderView(discord.ui.View):
         )
 
         # Notify team owner via DM
-        owner = await bot.fetch_user(self.owner_id)
-        if owner:
-            try:
-                with app.app_context():
-                    owner_user_db = User.query.filter_by(discord_id=str(self.owner_id)).first()
-
-                await owner.send(
-                    f"📢 {interaction.user.mention} se ha unido a tu equipo de {search['mode']}.\n"
-                    f"Activision ID: `{user.activision_id}`\n"
-                    f"K/D: `{user.kd_ratio}`"
-                )
-            except discord.errors.Forbidden:
-                logger.warning(f"Could not send DM to {owner.name} - messages may be disabled")
-            except Exception as e:
-                logger.error(f"Error sending DM: {e}")
-
-        # Update the original message with current team members
-        # Get owner from cache or fetch if needed
-        owner_user = bot.get_user(self.owner_id)
-        if not owner_user:
-            try:
-                owner_user = await bot.fetch_user(self.owner_id)
-            except:
-                logger.error(f"Could not fetch user with ID {self.owner_id}")
-                owner_user = None
-
-        owner_mention = owner_user.mention if owner_user else f"<@{self.owner_id}>"
-
-        # Get Activision IDs from the database
-        members_text = ""
-        for member in self.members_joined:
-            with app.app_context():
-                member_user = User.query.filter_by(discord_id=str(member.id)).first()
-                activision_id = member_user.activision_id if member_user else "Unknown"
-
-            members_text += f"- {member.mention} - `{activision_id}`\n"
-
-        # Get the original message
-        message = interaction.message
-        embed = message.embeds[0]
-
-        # Update the embed with current team members
-        embed.set_field_at(
-            3,  # Assuming the team members field is at index 3
-            name=f"👥 Equipo ({len(self.members_joined) + 1}/{self.max_players})",
-            value=f"{owner_mention} (Líder)\n{members_text}" if members_text else f"{owner_mention} (Líder)",
-            inline=False
+        content = (
+            f"📢 {interaction.user.mention} se ha unido a tu equipo de {search['mode']}.\n"
+            f"Activision ID: `{user.activision_id}`\n"
+            f"K/D: `{user.kd_ratio}`"
         )
+        outbound.submit(f"dm:{self.owner_id}", lambda: send_dm(self.owner_id, content), priority=PRIORITY_DM)
+
+        # Update the original message with current team members; a burst of joins
+        # is coalesced into a single edit rendered from the latest roster
+        edit_scheduler.schedule(interaction.message, lambda: self.render(search))
+
+    async def render(self, search, cancelled_by=None):
+        """Edit kwargs of the search message, rebuilt from the search and its roster.
 
-        await message.edit(embed=embed)
+        Every edit is rendered from state rather than from the message, so an
+        edit replacing a pending one never undoes what that one would have shown.
+        """
+        # Load the whole roster (owner + members) in a single query
+        roster = await repository.get_team_roster(search['team_id']) if 'team_id' in search else None
+
+        if roster:
+            name, value = roster_field(roster)
+        else:
+            members_text = "".join(f"- <@{member_id}>\n" for member_id in self.members_joined)
+            name = f"👥 Equipo ({len(self.members_joined) + 1}/{self.max_players})"
+            value = f"<@{self.owner_id}> (Líder)\n{members_text}"
+
+        embed = search_embed(search, roster.owner if roster else None)
+        embed.set_field_at(3, name=name, value=value, inline=False)
+        if cancelled_by:
+            embed.colour = discord.Colour.red()
+            embed.title = "📢 BÚSQUEDA CANCELADA"
+            embed.description = f"{cancelled_by} ha cancelado esta búsqueda de equipo."
+        return {'embed': embed, 'view': self}
 
     @discord.ui.button(label="Actualizar", style=discord.ButtonStyle.primary, emoji="🔄", custom_id="update_team")
+    @acknowledged()
     async def update_team(self, interaction: discord.Interaction, button: discord.ui.Button):
         # Check if search still exists
         if self.search_id not in team_searches:
@@ -254,13 +473,14 @@ class TeamFinderView(discord.ui.View):
                 ephemeral=True
             )
             return
+        search = team_searches[self.search_id]
 
         # Check if user is in voice channel
         voice_state = interaction.user.voice
         if voice_state and voice_state.channel:
             # Update the voice channel ID
             self.voice_channel_id = voice_state.channel.id
-            team_searches[self.search_id]['voice_channel_id'] = voice_state.channel.id
+            search['voice_channel_id'] = voice_state.channel.id
 
             await interaction.response.send_message(
                 f"✅ Se ha actualizado el canal de voz a: {voice_state.channel.name}",
@@ -274,45 +494,13 @@ class TeamFinderView(discord.ui.View):
             if self.voice_channel_id:
                 # Remove the voice channel if the user is no longer in one
                 self.voice_channel_id = None
-                if 'voice_channel_id' in team_searches[self.search_id]:
-                    del team_searches[self.search_id]['voice_channel_id']
+                search.pop('voice_channel_id', None)
 
         # Update the message
-        message = interaction.message
-        embed = message.embeds[0]
-
-        # Update voice channel field or add it if it doesn't exist
-        voice_channel_info = "No conectado a canal de voz"
-        if self.voice_channel_id:
-            voice_channel = interaction.guild.get_channel(self.voice_channel_id)
-            voice_channel_info = f"🔊 {voice_channel.name}" if voice_channel else "Canal desconocido"
-
-        # Check if voice channel field exists
-        voice_field_index = None
-        for i, field in enumerate(embed.fields):
-            if field.name.startswith("🔊 Canal de Voz"):
-                voice_field_index = i
-                break
-
-        if voice_field_index is not None:
-            # Update existing field
-            embed.set_field_at(
-                voice_field_index,
-                name="🔊 Canal de Voz",
-                value=voice_channel_info,
-                inline=False
-            )
-        else:
-            # Add new field
-            embed.add_field(
-                name="🔊 Canal de Voz",
-                value=voice_channel_info,
-                inline=False
-            )
-
-        await message.edit(embed=embed)
+        edit_scheduler.schedule(interaction.message, lambda: self.render(search))
 
     @discord.ui.button(label="Cancelar búsqueda", style=discord.ButtonStyle.danger, emoji="❌", custom_id="cancel_search")
+    @acknowledged()
     async def cancel_search(self, interaction: discord.Interaction, button: discord.ui.Button):
         # Only the owner can cancel the search
         if interaction.user.id != self.owner_id:
@@ -331,46 +519,233 @@ class TeamFinderView(discord.ui.View):
             return
 
         # Remove search from active searches
-        del team_searches[self.search_id]
-
-        # Update the message
-        embed = interaction.message.embeds[0]
-        embed.colour = discord.Colour.red()
-        embed.title = "📢 BÚSQUEDA CANCELADA"
-        embed.description = f"{interaction.user.mention} ha cancelado esta búsqueda de equipo."
+        search = team_searches.pop(self.search_id)
+        open_teams.remove(self.search_id)
+        if 'team_id' in search:
+            await repository.deactivate_team(search['team_id'])
+        team_events.publish(SEARCH_CANCELLED, search.get('guild_id'), team_id=search.get('team_id'))
 
         # Disable all buttons
         for item in self.children:
             item.disabled = True
 
-        await interaction.message.edit(embed=embed, view=self)
+        expiring.cancel(SEARCH, self.search_id)
+        self.stop()
+        cancelled_by = interaction.user.mention
+        edit_scheduler.schedule(interaction.message, lambda: self.render(search, cancelled_by))
         await interaction.response.send_message(
             "✅ Has cancelado esta búsqueda de equipo.",
             ephemeral=True
         )
 
+async def rehydrate_team_searches():
+    """Rebuild team_searches and re-register TeamFinderViews for every active search"""
+    started = time.perf_counter()
+    active_searches = await repository.load_active_searches()
+
+    restored = 0
+    for active in active_searches:
+        team = active.team
+        # With shards split across processes, each process restores only its own guilds
+        if not owns_guild(team.guild_id):
+            continue
+        restored += 1
+        owner_id = int(active.owner_discord_id)
+        message_id = int(team.discord_message_id)
+        search_id = search_id_for(owner_id, team.id)
+
+        team_searches[search_id] = {
+            'owner_id': owner_id,
+            'platform': team.platform,
+            'mode': team.mode,
+            'kd_min': team.kd_minimum,
+            'max_players': team.max_players,
+            'description': team.description,
+            'team_id': team.id,
+            'guild_id': int(team.guild_id) if team.guild_id else None,
+            'channel_id': int(team.channel_id) if team.channel_id else None,
+            'message_id': message_id
+        }
+
+        view = TeamFinderView(owner_id, search_id, team.max_players)
+        view.members_joined = [int(discord_id) for discord_id in active.member_discord_ids]
+        bot.add_view(view, message_id=message_id)
+        expire_after(
+            SEARCH, search_id, team_searches[search_id]['channel_id'], [message_id], [view],
+            since=utc_timestamp(team.created_at)
+        )
+
+        open_teams.add(
+            search_id, team_searches[search_id]['guild_id'], team.platform, team.mode, team.kd_minimum,
+            team.max_players - 1 - len(view.members_joined)
+        )
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info(f"♻️ {restored} búsquedas activas restauradas en {elapsed_ms:.1f} ms")
+
+async def rehydrate_tournaments():
+    """Re-register the registration and bracket views of tournaments still in progress"""
+    started = time.perf_counter()
+    active_tournaments = await repository.load_active_tournaments()
+
+    restored = 0
+    for active in active_tournaments:
+        tournament = active.tournament
+        if not owns_guild(tournament.guild_id):
+            continue
+        restored += 1
+        owner_id = int(tournament.owner_discord_id)
+        view = TournamentView(tournament.id, owner_id, tournament.team_size)
+        bot.add_view(view, message_id=int(tournament.discord_message_id))
+        message_ids = [int(tournament.discord_message_id)]
+        views = [view]
+
+        if tournament.status == 'running' and tournament.bracket_message_id and active.matches:
+            bracket = Bracket.from_records(active.matches, double=tournament.format == 'double')
+            names = {entry.id: entry.name for entry in active.entries}
+            bracket_view = BracketView(tournament.id, owner_id, bracket, names)
+            bot.add_view(bracket_view, message_id=int(tournament.bracket_message_id))
+            message_ids.append(int(tournament.bracket_message_id))
+            views.append(bracket_view)
+
+        expire_after(
+            TOURNAMENT, tournament.id, int(tournament.channel_id) if tournament.channel_id else None,
+            message_ids, views, since=utc_timestamp(tournament.updated_at)
+        )
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info(f"♻️ {restored} torneos restaurados en {elapsed_ms:.1f} ms")
+
+async def restore_state():
+    """Close what expired while the bot was down and restore the rest, once per process"""
+    global searches_rehydrated, member_sync
+    if searches_rehydrated:
+        return
+    try:
+        # Rows whose TTL passed while the bot was down are closed before restoring the rest
+        now = datetime.utcnow()
+        teams, tournaments = await repository.expire_stale(
+            now - timedelta(seconds=EXPIRY_TTL[SEARCH]),
+            now - timedelta(seconds=EXPIRY_TTL[TOURNAMENT]),
+            shard_ids=SHARD_IDS, shard_count=SHARD_COUNT
+        )
+        logger.info(f"⌛ {teams} equipos y {tournaments} torneos caducados mientras el bot no estaba")
+        await rehydrate_team_searches()
+        await rehydrate_tournaments()
+        if LOW_MEMORY:
+            member_sync = asyncio.create_task(sync_guilds_gradually([guild.id for guild in bot.guilds]))
+        else:
+            for guild in bot.guilds:
+                await sync_guild_members(guild)
+        searches_rehydrated = True
+    except Exception as e:
+        logger.error(f"❌ Error restaurando búsquedas activas: {e}")
+
 @bot.event
 async def on_ready():
     logger.info(f"✅ Bot conectado como {bot.user}")
 
-    # Set bot activity
-    await bot.change_presence(activity=discord.Game(name="Warzone | /buscar_equipo"))
+    # The member cache is rebuilt on every non-resumed connection, so the
+    # presence index is rebuilt with it
+    if JUGADORES_ENABLED:
+        for guild in bot.guilds:
+            presence_index.rebuild(guild)
+
+    # Commands, views and background tasks from the first on_ready are still in
+    # place after a reconnect; only a restore that failed is retried
+    global startup_done, loop_watcher
+    if startup_done:
+        await restore_state()
+        logger.info("🔁 Reconectado, comandos y búsquedas ya estaban cargados")
+        return
 
-    # Sync commands
+    # Sync commands only if they changed since the last successful sync
     try:
-        synced = await tree.sync()
-        logger.info(f"🌐 {len(synced)} comandos sincronizados")
+        await command_sync.sync(force=FORCE_COMMAND_SYNC)
     except Exception as e:
         logger.error(f"❌ Error sincronizando comandos: {e}")
 
-    # Register global views (for persistent buttons)
-    for search_id, search in team_searches.items():
-        voice_channel_id = search.get('voice_channel_id', None)
-        bot.add_view(TeamFinderView(search['owner_id'], search_id, search['max_players'], voice_channel_id))
+    # Restore open searches and their persistent buttons from the database
+    await restore_state()
+
+    matchmaker.start()
+    expire_stale.start()
+    if JUGADORES_ENABLED:
+        sample_presence.start()
+    loop_watcher = asyncio.create_task(metrics.watch_event_loop())
+    startup_done = True
 
     logger.info("🔄 Bot listo y esperando comandos")
 
+@bot.event
+async def on_shard_ready(shard_id):
+    logger.info(f"🧩 Shard {shard_id} conectado")
+
+@bot.event
+async def on_shard_resumed(shard_id):
+    logger.info(f"🧩 Shard {shard_id} reanudado")
+
+@bot.event
+async def on_shard_disconnect(shard_id):
+    logger.warning(f"Shard {shard_id} disconnected")
+
+async def guild_member_ids(guild):
+    """IDs of every member of guild, requested from the gateway when the cache does not hold them all"""
+    if guild.chunked:
+        return [member.id for member in guild.members]
+    return [member.id for member in await guild.chunk(cache=False)]
+
+async def sync_guild_members(guild):
+    """Bring the guild's member rows in line with who is in the guild right now"""
+    added, removed = await repository.sync_guild_members(guild.id, await guild_member_ids(guild))
+    if added or removed:
+        logger.info(f"👥 {guild.name}: {added} jugadores añadidos y {removed} eliminados")
+
+async def sync_guilds_gradually(guild_ids):
+    """Sync the member rows of guild_ids one guild every MEMBER_SYNC_INTERVAL seconds"""
+    for guild_id in guild_ids:
+        await asyncio.sleep(MEMBER_SYNC_INTERVAL)
+        guild = bot.get_guild(guild_id)
+        if guild is None:
+            continue  # Left the guild while it waited its turn
+        try:
+            await sync_guild_members(guild)
+        except Exception as e:
+            logger.error(f"Error syncing members of guild {guild_id}: {e}")
+
+@bot.event
+async def on_guild_join(guild):
+    await sync_guild_members(guild)
+    if JUGADORES_ENABLED:
+        presence_index.rebuild(guild)
+
+@bot.event
+async def on_guild_remove(guild):
+    presence_index.clear_guild(guild.id)
+
+@bot.event
+async def on_member_join(member):
+    await repository.add_guild_member(member.guild.id, member.id)
+
+@bot.event
+async def on_raw_member_remove(payload):
+    # Dispatched for every member who leaves, cached or not; on_member_remove
+    # never fires in LOW_MEMORY mode since no member is cached
+    presence_index.remove(payload.guild_id, payload.user.id)
+    await repository.remove_guild_member(payload.guild_id, payload.user.id)
+
+@bot.event
+async def on_presence_update(before, after):
+    if before.activities != after.activities:
+        presence_index.update(after.guild.id, after.id, after.activities)
+
+@bot.event
+async def on_raw_presence_update(payload):
+    # Only dispatched in LOW_MEMORY mode, where members are not cached for on_presence_update
+    presence_index.update(payload.guild_id, payload.user_id, payload.activities)
+
 @tree.command(name="registrar", description="Registra tu Activision ID para poder unirte a equipos")
+@acknowledged(ack_budget=None)
 async def registrar(interaction: discord.Interaction):
     """Registra tu Activision ID para poder unirte a equipos"""
     modal = RegistrationModal()
@@ -378,61 +753,50 @@ async def registrar(interaction: discord.Interaction):
 
 @tree.command(name="perfil", description="Muestra tu perfil de Warzone registrado")
 @app_commands.describe(publico="Mostrar el perfil públicamente")
+@acknowledged()
 async def perfil(interaction: discord.Interaction, publico: bool = False):
     """Muestra tu perfil de Warzone registrado"""
     discord_id = str(interaction.user.id)
 
-    with app.app_context():
-        # Check if user exists in database
-        user = User.query.filter_by(discord_id=discord_id).first()
+    # Check if user exists in database
+    user = await repository.get_profile(discord_id)
 
-        if not user or not user.activision_id:
-            await interaction.response.send_message(
-                "⚠️ No has registrado tu Activision ID todavía. Usa `/registrar`",
-                ephemeral=True
-            )
-            return
-
-        # Create an embed with user profile information
-        embed = discord.Embed(
-            title=f"🎮 Perfil de {interaction.user.display_name}",
-            description="Información registrada para encontrar equipos en Warzone",
-            color=0x3498db
+    if not user or not user.activision_id:
+        await interaction.response.send_message(
+            "⚠️ No has registrado tu Activision ID todavía. Usa `/registrar`",
+            ephemeral=True
         )
+        return
 
-        # Add user information
-        embed.add_field(name="📋 Discord", value=interaction.user.mention, inline=True)
-        embed.add_field(name="🆔 Activision ID", value=f"`{user.activision_id}`", inline=True)
-        embed.add_field(name="📊 K/D Ratio", value=f"`{user.kd_ratio}`", inline=True)
+    # Create an embed with user profile information
+    embed = discord.Embed(
+        title=f"🎮 Perfil de {interaction.user.display_name}",
+        description="Información registrada para encontrar equipos en Warzone",
+        color=0x3498db
+    )
 
-        # Set user avatar as thumbnail if available
-        if interaction.user.avatar:
-            embed.set_thumbnail(url=interaction.user.avatar.url)
+    # Add user information
+    embed.add_field(name="📋 Discord", value=interaction.user.mention, inline=True)
+    embed.add_field(name="🆔 Activision ID", value=f"`{user.activision_id}`", inline=True)
+    embed.add_field(name="📊 K/D Ratio", value=f"`{user.kd_ratio}`", inline=True)
+
+    # Set user avatar as thumbnail if available
+    if interaction.user.avatar:
+        embed.set_thumbnail(url=interaction.user.avatar.url)
 
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 @tree.command(name="buscar_equipo", description="Busca equipo para Warzone")
 @app_commands.choices(
-    plataforma=[
-        app_commands.Choice(name="PC", value="PC"),
-        app_commands.Choice(name="Xbox", value="Xbox"),
-        app_commands.Choice(name="PlayStation", value="PlayStation"),
-        app_commands.Choice(name="Crossplay", value="Crossplay")
-    ],
-    modo=[
-        app_commands.Choice(name="Battle Royale", value="Battle Royale"),
-        app_commands.Choice(name="Resurgimiento", value="Resurgimiento"),
-        app_commands.Choice(name="Ranked BR", value="Ranked BR"),
-        app_commands.Choice(name="Ranked Multijugador", value="Ranked Multijugador"),
-        app_commands.Choice(name="Zombies", value="Zombies"),
-        app_commands.Choice(name="Saqueo", value="Saqueo")
-    ],
+    plataforma=PLATFORM_CHOICES,
+    modo=SEARCH_MODE_CHOICES,
     max_jugadores=[
         app_commands.Choice(name="Duo (2)", value=2),
         app_commands.Choice(name="Trio (3)", value=3),
         app_commands.Choice(name="Squad (4)", value=4),
     ]
 )
+@acknowledged(ack_budget=ACK_BUDGET)
 async def buscar_equipo(
     interaction: discord.Interaction,
     plataforma: app_commands.Choice[str],
@@ -445,18 +809,14 @@ async def buscar_equipo(
     discord_id = str(interaction.user.id)
 
     # Get user from database
-    with app.app_context():
-        user = User.query.filter_by(discord_id=discord_id).first()
+    user = await repository.get_profile(discord_id)
 
-        if not user or not user.activision_id:
-            await interaction.response.send_message(
-                "⚠️ Necesitas registrar tu Activision ID primero. Usa `/registrar`",
-                ephemeral=True
-            )
-            return
-
-    # Create a unique ID for this search
-    search_id = f"{discord_id}_{len(team_searches) + 1}"
+    if not user or not user.activision_id:
+        await interaction.response.send_message(
+            "⚠️ Necesitas registrar tu Activision ID primero. Usa `/registrar`",
+            ephemeral=True
+        )
+        return
 
     # Check KD value is valid
     if kd_minimo < 0:
@@ -466,40 +826,20 @@ async def buscar_equipo(
         )
         return
 
-    # Create the embed with team search details
-    embed = discord.Embed(
-        title="📣 BÚSQUEDA DE EQUIPO",
-        description=f"{interaction.user.mention} busca equipo para Warzone",
-        color=0x00ff00
-    )
-
-    # Add fields with search details
-    embed.add_field(name="🖥️ Plataforma", value=plataforma.value, inline=True)
-    embed.add_field(name="🎮 Modo", value=modo.value, inline=True)
-    embed.add_field(name="📊 K/D Mínimo", value=str(kd_minimo), inline=True)
-    embed.add_field(
-        name=f"👥 Equipo (1/{max_jugadores.value})",
-        value=f"{interaction.user.mention} (Líder)",
-        inline=False
-    )
-
-    # Add user's own KD
-    embed.add_field(
-        name="👑 Líder K/D",
-        value=str(user.kd_ratio),
-        inline=True
-    )
-
-    # Add Activision ID
-    embed.add_field(
-        name="🆔 Activision ID",
-        value=f"`{user.activision_id}`",
-        inline=True
+    # Store search in database
+    new_team = await repository.create_team(
+        owner_id=user.id,
+        platform=plataforma.value,
+        mode=modo.value,
+        kd_minimum=kd_minimo,
+        max_players=max_jugadores.value,
+        description=descripcion,
+        guild_id=interaction.guild_id,
+        channel_id=interaction.channel_id
     )
 
-    # Add description if provided
-    if descripcion:
-        embed.add_field(name="📝 Descripción", value=descripcion, inline=False)
+    # Create a unique ID for this search (stable across restarts)
+    search_id = search_id_for(discord_id, new_team.id)
 
     # Store search details in memory
     team_searches[search_id] = {
@@ -508,49 +848,317 @@ async def buscar_equipo(
         'mode': modo.value,
         'kd_min': kd_minimo,
         'max_players': max_jugadores.value,
-        'description': descripcion
+        'description': descripcion,
+        'team_id': new_team.id,
+        'guild_id': interaction.guild_id,
+        'channel_id': interaction.channel_id
     }
-
-    # Store search in database
-    with app.app_context():
-        new_team = Team(
-            owner_id=user.id,
-            platform=plataforma.value,
-            mode=modo.value,
-            kd_minimum=kd_minimo,
-            max_players=max_jugadores.value,
-            description=descripcion,
-            is_active=True
-        )
-        db.session.add(new_team)
-        db.session.commit()
-        team_searches[search_id]['team_id'] = new_team.id
+    open_teams.add(search_id, interaction.guild_id, plataforma.value, modo.value, kd_minimo, max_jugadores.value - 1)
+    team_events.publish(
+        SEARCH_CREATED, interaction.guild_id, team_id=new_team.id, platform=plataforma.value, mode=modo.value,
+        kd_minimum=kd_minimo, players=1, max_players=max_jugadores.value, description=descripcion
+    )
 
     # Check if user is in a voice channel and add it to the search
     voice_channel_id = None
-    voice_channel_info = "No conectado a canal de voz"
-
     if interaction.user.voice and interaction.user.voice.channel:
-        voice_channel = interaction.user.voice.channel
-        voice_channel_id = voice_channel.id
-        voice_channel_info = f"🔊 {voice_channel.name}"
+        voice_channel_id = interaction.user.voice.channel.id
         team_searches[search_id]['voice_channel_id'] = voice_channel_id
 
-        # Add voice channel to embed
+    embed = search_embed(team_searches[search_id], user)
+
+    # Create view with buttons
+    view = TeamFinderView(interaction.user.id, search_id, max_jugadores.value, voice_channel_id)
+
+    # Send the message and remember its ID so the view can be restored after a restart
+    response = await interaction.response.send_message(embed=embed, view=view)
+    if response.message_id:
+        team_searches[search_id]['message_id'] = response.message_id
+        await repository.set_team_message_id(new_team.id, str(response.message_id))
+        expire_after(SEARCH, search_id, interaction.channel_id, [response.message_id], [view])
+
+class OpenTeamsView(discord.ui.View):
+    """Paginated list of open team searches returned by /equipos_abiertos"""
+
+    PAGE_SIZE = 10
+
+    def __init__(self, results, kd_ratio):
+        super().__init__(timeout=180)
+        self.results = results
+        self.kd_ratio = kd_ratio
+        self.page = 0
+        self.page_count = max(1, -(-len(results) // self.PAGE_SIZE))
+        self._update_buttons()
+
+    def _update_buttons(self):
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.page_count - 1
+
+    def build_embed(self):
+        embed = discord.Embed(
+            title="🔎 Equipos Abiertos",
+            description=f"Búsquedas a las que puedes unirte con tu K/D (`{self.kd_ratio}`)",
+            color=0x00ff00
+        )
+
+        start = self.page * self.PAGE_SIZE
+        for team in self.results[start:start + self.PAGE_SIZE]:
+            search = team_searches.get(team.search_id)
+            if not search:
+                continue
+
+            value = (
+                f"👑 <@{search['owner_id']}> · 📊 K/D mín `{team.kd_min}`\n"
+                f"👥 {team.free_slots} plaza(s) libre(s)"
+            )
+            if search.get('message_id') and search.get('channel_id') and search.get('guild_id'):
+                value += (
+                    f" · [Ir a la búsqueda](https://discord.com/channels/"
+                    f"{search['guild_id']}/{search['channel_id']}/{search['message_id']})"
+                )
+            embed.add_field(name=f"🎮 {team.mode} · 🖥️ {team.platform}", value=value, inline=False)
+
+        embed.set_footer(text=f"Página {self.page + 1}/{self.page_count} · {len(self.results)} equipos")
+        return embed
+
+    @discord.ui.button(label="Anterior", style=discord.ButtonStyle.secondary, emoji="⬅️")
+    @acknowledged(ack_budget=ACK_BUDGET)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = max(0, self.page - 1)
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.button(label="Siguiente", style=discord.ButtonStyle.secondary, emoji="➡️")
+    @acknowledged(ack_budget=ACK_BUDGET)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = min(self.page_count - 1, self.page + 1)
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+@tree.command(name="equipos_abiertos", description="Muestra los equipos abiertos a los que puedes unirte")
+@app_commands.describe(plataforma="Filtrar por plataforma", modo="Filtrar por modo de juego")
+@app_commands.choices(
+    plataforma=PLATFORM_CHOICES,
+    modo=SEARCH_MODE_CHOICES
+)
+@acknowledged()
+async def equipos_abiertos(
+    interaction: discord.Interaction,
+    plataforma: app_commands.Choice[str] = None,
+    modo: app_commands.Choice[str] = None
+):
+    """Lista las búsquedas activas con plazas libres que aceptan tu K/D"""
+    user = await repository.get_profile(interaction.user.id)
+
+    if not user or not user.activision_id:
+        await interaction.response.send_message(
+            "⚠️ Necesitas registrar tu Activision ID primero. Usa `/registrar`",
+            ephemeral=True
+        )
+        return
+
+    results = [
+        team for team in open_teams.eligible(
+            user.kd_ratio or 0.0,
+            interaction.guild_id,
+            platform=plataforma.value if plataforma else None,
+            mode=modo.value if modo else None
+        )
+        if team_searches.get(team.search_id, {}).get('owner_id') != interaction.user.id
+    ]
+
+    if not results:
+        await interaction.response.send_message(
+            "⚠️ No hay equipos abiertos que coincidan con tus filtros.",
+            ephemeral=True
+        )
+        return
+
+    view = OpenTeamsView(results, user.kd_ratio)
+    await interaction.response.send_message(embed=view.build_embed(), view=view, ephemeral=True)
+
+@tree.command(name="cola", description="Entra en la cola de emparejamiento automático")
+@app_commands.describe(tamanio_equipo="Tamaño del equipo que quieres formar")
+@app_commands.choices(
+    plataforma=PLATFORM_CHOICES,
+    modo=SEARCH_MODE_CHOICES,
+    tamanio_equipo=[
+        app_commands.Choice(name="Duo (2)", value=2),
+        app_commands.Choice(name="Trio (3)", value=3),
+        app_commands.Choice(name="Squad (4)", value=4),
+    ]
+)
+@acknowledged()
+async def cola(
+    interaction: discord.Interaction,
+    plataforma: app_commands.Choice[str],
+    modo: app_commands.Choice[str],
+    tamanio_equipo: app_commands.Choice[int]
+):
+    """Pone al jugador en la cola para formar equipo automáticamente por K/D"""
+    user = await repository.get_profile(interaction.user.id)
+
+    if not user or not user.activision_id:
+        await interaction.response.send_message(
+            "⚠️ Necesitas registrar tu Activision ID primero. Usa `/registrar`",
+            ephemeral=True
+        )
+        return
+
+    queued = matchmaking_queue.enqueue(
+        interaction.user.id,
+        user.id,
+        user.kd_ratio,
+        plataforma.value,
+        modo.value,
+        tamanio_equipo.value,
+        guild_id=interaction.guild_id,
+        channel_id=interaction.channel_id
+    )
+    if not queued:
+        await interaction.response.send_message(
+            "⚠️ Ya estás en la cola. Usa `/salir_cola` para salir.",
+            ephemeral=True
+        )
+        return
+
+    await interaction.response.send_message(
+        f"⏳ Estás en la cola de {modo.value} ({plataforma.value}, {tamanio_equipo.value} jugadores).\n"
+        f"Jugadores en cola: `{len(matchmaking_queue)}`. Te avisaremos cuando se forme tu equipo.",
+        ephemeral=True
+    )
+
+@tree.command(name="salir_cola", description="Sal de la cola de emparejamiento automático")
+@acknowledged()
+async def salir_cola(interaction: discord.Interaction):
+    """Saca al jugador de la cola de emparejamiento"""
+    if matchmaking_queue.dequeue(interaction.user.id) is None:
+        await interaction.response.send_message("⚠️ No estás en la cola.", ephemeral=True)
+        return
+
+    await interaction.response.send_message("✅ Has salido de la cola.", ephemeral=True)
+
+@tasks.loop(seconds=MATCHMAKING_INTERVAL)
+async def matchmaker():
+    """Form full teams from the matchmaking queue and announce them"""
+    started = time.perf_counter()
+    groups = matchmaking_queue.form_teams()
+    if not groups:
+        return
+
+    # The player with the highest K/D leads the team
+    groups = [sorted(group, key=lambda entry: entry.kd_ratio, reverse=True) for group in groups]
+    try:
+        team_ids = await repository.create_full_teams([
+            (group[0].user_id, group[0].platform, group[0].mode, [entry.user_id for entry in group[1:]],
+             group[0].guild_id, group[0].channel_id)
+            for group in groups
+        ])
+    except Exception as e:
+        # Back in the queue for the next tick rather than silently dropped
+        matchmaking_queue.requeue(groups)
+        logger.error(f"Error saving matchmaking teams, {len(groups)} teams returned to the queue: {e}")
+        return
+
+    for team_id, group in zip(team_ids, groups):
+        leader = group[0]
+        channel = bot.get_channel(leader.channel_id) if leader.channel_id else None
+        if channel is None:
+            logger.warning(f"Could not announce matchmaking team {team_id}: channel {leader.channel_id} not found")
+            continue
+
+        average_kd = sum(entry.kd_ratio for entry in group) / len(group)
+        embed = discord.Embed(
+            title="🤝 EQUIPO FORMADO",
+            description="La cola de emparejamiento ha formado un equipo",
+            color=0x00ff00
+        )
+        embed.add_field(name="🖥️ Plataforma", value=leader.platform, inline=True)
+        embed.add_field(name="🎮 Modo", value=leader.mode, inline=True)
+        embed.add_field(name="📊 K/D Medio", value=f"{average_kd:.2f}", inline=True)
         embed.add_field(
-            name="🔊 Canal de Voz",
-            value=voice_channel_info,
+            name=f"👥 Equipo ({len(group)}/{leader.squad_size})",
+            value="\n".join(
+                f"<@{entry.discord_id}>{' (Líder)' if entry is leader else ''} - K/D `{entry.kd_ratio}`"
+                for entry in group
+            ),
             inline=False
         )
 
-    # Create view with buttons
-    view = TeamFinderView(interaction.user.id, search_id, max_jugadores.value, voice_channel_id)
+        content = " ".join(f"<@{entry.discord_id}>" for entry in group)
+        outbound.submit(
+            f"channel:{channel.id}",
+            lambda channel=channel, content=content, embed=embed: channel.send(content=content, embed=embed),
+            priority=PRIORITY_MESSAGE
+        )
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    stats = matchmaking_queue.stats()
+    logger.info(
+        f"🤝 {len(groups)} equipos formados en {elapsed_ms:.1f} ms - "
+        f"en cola: {stats['queue_depth']}, espera p95: {stats['time_to_match_p95']} s"
+    )
+
+@tasks.loop(seconds=EXPIRY_INTERVAL)
+async def expire_stale():
+    """Close searches, private matches and tournaments whose TTL has passed"""
+    due = expiring.pop_due(time.time())
+    if not due:
+        return
 
-    # Send the message
-    await interaction.response.send_message(embed=embed, view=view)
+    team_ids, match_ids, tournament_ids = [], [], []
+    for item in due:
+        expired_total[item.kind] += 1
+        if item.kind == SEARCH:
+            search = team_searches.pop(item.key, None)
+            open_teams.remove(item.key)
+            if search and 'team_id' in search:
+                team_ids.append(search['team_id'])
+                team_events.publish(SEARCH_EXPIRED, search.get('guild_id'), team_id=search['team_id'])
+        elif item.kind == PRIVATE_MATCH:
+            match_ids.append(item.key)
+        else:
+            tournament_ids.append(item.key)
+
+    # One UPDATE per kind for the whole batch
+    try:
+        if team_ids or match_ids:
+            await repository.deactivate_teams(team_ids, match_ids)
+        if tournament_ids:
+            await repository.expire_tournaments(tournament_ids)
+    except Exception as e:
+        logger.error(f"Error expiring stale rows: {e}")
+
+    # Stopping the views drops them from the view store; the messages keep their
+    # content but get their buttons disabled
+    for item in due:
+        for view in item.views:
+            for child in view.children:
+                child.disabled = True
+            view.stop()
+        if item.channel_id:
+            channel = bot.get_partial_messageable(item.channel_id)
+            for message_id, view in zip(item.message_ids, item.views):
+                message = channel.get_partial_message(message_id)
+                outbound.submit(
+                    f"channel:{item.channel_id}",
+                    lambda message=message, view=view: message.edit(view=view),
+                    priority=PRIORITY_EDIT
+                )
+
+    logger.info(
+        f"⌛ {len(team_ids)} búsquedas, {len(match_ids)} partidas privadas y "
+        f"{len(tournament_ids)} torneos caducados - quedan {len(expiring)} programados"
+    )
+
+@tasks.loop(seconds=PRESENCE_SAMPLE_INTERVAL)
+async def sample_presence():
+    """Record how many members of each guild are playing Call of Duty"""
+    presence_index.sample()
 
 @tree.command(name="ver_perfil", description="Ver el perfil de un usuario")
 @app_commands.describe(usuario="Usuario del que quieres ver el perfil (opcional)", publico="Mostrar el perfil públicamente")
+@acknowledged(ephemeral=lambda publico=False, **_: not publico, ack_budget=ACK_BUDGET)
 async def ver_perfil(
     interaction: discord.Interaction, 
     usuario: discord.Member = None,
@@ -559,66 +1167,61 @@ async def ver_perfil(
     """Ver el perfil de un usuario o el tuyo propio"""
     target_user = usuario or interaction.user
 
-    with app.app_context():
-        # Get user from database
-        user = User.query.filter_by(discord_id=str(target_user.id)).first()
-
-        if not user or not user.activision_id:
-            await interaction.response.send_message(
-                f"⚠️ {target_user.mention} no tiene un perfil registrado. Usa `/registrar` para crear uno.",
-                ephemeral=not publico
-            )
-            return
+    # Get user from database
+    user = await repository.get_profile(target_user.id)
 
-        # Create embed for profile
-        embed = discord.Embed(
-            title=f"🎮 Perfil de {target_user.display_name}",
-            description="Información registrada para Warzone",
-            color=0x3498db
+    if not user or not user.activision_id:
+        await interaction.response.send_message(
+            f"⚠️ {target_user.mention} no tiene un perfil registrado. Usa `/registrar` para crear uno.",
+            ephemeral=not publico
         )
+        return
 
-        # Add user information
-        embed.add_field(name="📋 Discord", value=target_user.mention, inline=True)
-        embed.add_field(name="🆔 Activision ID", value=f"`{user.activision_id}`", inline=True)
-        embed.add_field(name="📊 K/D Ratio", value=f"`{user.kd_ratio}`", inline=True)
+    # Create embed for profile
+    embed = discord.Embed(
+        title=f"🎮 Perfil de {target_user.display_name}",
+        description="Información registrada para Warzone",
+        color=0x3498db
+    )
 
-        # Add registration date
-        embed.add_field(
-            name="📅 Registrado el",
-            value=user.created_at.strftime("%d/%m/%Y"),
-            inline=False
-        )
+    # Add user information
+    embed.add_field(name="📋 Discord", value=target_user.mention, inline=True)
+    embed.add_field(name="🆔 Activision ID", value=f"`{user.activision_id}`", inline=True)
+    embed.add_field(name="📊 K/D Ratio", value=f"`{user.kd_ratio}`", inline=True)
+
+    # Add registration date
+    embed.add_field(
+        name="📅 Registrado el",
+        value=user.created_at.strftime("%d/%m/%Y"),
+        inline=False
+    )
 
-        # Set user avatar as thumbnail if available
-        if target_user.avatar:
-            embed.set_thumbnail(url=target_user.avatar.url)
+    # Set user avatar as thumbnail if available
+    if target_user.avatar:
+        embed.set_thumbnail(url=target_user.avatar.url)
 
     await interaction.response.send_message(
         embed=embed,
         ephemeral=not publico
     )
 
+def player_list(players):
+    """Embed field value listing (member_id, game) pairs, cut to Discord's 1024 character limit"""
+    lines = [f"• <@{member_id}> - {game}" for member_id, game in players]
+    value = "\n".join(lines)
+    shown = len(lines)
+    while len(value) > 1024:
+        shown -= 1
+        value = "\n".join(lines[:shown]) + f"\n… y {len(lines) - shown} más"
+    return value
+
 @tree.command(name="jugadores", description="Muestra los jugadores en línea jugando Call of Duty")
+@acknowledged(ephemeral=False, ack_budget=ACK_BUDGET)
 async def jugadores(interaction: discord.Interaction):
     """Muestra los jugadores que están jugando Call of Duty"""
 
-    # Create embeds for different games
-    warzone_players = []
-    black_ops_players = []
-    other_cod_players = []
-
-    # Check all members in the server
-    for member in interaction.guild.members:
-        if member.activity and isinstance(member.activity, discord.Activity):
-            activity_name = member.activity.name.lower()
-
-            # Check different CoD games
-            if "warzone" in activity_name:
-                warzone_players.append(member)
-            elif "black ops" in activity_name:
-                black_ops_players.append(member)
-            elif "call of duty" in activity_name or "cod" in activity_name:
-                other_cod_players.append(member)
+    # Read from the presence index instead of scanning every member of the guild
+    players = presence_index.players(interaction.guild_id)
 
     # Create embed
     embed = discord.Embed(
@@ -628,58 +1231,159 @@ async def jugadores(interaction: discord.Interaction):
     )
 
     # Add fields for each game
-    if warzone_players:
-        players_str = "\n".join([f"• {player.mention} - {player.activity.name}" for player in warzone_players])
-        embed.add_field(name="🔫 Warzone", value=players_str, inline=False)
-    else:
-        embed.add_field(name="🔫 Warzone", value="No hay jugadores en Warzone", inline=False)
-
-    if black_ops_players:
-        players_str = "\n".join([f"• {player.mention} - {player.activity.name}" for player in black_ops_players])
-        embed.add_field(name="⚔️ Black Ops", value=players_str, inline=False)
-    else:
-        embed.add_field(name="⚔️ Black Ops", value="No hay jugadores en Black Ops", inline=False)
+    embed.add_field(
+        name="🔫 Warzone",
+        value=player_list(players[WARZONE]) if players[WARZONE] else "No hay jugadores en Warzone",
+        inline=False
+    )
+    embed.add_field(
+        name="⚔️ Black Ops",
+        value=player_list(players[BLACK_OPS]) if players[BLACK_OPS] else "No hay jugadores en Black Ops",
+        inline=False
+    )
+    if players[OTHER_COD]:
+        embed.add_field(name="🎯 Otros CoD", value=player_list(players[OTHER_COD]), inline=False)
 
-    if other_cod_players:
-        players_str = "\n".join([f"• {player.mention} - {player.activity.name}" for player in other_cod_players])
-        embed.add_field(name="🎯 Otros CoD", value=players_str, inline=False)
+    peak = presence_index.peak_hour(interaction.guild_id)
+    if peak:
+        embed.set_footer(text=f"Hora pico: {peak[0]:02d}:00 UTC (media de {peak[1]} jugadores)")
 
     await interaction.response.send_message(embed=embed)
 
-@tree.command(name="jugadores_inscritos", description="Muestra la lista de jugadores registrados")
-@app_commands.describe(publico="Mostrar la lista públicamente")
-async def jugadores_inscritos(interaction: discord.Interaction, publico: bool = False):
-    """Muestra la lista de todos los jugadores registrados"""
-    with app.app_context():
-        users = User.query.all()
+if not JUGADORES_ENABLED:
+    tree.remove_command("jugadores")
+
+PLAYER_ORDER_CHOICES = [
+    app_commands.Choice(name="K/D", value="kd"),
+    app_commands.Choice(name="Activision ID", value="name")
+]
+
+class PlayersView(discord.ui.View):
+    """Registered players of a guild, one keyset-paginated page at a time"""
+
+    PAGE_SIZE = 15
+
+    def __init__(self, guild, order, title, description):
+        super().__init__(timeout=180)
+        self.guild = guild
+        self.order = order
+        self.title = title
+        self.description = description
+        self.players = []
+        self.names = {}
+        self.page = 0
+        self.has_next = False
+
+    def cursor(self, profile):
+        if self.order == 'kd':
+            return (profile.kd_ratio or 0.0, profile.id)
+        return (profile.activision_id, profile.id)
+
+    async def load(self, after=None, before=None):
+        """Load the page after/before a cursor, returns False if there is nothing there"""
+        players, has_more = await repository.players_page(
+            self.guild.id, self.order, after=after, before=before, limit=self.PAGE_SIZE
+        )
+        if not players:
+            return False
 
-        if not users:
-            await interaction.response.send_message(
-                "⚠️ No hay jugadores registrados todavía.",
-                ephemeral=not publico
+        if before is not None:
+            self.page -= 1
+            self.has_next = True
+        else:
+            self.page = self.page + 1 if after is not None else 0
+            self.has_next = has_more
+        self.players = players
+        self.names = await display_names(self.guild, [int(profile.discord_id) for profile in players])
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = not self.has_next
+        return True
+
+    def build_embed(self):
+        embed = discord.Embed(title=self.title, description=self.description, color=0x3498db)
+        for profile in self.players:
+            embed.add_field(
+                name=f"👤 {self.names.get(int(profile.discord_id), profile.username)}",
+                value=f"Activision ID: `{profile.activision_id}`\nK/D: `{profile.kd_ratio}`",
+                inline=True
             )
-            return
+        order = "K/D" if self.order == 'kd' else "Activision ID"
+        embed.set_footer(text=f"Página {self.page + 1} · Ordenado por {order}")
+        return embed
+
+    @discord.ui.button(label="Anterior", style=discord.ButtonStyle.secondary, emoji="⬅️")
+    @acknowledged(ack_budget=ACK_BUDGET)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.page > 0:
+            await self.load(before=self.cursor(self.players[0]))
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.button(label="Siguiente", style=discord.ButtonStyle.secondary, emoji="➡️")
+    @acknowledged(ack_budget=ACK_BUDGET)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.has_next and not await self.load(after=self.cursor(self.players[-1])):
+            self.has_next = False
+            button.disabled = True
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+async def display_names(guild, member_ids):
+    """{member_id: display name} for the members of guild among member_ids.
+
+    Cached members are read directly; the rest come from the name cache or,
+    failing that, from one gateway member query per 100 IDs.
+    """
+    names = {}
+    missing = []
+    for member_id in member_ids:
+        member = guild.get_member(member_id)
+        name = member.display_name if member else member_names.get(guild.id, member_id)
+        if name is None:
+            missing.append(member_id)
+        else:
+            names[member_id] = name
 
-        embed = discord.Embed(
-            title="📋 Lista de Jugadores Registrados",
-            description="Jugadores registrados en el bot",
-            color=0x3498db
-        )
+    for start in range(0, len(missing), 100):
+        batch = missing[start:start + 100]
+        try:
+            members = await guild.query_members(user_ids=batch, limit=len(batch), cache=False)
+        except (asyncio.TimeoutError, discord.ClientException) as e:
+            logger.warning(f"Could not fetch members of guild {guild.id}: {e}")
+            break
+        for member in members:
+            member_names.put(guild.id, member.id, member.display_name)
+            names[member.id] = member.display_name
+    return names
+
+async def send_players(interaction, order, title, description, empty_message, ephemeral):
+    """Answer with the first page of the guild's registered players"""
+    if interaction.guild is None:
+        await interaction.response.send_message("⚠️ Este comando solo funciona en un servidor.", ephemeral=True)
+        return
+
+    view = PlayersView(interaction.guild, order.value if order else "kd", title, description)
+    if not await view.load():
+        await interaction.response.send_message(empty_message, ephemeral=True)
+        return
 
-        for user in users:
-            # Get Discord member object
-            member = interaction.guild.get_member(int(user.discord_id))
-            if member:
-                embed.add_field(
-                    name=f"👤 {member.display_name}",
-                    value=f"Activision ID: `{user.activision_id}`\nK/D: `{user.kd_ratio}`",
-                    inline=True
-                )
+    await interaction.response.send_message(embed=view.build_embed(), view=view, ephemeral=ephemeral)
 
-        await interaction.response.send_message(
-            embed=embed,
-            ephemeral=not publico
-        )
+@tree.command(name="jugadores_inscritos", description="Muestra la lista de jugadores registrados")
+@app_commands.describe(publico="Mostrar la lista públicamente", orden="Ordenar por K/D o por Activision ID")
+@app_commands.choices(orden=PLAYER_ORDER_CHOICES)
+@acknowledged(ephemeral=lambda publico=False, **_: not publico, ack_budget=ACK_BUDGET)
+async def jugadores_inscritos(
+    interaction: discord.Interaction,
+    publico: bool = False,
+    orden: app_commands.Choice[str] = None
+):
+    """Muestra la lista de todos los jugadores registrados"""
+    await send_players(
+        interaction, orden,
+        "📋 Lista de Jugadores Registrados",
+        "Jugadores registrados en el bot",
+        "⚠️ No hay jugadores registrados todavía.",
+        ephemeral=not publico
+    )
 
 @tree.command(name="crear_privada", description="Crear una partida privada")
 @app_commands.choices(
@@ -693,6 +1397,7 @@ async def jugadores_inscritos(interaction: discord.Interaction, publico: bool =
         app_commands.Choice(name="Cuartetos (4)", value=4)
     ]
 )
+@acknowledged(ack_budget=ACK_BUDGET)
 async def crear_privada(
     interaction: discord.Interaction,
     modo: app_commands.Choice[str],
@@ -700,21 +1405,29 @@ async def crear_privada(
     descripcion: str = None
 ):
     """Crear una partida privada personalizada"""
+    # The match is stored as a team owned by the host's user row
+    host = await repository.get_profile(str(interaction.user.id))
+    if not host:
+        await interaction.response.send_message(
+            "⚠️ Necesitas registrar tu Activision ID primero. Usa `/registrar`",
+            ephemeral=True
+        )
+        return
+
     # Create unique match ID
     match_id = f"{interaction.guild_id}_{int(datetime.utcnow().timestamp())}"
 
     # Store match info in database
-    with app.app_context():
-        match = Team(
-            owner_id=str(interaction.user.id),
-            mode=modo.value,
-            max_players=tamanio_equipo.value,
-            description=descripcion,
-            discord_message_id=match_id,
-            is_active=True
-        )
-        db.session.add(match)
-        db.session.commit()
+    await repository.create_team(
+        owner_id=host.id,
+        platform="Crossplay",
+        mode=modo.value,
+        max_players=tamanio_equipo.value,
+        description=descripcion,
+        discord_message_id=match_id,
+        guild_id=interaction.guild_id,
+        channel_id=interaction.channel_id
+    )
 
     # Create embed for private match
     embed = discord.Embed(
@@ -735,17 +1448,22 @@ async def crear_privada(
     embed.timestamp = datetime.utcnow()
 
     # Create view with buttons
-    view = PrivateMatchView(match_id, tamanio_equipo.value)
-    await interaction.response.send_message(embed=embed, view=view)
+    view = PrivateMatchView(match_id, tamanio_equipo.value, embed)
+    response = await interaction.response.send_message(embed=embed, view=view)
+    if response.message_id:
+        expire_after(PRIVATE_MATCH, match_id, interaction.channel_id, [response.message_id], [view])
 
 class PrivateMatchView(discord.ui.View):
-    def __init__(self, match_id: str, team_size: int):
+    def __init__(self, match_id: str, team_size: int, embed: discord.Embed):
         super().__init__(timeout=None)
         self.match_id = match_id
         self.team_size = team_size
+        self.embed = embed  # As posted, edits are rendered from it and the view's state
         self.registered_players = []
+        self.cancelled = False
 
     @discord.ui.button(label="Inscribirse", style=discord.ButtonStyle.success, emoji="✅")
+    @acknowledged()
     async def register(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user in self.registered_players:
             await interaction.response.send_message("⚠️ Ya estás inscrito en esta partida.", ephemeral=True)
@@ -754,18 +1472,25 @@ class PrivateMatchView(discord.ui.View):
         self.registered_players.append(interaction.user)
 
         # Update embed
-        embed = interaction.message.embeds[0]
+        edit_scheduler.schedule(interaction.message, self.render)
+        await interaction.response.send_message("✅ Te has inscrito en la partida.", ephemeral=True)
+
+    def render(self):
+        """Edit kwargs of the match message from the posted embed and the current registrations"""
+        embed = self.embed.copy()
         embed.set_field_at(
-            -1, 
+            -1,
             name="✅ Jugadores Inscritos",
             value=str(len(self.registered_players)),
             inline=False
         )
-
-        await interaction.message.edit(embed=embed)
-        await interaction.response.send_message("✅ Te has inscrito en la partida.", ephemeral=True)
+        if self.cancelled:
+            embed.color = discord.Color.red()
+            embed.title = "❌ PARTIDA CANCELADA"
+        return {'embed': embed, 'view': self}
 
     @discord.ui.button(label="Comenzar Sorteo", style=discord.ButtonStyle.primary, emoji="🎲")
+    @acknowledged()
     async def start_draw(self, interaction: discord.Interaction, button: discord.ui.Button):
         if len(self.registered_players) < self.team_size:
             await interaction.response.send_message(
@@ -778,87 +1503,81 @@ class PrivateMatchView(discord.ui.View):
         import random
         random.shuffle(self.registered_players)
 
-        teams = []
-        for i in range(0, len(self.registered_players), self.team_size):
-            team = self.registered_players[i:i + self.team_size]
-            if len(team) == self.team_size:  # Only add complete teams
-                teams.append(team)
+        playing = len(self.registered_players) - len(self.registered_players) % self.team_size
+        teams = [
+            self.registered_players[i:i + self.team_size]
+            for i in range(0, playing, self.team_size)
+        ]
+        bench = self.registered_players[playing:]
+
+        fields = [
+            (f"Equipo {i}", "\n".join([player.mention for player in team]))
+            for i, team in enumerate(teams, 1)
+        ]
+        if bench:
+            fields.append(("🪑 Banquillo", "\n".join([player.mention for player in bench])))
+
+        embeds = paginated_embeds("🎲 Sorteo de Equipos", "Equipos formados aleatoriamente", 0x00ff00, fields)
+        await send_embeds(interaction, embeds)
+
+    @discord.ui.button(label="Sorteo Equilibrado", style=discord.ButtonStyle.primary, emoji="⚖️")
+    @acknowledged()
+    async def balanced_draw(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if len(self.registered_players) < self.team_size:
+            await interaction.response.send_message(
+                f"⚠️ No hay suficientes jugadores inscritos. Se necesitan al menos {self.team_size} jugadores.",
+                ephemeral=True
+            )
+            return
 
-        # Create embed with teams
-        embed = discord.Embed(
-            title="🎲 Sorteo de Equipos",
-            description="Equipos formados aleatoriamente",
-            color=0x00ff00
-        )
+        # Players without a profile count as K/D 0
+        players = list(self.registered_players)
+        profiles = await repository.get_profiles([player.id for player in players])
+        kd_ratios = [
+            (profiles[str(player.id)].kd_ratio or 0.0) if str(player.id) in profiles else 0.0
+            for player in players
+        ]
 
-        for i, team in enumerate(teams, 1):
-            team_members = "\n".join([player.mention for player in team])
-            embed.add_field(
-                name=f"Equipo {i}",
-                value=team_members,
-                inline=False
-            )
+        teams, bench = balanced_teams(kd_ratios, self.team_size)
 
-        await interaction.response.send_message(embed=embed)
+        fields = []
+        for i, team in enumerate(teams, 1):
+            average_kd = sum(kd_ratios[p] for p in team) / len(team)
+            fields.append((
+                f"Equipo {i} · K/D medio {average_kd:.2f}",
+                "\n".join(f"{players[p].mention} (`{kd_ratios[p]}`)" for p in team)
+            ))
+        if bench:
+            fields.append(("🪑 Banquillo", "\n".join(players[p].mention for p in bench)))
+
+        embeds = paginated_embeds(
+            "⚖️ Sorteo Equilibrado",
+            "Equipos equilibrados por K/D",
+            0x00ff00,
+            fields
+        )
+        await send_embeds(interaction, embeds)
 
     @discord.ui.button(label="Actualizar", style=discord.ButtonStyle.secondary, emoji="🔄")
+    @acknowledged()
     async def update(self, interaction: discord.Interaction, button: discord.ui.Button):
-        embed = interaction.message.embeds[0]
         await interaction.response.send_message("✅ Lista actualizada.", ephemeral=True)
-        await interaction.message.edit(embed=embed)
+        edit_scheduler.schedule(interaction.message, self.render)
 
     @discord.ui.button(label="Cancelar", style=discord.ButtonStyle.danger, emoji="❌")
+    @acknowledged()
     async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
-        with app.app_context():
-            match = Team.query.filter_by(discord_message_id=self.match_id).first()
-            if match:
-                match.is_active = False
-                db.session.commit()
+        await repository.deactivate_team_by_message_id(self.match_id)
 
         # Disable all buttons
         for child in self.children:
             child.disabled = True
+        self.cancelled = True
 
-        embed = interaction.message.embeds[0]
-        embed.color = discord.Color.red()
-        embed.title = "❌ PARTIDA CANCELADA"
-
-        await interaction.message.edit(embed=embed, view=self)
+        expiring.cancel(PRIVATE_MATCH, self.match_id)
+        self.stop()
+        edit_scheduler.schedule(interaction.message, self.render)
         await interaction.response.send_message("✅ Partida cancelada.", ephemeral=True)
-    """Crear una partida privada personalizada"""
-
-    # Create embed for private match
-    embed = discord.Embed(
-        title="🎮 PARTIDA PRIVADA",
-        description=f"{interaction.user.mention} ha creado una partida privada",
-        color=0xff9900
-    )
-
-    # Add match details
-    embed.add_field(name="🎯 Modo", value=modo.value, inline=True)
-    embed.add_field(name="👥 Tamaño de Equipo", value=f"{tamanio_equipo.value} jugadores", inline=True)
-    embed.add_field(
-        name="👑 Host",
-        value=interaction.user.mention,
-        inline=True
-    )
-
-    # Add description if provided
-    if descripcion:
-        embed.add_field(name="📝 Descripción", value=descripcion, inline=False)
-
-    # Add voice channel if user is in one
-    if interaction.user.voice and interaction.user.voice.channel:
-        embed.add_field(
-            name="🔊 Canal de Voz",
-            value=interaction.user.voice.channel.mention,
-            inline=False
-        )
-
-    # Add timestamp
-    embed.timestamp = datetime.utcnow()
-
-    await interaction.response.send_message(embed=embed)
 
 @tree.command(name="crear_torneo", description="Crear un torneo personalizado")
 @app_commands.choices(
@@ -870,183 +1589,436 @@ class PrivateMatchView(discord.ui.View):
         app_commands.Choice(name="Duos (2)", value=2),
         app_commands.Choice(name="Trios (3)", value=3),
         app_commands.Choice(name="Cuartetos (4)", value=4)
+    ],
+    formato=[
+        app_commands.Choice(name="Eliminación simple", value="single"),
+        app_commands.Choice(name="Doble eliminación", value="double")
     ]
 )
+@acknowledged(ephemeral=False, ack_budget=ACK_BUDGET)
 async def crear_torneo(
     interaction: discord.Interaction,
     modo: app_commands.Choice[str],
     tamanio_equipo: app_commands.Choice[int],
     premio: str,
-    descripcion: str = None
+    descripcion: str = None,
+    formato: app_commands.Choice[str] = None
 ):
     """Crear un torneo personalizado"""
-
-    # Create unique tournament ID
-    tournament_id = f"T_{interaction.guild_id}_{int(datetime.utcnow().timestamp())}"
+    tournament_format = formato.value if formato else "single"
 
     # Store tournament info in database
-    with app.app_context():
-        tournament = Team(
-            owner_id=str(interaction.user.id),
-            mode=modo.value,
-            max_players=tamanio_equipo.value,
-            description=descripcion,
-            discord_message_id=tournament_id,
-            is_active=True
-        )
-        db.session.add(tournament)
-        db.session.commit()
+    tournament = await repository.create_tournament(
+        owner_discord_id=interaction.user.id,
+        mode=modo.value,
+        team_size=tamanio_equipo.value,
+        prize=premio,
+        format=tournament_format,
+        description=descripcion,
+        guild_id=interaction.guild_id,
+        channel_id=interaction.channel_id
+    )
+
+    embed = tournament_embed(tournament, 0)
 
-    # Create embed for tournament
+    # Create view with buttons and remember the message so it survives restarts
+    view = TournamentView(tournament.id, interaction.user.id, tamanio_equipo.value)
+    response = await interaction.response.send_message(embed=embed, view=view)
+    if response.message_id:
+        await repository.update_tournament(tournament.id, discord_message_id=str(response.message_id))
+        expire_after(TOURNAMENT, tournament.id, interaction.channel_id, [response.message_id], [view])
+
+def tournament_embed(tournament, entry_count):
+    """Embed of a tournament's registration message built from its row and number of entries"""
+    cancelled = tournament.status == 'cancelled'
     embed = discord.Embed(
-        title="🏆 TORNEO",
-        description=f"{interaction.user.mention} ha creado un torneo",
-        color=0xffd700
+        title="❌ TORNEO CANCELADO" if cancelled else "🏆 TORNEO",
+        description=f"<@{tournament.owner_discord_id}> ha creado un torneo",
+        color=discord.Color.red() if cancelled else 0xffd700
     )
 
     # Add tournament details
-    embed.add_field(name="🎯 Modo", value=modo.value, inline=True)
-    embed.add_field(name="👥 Tamaño de Equipo", value=f"{tamanio_equipo.value} jugadores", inline=True)
-    embed.add_field(name="👑 Organizador", value=interaction.user.mention, inline=True)
-    embed.add_field(name="🎁 Premio", value=premio, inline=True)
+    embed.add_field(name="🎯 Modo", value=tournament.mode, inline=True)
+    embed.add_field(name="👥 Tamaño de Equipo", value=f"{tournament.team_size} jugadores", inline=True)
+    embed.add_field(name="👑 Organizador", value=f"<@{tournament.owner_discord_id}>", inline=True)
+    embed.add_field(name="🎁 Premio", value=tournament.prize, inline=True)
+    embed.add_field(
+        name="🗂️ Formato",
+        value="Doble eliminación" if tournament.format == "double" else "Eliminación simple",
+        inline=True
+    )
 
-    if descripcion:
-        embed.add_field(name="📝 Descripción", value=descripcion, inline=False)
+    if tournament.description:
+        embed.add_field(name="📝 Descripción", value=tournament.description, inline=False)
 
-    embed.add_field(name="✅ Equipos Inscritos", value="0", inline=False)
-    embed.timestamp = datetime.utcnow()
+    embed.add_field(name="✅ Equipos Inscritos", value=str(entry_count), inline=False)
+    embed.timestamp = tournament.created_at.replace(tzinfo=timezone.utc) if tournament.created_at else None
+    return embed
 
-    # Create view with buttons
-    view = TournamentView(tournament_id, tamanio_equipo.value)
-    await interaction.response.send_message(embed=embed, view=view)
+class TournamentRegistrationModal(discord.ui.Modal, title='Inscribir Equipo'):
+    team_name = discord.ui.TextInput(
+        label='Nombre del equipo',
+        placeholder='Ejemplo: Los Spartans',
+        required=True,
+        max_length=50
+    )
 
-class TournamentView(discord.ui.View):
-    def __init__(self, tournament_id: str, team_size: int):
-        super().__init__(timeout=None)
-        self.tournament_id = tournament_id
-        self.team_size = team_size
-        self.registered_teams = []
+    teammates = discord.ui.TextInput(
+        label='Activision IDs de tus compañeros',
+        placeholder='Separados por comas: Jugador#123, Otro#456',
+        required=False,
+        max_length=200
+    )
 
-    @discord.ui.button(label="Inscribir Equipo", style=discord.ButtonStyle.success, emoji="✅")
-    async def register_team(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user in [member for team in self.registered_teams for member in team]:
-            await interaction.response.send_message("⚠️ Ya estás inscrito en este torneo.", ephemeral=True)
+    def __init__(self, tournament_view):
+        super().__init__()
+        self.tournament_view = tournament_view
+
+    @acknowledged()
+    async def on_submit(self, interaction: discord.Interaction):
+        teammates = [tag.strip() for tag in self.teammates.value.split(",") if tag.strip()]
+        if len(teammates) > self.tournament_view.team_size - 1:
+            await interaction.response.send_message(
+                f"⚠️ Los equipos de este torneo son de {self.tournament_view.team_size} jugadores.",
+                ephemeral=True
+            )
+            return
+
+        # Seeding uses the average K/D of the registered players in the team
+        captain = await repository.get_profile(interaction.user.id)
+        known = await repository.get_profiles_by_activision_ids(teammates) if teammates else {}
+        kd_ratios = [profile.kd_ratio or 0.0 for profile in known.values()]
+        if captain:
+            kd_ratios.append(captain.kd_ratio or 0.0)
+        avg_kd = sum(kd_ratios) / len(kd_ratios) if kd_ratios else 0.0
+
+        entry, count = await repository.add_tournament_entry(
+            self.tournament_view.tournament_id,
+            interaction.user.id,
+            self.team_name.value,
+            ", ".join(teammates),
+            avg_kd
+        )
+        if entry is None:
+            await interaction.response.send_message(
+                "⚠️ Ya estás inscrito en este torneo o las inscripciones están cerradas.",
+                ephemeral=True
+            )
             return
 
-        # Create a new team
-        new_team = [interaction.user]
-        self.registered_teams.append(new_team)
+        expiring.touch(TOURNAMENT, self.tournament_view.tournament_id, time.time() + EXPIRY_TTL[TOURNAMENT])
 
         # Update embed
-        embed = interaction.message.embeds[0]
-        embed.set_field_at(
-            -1, 
-            name="✅ Equipos Inscritos",
-            value=str(len(self.registered_teams)),
-            inline=False
+        edit_scheduler.schedule(interaction.message, self.tournament_view.render)
+        await interaction.response.send_message(
+            f"✅ Has inscrito a **{entry.name}** en el torneo (K/D medio `{avg_kd:.2f}`).",
+            ephemeral=True
         )
 
-        await interaction.message.edit(embed=embed)
-        await interaction.response.send_message("✅ Has inscrito tu equipo en el torneo.", ephemeral=True)
+class TournamentView(discord.ui.View):
+    def __init__(self, tournament_id: int, owner_id: int, team_size: int):
+        super().__init__(timeout=None)
+        self.tournament_id = tournament_id
+        self.owner_id = owner_id
+        self.team_size = team_size
+
+    async def render(self):
+        """Edit kwargs of the registration message, rebuilt from the tournament row and its entry count"""
+        tournament, entry_count = await repository.get_tournament_with_entry_count(self.tournament_id)
+        return {'embed': tournament_embed(tournament, entry_count), 'view': self}
+
+    @discord.ui.button(label="Inscribir Equipo", style=discord.ButtonStyle.success, emoji="✅", custom_id="tournament_register")
+    @acknowledged(ack_budget=None)
+    async def register_team(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(TournamentRegistrationModal(self))
 
-    @discord.ui.button(label="Generar Brackets", style=discord.ButtonStyle.primary, emoji="🔄")
+    @discord.ui.button(label="Generar Brackets", style=discord.ButtonStyle.primary, emoji="🔄", custom_id="tournament_brackets")
+    @acknowledged()
     async def generate_brackets(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if len(self.registered_teams) < 2:
+        if interaction.user.id != self.owner_id:
+            await interaction.response.send_message(
+                "⚠️ Solo el organizador puede generar los brackets.",
+                ephemeral=True
+            )
+            return
+
+        entries = await repository.list_tournament_entries(self.tournament_id)
+        if len(entries) < 2:
             await interaction.response.send_message(
                 "⚠️ No hay suficientes equipos inscritos. Se necesitan al menos 2 equipos.",
                 ephemeral=True
             )
             return
 
-        # Randomize teams and create brackets
-        import random
-        random.shuffle(self.registered_teams)
+        already_generated = "⚠️ Los brackets de este torneo ya se han generado."
+        tournament = await repository.get_tournament(self.tournament_id)
+        if tournament.status != 'registration':
+            await interaction.response.send_message(already_generated, ephemeral=True)
+            return
 
-        # Create embed with brackets
-        embed = discord.Embed(
-            title="🏆 Brackets del Torneo",
-            description="Enfrentamientos del torneo",
-            color=0xffd700
+        # Seed by average team K/D, earliest registration first on ties
+        seeded = sorted(entries, key=lambda entry: (-(entry.avg_kd or 0.0), entry.id))
+        bracket = Bracket.build([entry.id for entry in seeded], double=tournament.format == 'double')
+        saved = await repository.save_bracket(
+            self.tournament_id,
+            {entry.id: seed for seed, entry in enumerate(seeded, 1)},
+            [match.to_record() for match in bracket.ordered()]
         )
+        if not saved:
+            # Another click generated the bracket while this one was building it
+            await interaction.response.send_message(already_generated, ephemeral=True)
+            return
 
-        # Create matches
-        for i in range(0, len(self.registered_teams), 2):
-            if i + 1 < len(self.registered_teams):
-                team1 = "\n".join([player.mention for player in self.registered_teams[i]])
-                team2 = "\n".join([player.mention for player in self.registered_teams[i + 1]])
-                embed.add_field(
-                    name=f"Partido {i//2 + 1}",
-                    value=f"Equipo A:\n{team1}\n\nVS\n\nEquipo B:\n{team2}",
-                    inline=False
-                )
+        # Registration is closed once the bracket exists
+        button.disabled = True
+        self.register_team.disabled = True
+        edit_scheduler.schedule(interaction.message, self.render)
 
-        await interaction.response.send_message(embed=embed)
+        view = BracketView(
+            self.tournament_id, self.owner_id, bracket,
+            {entry.id: entry.name for entry in entries}
+        )
+        response = await interaction.response.send_message(embed=view.build_embed(), view=view)
+        if response.message_id:
+            await repository.update_tournament(self.tournament_id, bracket_message_id=str(response.message_id))
+            scheduled = expiring.get(TOURNAMENT, self.tournament_id)
+            message_ids = scheduled.message_ids if scheduled else [interaction.message.id]
+            expire_after(
+                TOURNAMENT, self.tournament_id, interaction.channel_id,
+                [*message_ids, response.message_id], [self, view]
+            )
 
-    @discord.ui.button(label="Actualizar", style=discord.ButtonStyle.secondary, emoji="🔄")
+    @discord.ui.button(label="Actualizar", style=discord.ButtonStyle.secondary, emoji="🔄", custom_id="tournament_update")
+    @acknowledged()
     async def update(self, interaction: discord.Interaction, button: discord.ui.Button):
-        embed = interaction.message.embeds[0]
         await interaction.response.send_message("✅ Lista actualizada.", ephemeral=True)
-        await interaction.message.edit(embed=embed)
+        edit_scheduler.schedule(interaction.message, self.render)
 
-    @discord.ui.button(label="Cancelar Torneo", style=discord.ButtonStyle.danger, emoji="❌")
+    @discord.ui.button(label="Cancelar Torneo", style=discord.ButtonStyle.danger, emoji="❌", custom_id="tournament_cancel")
+    @acknowledged()
     async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
-        with app.app_context():
-            tournament = Team.query.filter_by(discord_message_id=self.tournament_id).first()
-            if tournament:
-                tournament.is_active = False
-                db.session.commit()
+        if interaction.user.id != self.owner_id:
+            await interaction.response.send_message(
+                "⚠️ Solo el organizador puede cancelar el torneo.",
+                ephemeral=True
+            )
+            return
+
+        await repository.update_tournament(self.tournament_id, status='cancelled')
 
         # Disable all buttons
         for child in self.children:
             child.disabled = True
 
-        embed = interaction.message.embeds[0]
-        embed.color = discord.Color.red()
-        embed.title = "❌ TORNEO CANCELADO"
+        expiring.cancel(TOURNAMENT, self.tournament_id)
+        self.stop()
 
-        await interaction.message.edit(embed=embed, view=self)
+        edit_scheduler.schedule(interaction.message, self.render)
         await interaction.response.send_message("✅ Torneo cancelado.", ephemeral=True)
 
-@tree.command(name="ver_inscritos", description="Ver la lista de jugadores inscritos en la partida privada")
-async def ver_inscritos(interaction: discord.Interaction):
-    """Muestra la lista de jugadores inscritos en la partida privada"""
-    with app.app_context():
-        # Get all users from database
-        users = User.query.all()
+class ReportResultModal(discord.ui.Modal, title='Reportar Resultado'):
+    match_number = discord.ui.TextInput(
+        label='Número de partido',
+        placeholder='Ejemplo: 3',
+        required=True,
+        max_length=4
+    )
+
+    winner_slot = discord.ui.TextInput(
+        label='Ganador (1 = primer equipo, 2 = segundo)',
+        placeholder='1 o 2',
+        required=True,
+        max_length=1
+    )
 
-        if not users:
+    def __init__(self, bracket_view):
+        super().__init__()
+        self.bracket_view = bracket_view
+
+    @acknowledged()
+    async def on_submit(self, interaction: discord.Interaction):
+        view = self.bracket_view
+        try:
+            number = int(self.match_number.value)
+            slot = int(self.winner_slot.value) - 1
+            if slot not in (0, 1):
+                raise ValueError("Winner must be 1 or 2")
+            match = view.bracket.matches.get(number)
+            if match is None:
+                raise ValueError(f"Match {number} does not exist")
+            changed = view.bracket.report(number, match.slots[slot])
+        except ValueError:
             await interaction.response.send_message(
-                "⚠️ No hay jugadores inscritos en la partida privada.",
+                "⚠️ Ese partido no existe o todavía no se puede jugar. Revisa el número y el ganador (1 o 2).",
                 ephemeral=True
             )
             return
 
-        # Create embed
+        await repository.update_bracket_matches(
+            view.tournament_id,
+            [view.bracket.matches[changed_number].to_record() for changed_number in changed]
+        )
+        expiring.touch(TOURNAMENT, view.tournament_id, time.time() + EXPIRY_TTL[TOURNAMENT])
+
+        # Only the fields of the matches along the winner/loser paths are re-rendered
+        affected_pages = view.invalidate(changed)
+        champion = view.bracket.champion
+        if champion is not None:
+            await repository.update_tournament(view.tournament_id, status='finished')
+            view.report_result.disabled = True
+
+        winner_name = view.entry_name(match.winner)
+        if view.page in affected_pages or champion is not None:
+            await interaction.response.edit_message(embed=view.build_embed(), view=view)
+        else:
+            await interaction.response.send_message(
+                f"✅ Resultado registrado: **{winner_name}** gana el partido #{number}.",
+                ephemeral=True
+            )
+
+        if champion is not None:
+            content = f"🏆 **{view.entry_name(champion)}** es el campeón del torneo."
+            outbound.submit(
+                f"interaction:{interaction.id}",
+                lambda: interaction.followup.send(content),
+                priority=PRIORITY_INTERACTION
+            )
+
+class BracketView(discord.ui.View):
+    """Bracket of a tournament, paginated over 25-field embeds, with result reporting"""
+
+    PAGE_SIZE = 25
+
+    def __init__(self, tournament_id, owner_id, bracket, names):
+        super().__init__(timeout=None)
+        self.tournament_id = tournament_id
+        self.owner_id = owner_id
+        self.bracket = bracket
+        self.names = names
+        self.page = 0
+        self.page_count = max(1, -(-len(bracket.matches) // self.PAGE_SIZE))
+        self._fields = {}
+        if bracket.champion is not None:
+            self.report_result.disabled = True
+        self._update_buttons()
+
+    def entry_name(self, entry_id):
+        if entry_id is None:
+            return "Por decidir"
+        if entry_id == BYE:
+            return "BYE"
+        return self.names.get(entry_id, f"Equipo {entry_id}")
+
+    def round_label(self, match):
+        if match.bracket == GRAND_FINAL:
+            return "Gran Final" if match.round == 1 else "Gran Final (desempate)"
+        if match.bracket == LOSERS:
+            return f"Perdedores · Ronda {match.round}"
+        if not self.bracket.double and match.winner_to is None:
+            return "Final"
+        return f"Ronda {match.round}" if not self.bracket.double else f"Ganadores · Ronda {match.round}"
+
+    def render_field(self, match):
+        names = []
+        for entry_id in match.slots:
+            name = self.entry_name(entry_id)
+            if match.winner is not None and entry_id == match.winner and entry_id != BYE:
+                name = f"🏆 **{name}**"
+            names.append(name)
+        return f"#{match.number} · {self.round_label(match)}", f"{names[0]} vs {names[1]}"
+
+    def invalidate(self, numbers):
+        """Drop the cached fields of the changed matches and return the pages they are on"""
+        for number in numbers:
+            self._fields.pop(number, None)
+        return {(number - 1) // self.PAGE_SIZE for number in numbers}
+
+    def build_embed(self):
         embed = discord.Embed(
-            title="📋 Lista de Jugadores Inscritos",
-            description="Jugadores registrados para la partida privada",
-            color=0x3498db
+            title="🏆 Brackets del Torneo",
+            description="Enfrentamientos del torneo (el organizador reporta los resultados)",
+            color=0xffd700
         )
 
-        # Add fields for each player
-        for user in users:
-            # Get Discord member object
-            member = interaction.guild.get_member(int(user.discord_id))
-            if member:
-                field_value = f"Activision ID: `{user.activision_id}`\nK/D: `{user.kd_ratio}`"
-                embed.add_field(
-                    name=f"👤 {member.display_name}",
-                    value=field_value,
-                    inline=True
-                )
+        start = self.page * self.PAGE_SIZE + 1
+        for number in range(start, min(start + self.PAGE_SIZE, len(self.bracket.matches) + 1)):
+            field = self._fields.get(number)
+            if field is None:
+                field = self._fields[number] = self.render_field(self.bracket.matches[number])
+            embed.add_field(name=field[0], value=field[1], inline=False)
+
+        embed.set_footer(text=f"Página {self.page + 1}/{self.page_count}")
+        return embed
+
+    def _update_buttons(self):
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.page_count - 1
+
+    @discord.ui.button(label="Anterior", style=discord.ButtonStyle.secondary, emoji="⬅️", custom_id="bracket_previous")
+    @acknowledged(ack_budget=ACK_BUDGET)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = max(0, self.page - 1)
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.button(label="Siguiente", style=discord.ButtonStyle.secondary, emoji="➡️", custom_id="bracket_next")
+    @acknowledged(ack_budget=ACK_BUDGET)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = min(self.page_count - 1, self.page + 1)
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.button(label="Reportar Resultado", style=discord.ButtonStyle.success, emoji="📝", custom_id="bracket_report")
+    @acknowledged(ack_budget=None)
+    async def report_result(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if interaction.user.id != self.owner_id:
+            await interaction.response.send_message(
+                "⚠️ Solo el organizador puede reportar resultados.",
+                ephemeral=True
+            )
+            return
+
+        await interaction.response.send_modal(ReportResultModal(self))
+
+@tree.command(name="ver_inscritos", description="Ver la lista de jugadores inscritos en la partida privada")
+@app_commands.describe(orden="Ordenar por K/D o por Activision ID")
+@app_commands.choices(orden=PLAYER_ORDER_CHOICES)
+@acknowledged(ephemeral=False, ack_budget=ACK_BUDGET)
+async def ver_inscritos(interaction: discord.Interaction, orden: app_commands.Choice[str] = None):
+    """Muestra la lista de jugadores inscritos en la partida privada"""
+    await send_players(
+        interaction, orden,
+        "📋 Lista de Jugadores Inscritos",
+        "Jugadores registrados para la partida privada",
+        "⚠️ No hay jugadores inscritos en la partida privada.",
+        ephemeral=False
+    )
+
+@tree.command(name="sincronizar_comandos", description="Vuelve a registrar los comandos del bot en Discord")
+@app_commands.default_permissions(administrator=True)
+@acknowledged()
+async def sincronizar_comandos(interaction: discord.Interaction):
+    """Fuerza la sincronización de los comandos (solo el dueño del bot)"""
+    # A global sync affects every server, so server admins alone cannot trigger it
+    if not await bot.is_owner(interaction.user):
+        await interaction.response.send_message(
+            "⛔ Solo el dueño del bot puede sincronizar los comandos.",
+            ephemeral=True
+        )
+        return
 
-        # Add timestamp
-        embed.timestamp = datetime.utcnow()
+    try:
+        synced = await command_sync.sync(force=True)
+    except discord.HTTPException as e:
+        logger.error(f"❌ Error sincronizando comandos: {e}")
+        await interaction.response.send_message("❌ Error al sincronizar los comandos.", ephemeral=True)
+        return
 
-        await interaction.response.send_message(embed=embed)
+    await interaction.response.send_message(f"✅ {synced} comandos sincronizados.", ephemeral=True)
 
 @tree.command(name="help", description="Muestra la ayuda del bot")
 @app_commands.describe(publico="Mostrar la ayuda públicamente")
+@acknowledged(ephemeral=lambda publico=False, **_: not publico)
 async def help_command(interaction: discord.Interaction, publico: bool = False):
     """Muestra la ayuda del bot"""
     embed = discord.Embed(
@@ -1075,17 +2047,30 @@ async def help_command(interaction: discord.Interaction, publico: bool = False):
     )
 
     embed.add_field(
-        name="/ver_perfil",
-        value="Ver tu perfil o el de otro usuario. Puedes hacerlo público usando la opción 'publico'",
+        name="/equipos_abiertos",
+        value="Muestra los equipos abiertos a los que puedes unirte según tu K/D, con filtros de plataforma y modo",
+        inline=False
+    )
+
+    embed.add_field(
+        name="/cola",
+        value="Entra en la cola de emparejamiento y forma equipo automáticamente con jugadores de K/D similar (`/salir_cola` para salir)",
         inline=False
     )
 
     embed.add_field(
-        name="/jugadores",
-        value="Muestra los jugadores que están jugando Call of Duty actualmente",
+        name="/ver_perfil",
+        value="Ver tu perfil o el de otro usuario. Puedes hacerlo público usando la opción 'publico'",
         inline=False
     )
 
+    if JUGADORES_ENABLED:
+        embed.add_field(
+            name="/jugadores",
+            value="Muestra los jugadores que están jugando Call of Duty actualmente",
+            inline=False
+        )
+
     embed.add_field(
         name="/jugadores_inscritos",
         value="Muestra la lista de todos los jugadores registrados en el bot",
@@ -1127,13 +2112,15 @@ async def help_command(interaction: discord.Interaction, publico: bool = False):
 @tree.error
 async def on_app_command_error(interaction: discord.Interaction, error):
     """Handle errors from slash commands"""
+    # Handlers may have deferred already, in which case only a follow-up is possible
+    send = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
     if isinstance(error, app_commands.errors.CommandOnCooldown):
-        await interaction.response.send_message(
+        await send(
             f"⏱️ Este comando está en cooldown. Inténtalo de nuevo en {error.retry_after:.2f} segundos.",
             ephemeral=True
         )
     elif isinstance(error, app_commands.errors.MissingPermissions):
-        await interaction.response.send_message(
+        await send(
             "⚠️ No tienes permisos para usar este comando.",
             ephemeral=True
         )
@@ -1142,7 +2129,7 @@ async def on_app_command_error(interaction: discord.Interaction, error):
         logger.error(f"Command error: {error}")
 
         # Notify the user
-        await interaction.response.send_message(
+        await send(
             f"❌ Se produjo un error al ejecutar el comando: `{error}`\n"
             "Por favor, inténtalo de nuevo más tarde.",
             ephemeral=True
@@ -1161,11 +2148,8 @@ db = SQLAlchemy(model_class=Base)
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
 
-# Configure database
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///instance/warzone_teams.db"
-
-# Initialize the app with the extension
-db.init_app(app)
+# Configure the database from DATABASE_URL (SQLite in the instance folder by default)
+init_database(app, db)
 
 # Define DB models inline
 class User(db.Model):
@@ -1181,6 +2165,8 @@ class User(db.Model):
     teams = db.relationship('Team', backref='owner', lazy=True)
     team_memberships = db.relationship('TeamMember', backref='user', lazy=True)
 
+    __table_args__ = (db.Index('ix_user_kd_id', 'kd_ratio', 'id'),)
+
     def __repr__(self):
         return f'<User {self.username}#{self.discriminator}>'
 
@@ -1194,11 +2180,19 @@ class Team(db.Model):
     description = db.Column(db.Text, nullable=True)
     is_active = db.Column(db.Boolean, default=True)
     discord_message_id = db.Column(db.String(64), nullable=True)
+    guild_id = db.Column(db.String(64), nullable=True)
+    channel_id = db.Column(db.String(64), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     members = db.relationship('TeamMember', backref='team', lazy=True, cascade="all, delete-orphan")
 
+    __table_args__ = (
+        db.Index('ix_team_guild_active_mode_platform', 'guild_id', 'is_active', 'mode', 'platform'),
+        db.Index('ix_team_discord_message_id', 'discord_message_id'),
+        db.Index('ix_team_active_id', 'is_active', 'id')
+    )
+
     def __repr__(self):
         return f'<Team {self.id} - {self.mode}>'
 
@@ -1208,12 +2202,134 @@ class TeamMember(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     joined_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (db.UniqueConstraint('team_id', 'user_id', name='uq_team_member_team_user'),)
+
     def __repr__(self):
         return f'<TeamMember {self.user_id} in team {self.team_id}>'
 
-# Create the database tables
+class GuildMember(db.Model):
+    """A registered player who is a member of a guild.
+
+    Activision ID and K/D are copied from User so a guild's player list can be
+    read and paginated straight from the (guild_id, ...) indexes.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    guild_id = db.Column(db.String(64), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    activision_id = db.Column(db.String(40), nullable=True)
+    kd_ratio = db.Column(db.Float, nullable=False, default=0.0)
+    joined_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('guild_id', 'user_id', name='uq_guild_member'),
+        db.Index('ix_guild_member_guild_kd', 'guild_id', 'kd_ratio', 'user_id'),
+        db.Index('ix_guild_member_guild_activision', 'guild_id', 'activision_id', 'user_id'),
+        db.Index('ix_guild_member_user', 'user_id')
+    )
+
+    def __repr__(self):
+        return f'<GuildMember {self.user_id} in guild {self.guild_id}>'
+
+class Tournament(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    owner_discord_id = db.Column(db.String(64), nullable=False)
+    guild_id = db.Column(db.String(64), nullable=True)
+    channel_id = db.Column(db.String(64), nullable=True)
+    mode = db.Column(db.String(30), nullable=False)
+    team_size = db.Column(db.Integer, default=4)
+    prize = db.Column(db.String(200), nullable=True)
+    description = db.Column(db.Text, nullable=True)
+    format = db.Column(db.String(10), default='single')  # 'single' or 'double' elimination
+    status = db.Column(db.String(20), default='registration')  # registration, running, finished, cancelled
+    discord_message_id = db.Column(db.String(64), nullable=True)
+    bracket_message_id = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    entries = db.relationship('TournamentEntry', backref='tournament', lazy=True, cascade="all, delete-orphan")
+    matches = db.relationship('BracketMatch', backref='tournament', lazy=True, cascade="all, delete-orphan")
+
+    __table_args__ = (db.Index('ix_tournament_guild_status', 'guild_id', 'status'),)
+
+    def __repr__(self):
+        return f'<Tournament {self.id} - {self.mode} ({self.status})>'
+
+class TournamentEntry(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    tournament_id = db.Column(db.Integer, db.ForeignKey('tournament.id'), nullable=False)
+    captain_discord_id = db.Column(db.String(64), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    members = db.Column(db.Text, nullable=True)  # Activision IDs of the teammates, comma separated
+    avg_kd = db.Column(db.Float, default=0.0)
+    seed = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TournamentEntry {self.name} in tournament {self.tournament_id}>'
+
+class BracketMatch(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    tournament_id = db.Column(db.Integer, db.ForeignKey('tournament.id'), nullable=False)
+    number = db.Column(db.Integer, nullable=False)
+    bracket = db.Column(db.String(1), nullable=False)  # W(inners), L(osers) or F(inal)
+    round = db.Column(db.Integer, nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    slot1 = db.Column(db.Integer, nullable=True)  # TournamentEntry id, 0 for a bye, NULL if not decided yet
+    slot2 = db.Column(db.Integer, nullable=True)
+    winner = db.Column(db.Integer, nullable=True)
+    loser = db.Column(db.Integer, nullable=True)
+    winner_to = db.Column(db.Integer, nullable=True)  # Number of the match the winner moves on to
+    winner_to_slot = db.Column(db.Integer, nullable=True)
+    loser_to = db.Column(db.Integer, nullable=True)
+    loser_to_slot = db.Column(db.Integer, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('tournament_id', 'number'),)
+
+    def __repr__(self):
+        return f'<BracketMatch {self.number} of tournament {self.tournament_id}>'
+
+# Bring the schema up to date; with DB_AUTO_MIGRATE=0 run `flask --app main db upgrade` instead
 with app.app_context():
-    db.create_all()
+    if os.getenv("DB_AUTO_MIGRATE", "1") == "1":
+        migrations.upgrade(db.engine, db.metadata)
+    else:
+        for version, name in migrations.pending(db.engine):
+            logger.warning(f"⚠️ Migración pendiente: {name}")
+
+db_cli = AppGroup('db', help="Migraciones del esquema de la base de datos")
+
+@db_cli.command('upgrade')
+@click.option('--target', type=int, default=None, help="Versión hasta la que migrar")
+def db_upgrade(target):
+    """Aplica las migraciones pendientes"""
+    applied = migrations.upgrade(db.engine, db.metadata, target=target)
+    click.echo("\n".join(applied) if applied else "El esquema ya está actualizado")
+
+@db_cli.command('status')
+def db_status():
+    """Muestra las migraciones pendientes"""
+    waiting = migrations.pending(db.engine)
+    click.echo("\n".join(name for _, name in waiting) if waiting else "El esquema ya está actualizado")
+
+app.cli.add_command(db_cli)
+
+# Player profiles are read on nearly every interaction, keep the hot ones in memory
+profile_cache = ProfileCache(
+    maxsize=int(os.getenv("PROFILE_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("PROFILE_CACHE_TTL", "300"))
+)
+
+# Async data-access layer used by every command and button handler
+repository = Repository(
+    app, db,
+    SimpleNamespace(
+        User=User, Team=Team, TeamMember=TeamMember, GuildMember=GuildMember,
+        Tournament=Tournament, TournamentEntry=TournamentEntry, BracketMatch=BracketMatch
+    ),
+    max_workers=int(os.getenv("DB_MAX_WORKERS", "4")),
+    profile_cache=profile_cache
+)
 
 @app.route('/')
 def index():
@@ -1235,31 +2351,288 @@ def add_bot():
     """Page for adding the bot to Discord servers"""
     return render_template('add_bot.html')
 
-# Function to run the Discord bot
-async def run_discord_bot():
-    async with bot:
-        try:
-            await bot.start(TOKEN)
-        except discord.errors.LoginFailure:
-            logger.error("Invalid Discord token provided. Please check your .env file.")
-        except Exception as e:
-            logger.error(f"Error starting bot: {e}")
+# Native aiohttp routes (public JSON API, event stream, status, metrics) served straight
+# from the event loop. API responses are cached for API_CACHE_TTL seconds, so
+# polling visitors share one query per distinct filter instead of each hitting
+# the database
+web_routes = web.RouteTableDef()
+api_cache = ResponseCache(
+    ttl=float(os.getenv("API_CACHE_TTL", "5")),
+    maxsize=int(os.getenv("API_CACHE_SIZE", "512"))
+)
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 50
+
+def api_error(message):
+    return web.json_response({"error": message}, status=400)
+
+def api_filters(request):
+    """(min_kd, guild_id, limit) from the query string, ValueError if malformed"""
+    query = request.query
+    min_kd = float(query['min_kd']) if query.get('min_kd') else None
+    if min_kd is not None and not math.isfinite(min_kd):
+        raise ValueError(min_kd)
+    guild_id = int(query['guild']) if query.get('guild') else None
+    limit = min(max(int(query.get('limit', API_PAGE_SIZE)), 1), API_MAX_PAGE_SIZE)
+    return min_kd, guild_id, limit
+
+@web_routes.get('/api/teams')
+async def api_teams(request):
+    """Active team searches, newest first, filtered by platform, mode, min_kd and guild"""
+    try:
+        min_kd, guild_id, limit = api_filters(request)
+        after = int(request.query['after']) if request.query.get('after') else None
+    except ValueError:
+        return api_error("Parámetros inválidos")
+    platform = request.query.get('platform') or None
+    mode = request.query.get('mode') or None
+
+    async def produce():
+        listings, has_more = await repository.open_teams_page(platform, mode, min_kd, guild_id, after, limit)
+        teams = []
+        for team, owner_activision_id, joined in listings:
+            teams.append({
+                "id": team.id,
+                "platform": team.platform,
+                "mode": team.mode,
+                "kd_minimum": team.kd_minimum,
+                "players": joined + 1,
+                "max_players": team.max_players,
+                "description": team.description,
+                "owner": owner_activision_id,
+                "guild_id": team.guild_id,
+                "created_at": team.created_at.isoformat() if team.created_at else None,
+                "url": (
+                    f"https://discord.com/channels/{team.guild_id}/{team.channel_id}/{team.discord_message_id}"
+                    if team.guild_id and team.channel_id else None
+                )
+            })
+        return {"teams": teams, "next": str(listings[-1].team.id) if has_more else None}
 
-# Importar keep_alive para mantener el bot corriendo 24/7
-from keep_alive import keep_alive
+    entry = await api_cache.get(('teams', platform, mode, min_kd, guild_id, after, limit), produce)
+    return api_cache.respond(request, entry)
 
-# Run both the Flask app and Discord bot in parallel when directly running this file
-if __name__ == "__main__":
-    # Iniciar el servidor keep_alive para mantener el bot activo
-    keep_alive()
+@web_routes.get('/api/players')
+async def api_players(request):
+    """Registered players by descending K/D, filtered by min_kd and guild"""
+    try:
+        min_kd, guild_id, limit = api_filters(request)
+        after = None
+        if request.query.get('after'):
+            kd, _, user_id = request.query['after'].rpartition(':')
+            after = (float(kd), int(user_id))
+    except ValueError:
+        return api_error("Parámetros inválidos")
+
+    async def produce():
+        profiles, has_more = await repository.top_players_page(min_kd, guild_id, after, limit)
+        players = [
+            {"username": profile.username, "activision_id": profile.activision_id, "kd_ratio": profile.kd_ratio}
+            for profile in profiles
+        ]
+        last = profiles[-1] if profiles else None
+        return {"players": players, "next": f"{last.kd_ratio}:{last.id}" if has_more else None}
+
+    entry = await api_cache.get(('players', min_kd, guild_id, after, limit), produce)
+    return api_cache.respond(request, entry)
+
+@web_routes.get('/api/stream')
+async def api_stream(request):
+    """Server-sent events of searches being created, joined, filled, cancelled and expired"""
+    try:
+        guild_id = int(request.query['guild']) if request.query.get('guild') else None
+    except ValueError:
+        return api_error("Parámetros inválidos")
+    return await events.stream(request, team_events, guild_id)
+
+# Status routes read state owned by the event loop (queues, heaps, caches),
+# so like /metrics they run on the loop instead of the site's thread pool
+@web_routes.get('/status')
+async def status(request):
+    """Whether the bot is connected, and how long this process has been running"""
+    return web.json_response({
+        "status": "online" if bot.is_ready() and not bot.is_closed() else "starting",
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "uptime": str(timedelta(seconds=int(time.monotonic() - PROCESS_STARTED))),
+        "service": "Warzone Team Finder Bot"
+    })
+
+@web_routes.get('/status/cache')
+async def cache_status(request):
+    """Hit/miss/eviction counters of the player profile cache"""
+    return web.json_response(profile_cache.stats())
+
+@web_routes.get('/status/interactions')
+async def interaction_status(request):
+    """Per-handler acknowledgement and total latency of interactions"""
+    return web.json_response(interaction_pipeline.stats())
+
+@web_routes.get('/status/outbound')
+async def outbound_status(request):
+    """Queue depth, retries and wait/run latency of outbound Discord calls"""
+    return web.json_response(outbound.stats())
+
+@web_routes.get('/status/expiry')
+async def expiry_status(request):
+    """Searches, private matches and tournaments waiting to expire, and how many already did"""
+    return web.json_response({"scheduled": expiring.counts(), "expired": expired_total, "ttl": EXPIRY_TTL})
+
+def memory_stats():
+    """Resident memory of the process and what the Discord cache holds"""
+    rss_kb = None
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    rss_kb = int(line.split()[1])
+    except OSError:
+        pass
+    return {
+        "low_memory": LOW_MEMORY,
+        "presences": intents.presences,
+        "rss_kb": rss_kb,
+        "guilds": len(bot.guilds),
+        "cached_members": sum(len(guild.members) for guild in bot.guilds),
+        "cached_users": len(bot.users),
+        "member_names": member_names.stats()
+    }
 
-    # Run the Flask app in a separate thread if running independently
-    threading.Thread(target=lambda: app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)).start()
+@web_routes.get('/status/memory')
+async def memory_status(request):
+    """Resident memory of the process and what the Discord cache holds"""
+    return web.json_response(memory_stats())
+
+@web_routes.get('/status/shards')
+async def shard_status(request):
+    """Gateway latency, guilds and open searches of each shard run by this process"""
+    if AUTO_SHARD:
+        # Shards that have not connected yet are listed with no latency
+        shard_ids = bot.shard_ids or range(bot.shard_count or 0)
+        shards = {shard_id: bot.get_shard(shard_id) for shard_id in shard_ids}
+        latencies = {shard_id: shard.latency if shard else math.inf for shard_id, shard in shards.items()}
+        closed = {shard_id: shard.is_closed() if shard else True for shard_id, shard in shards.items()}
+    else:
+        latencies = {0: bot.latency}
+        closed = {0: bot.is_closed()}
+
+    guilds = {shard_id: 0 for shard_id in latencies}
+    for guild in bot.guilds:
+        guilds[guild.shard_id] = guilds.get(guild.shard_id, 0) + 1
+    searches = {shard_id: 0 for shard_id in latencies}
+    for search in list(team_searches.values()):
+        if search.get('guild_id'):
+            shard_id = shard_of(search['guild_id'])
+            searches[shard_id] = searches.get(shard_id, 0) + 1
+
+    return web.json_response({
+        "sharded": AUTO_SHARD,
+        "shard_count": bot.shard_count or 1,
+        "shards": {
+            str(shard_id): {
+                # Latency is inf until the first heartbeat, which JSON cannot carry
+                "latency_ms": round(latency * 1000, 1) if math.isfinite(latency) else None,
+                "closed": closed[shard_id],
+                "guilds": guilds.get(shard_id, 0),
+                "searches": searches.get(shard_id, 0)
+            }
+            for shard_id, latency in sorted(latencies.items())
+        }
+    })
+
+@web_routes.get('/status/presence')
+async def presence_status(request):
+    """Call of Duty players per guild now, over time and on average per UTC hour"""
+    return web.json_response({
+        str(guild_id): {
+            "now": presence_index.counts(guild_id),
+            "hourly_average": presence_index.hourly_average(guild_id),
+            "history": presence_index.history(guild_id)
+        }
+        for guild_id in presence_index.guild_ids()
+    })
+
+@web_routes.get('/status/edits')
+async def edit_status(request):
+    """Message edits sent, coalesced and skipped by the edit scheduler"""
+    return web.json_response(edit_scheduler.stats())
+
+@web_routes.get('/status/matchmaking')
+async def matchmaking_status(request):
+    """Queue depth and time-to-match of the matchmaking queue"""
+    return web.json_response(matchmaking_queue.stats())
+
+@web_routes.get('/status/api')
+async def api_status(request):
+    """Hits, misses and 304s of the public API response cache"""
+    return web.json_response(api_cache.stats())
+
+@web_routes.get('/status/stream')
+async def stream_status(request):
+    """Subscribers and published/dropped counts of the event stream"""
+    return web.json_response(team_events.stats())
+
+# Gauges read from the bot's state when /metrics is scraped; the handler runs on
+# the event loop, so it never sees the caches halfway through an update
+def gateway_latency():
+    latencies = bot.latencies if AUTO_SHARD else [(0, bot.latency)]
+    return {shard_id: latency for shard_id, latency in latencies if math.isfinite(latency)}
+
+metrics.gauge('discord_gateway_latency_seconds', 'Heartbeat latency of each shard', gateway_latency, label='shard')
+metrics.gauge('discord_guilds', 'Guilds the bot is in', lambda: len(bot.guilds))
+metrics.gauge(
+    'discord_members', 'Members of those guilds as reported by Discord',
+    lambda: sum(guild.member_count or 0 for guild in bot.guilds)
+)
+metrics.gauge(
+    'discord_cached_members', 'Members held in the member cache',
+    lambda: sum(len(guild.members) for guild in bot.guilds)
+)
+metrics.gauge('discord_persistent_views', 'Views registered for button clicks', lambda: len(bot.persistent_views))
+metrics.gauge('team_searches', 'Open team searches held in memory', lambda: len(team_searches))
+metrics.gauge(
+    'matchmaking_queue_depth', 'Players waiting in /cola',
+    lambda: matchmaking_queue.stats()['queue_depth']
+)
+metrics.gauge(
+    'outbound_queue_depth', 'Outbound Discord calls waiting, by priority',
+    lambda: outbound.stats()['queue_depth'], label='priority'
+)
+metrics.gauge('expiring_items', 'Searches, matches and tournaments waiting to expire', expiring.counts, label='kind')
+metrics.gauge('stream_subscribers', 'Clients connected to /api/stream', lambda: len(team_events))
+
+@web_routes.get('/metrics')
+async def metrics_endpoint(request):
+    """Prometheus metrics of interactions, database operations, the gateway and the event loop"""
+    return web.Response(
+        body=metrics.render().encode(),
+        headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+    )
 
-    # Run the Discord bot in the main thread
+async def shutdown():
+    """Stop the background loops and flush queued edits and messages before disconnecting"""
+    for loop in (matchmaker, expire_stale, sample_presence):
+        loop.cancel()
+    if loop_watcher is not None:
+        loop_watcher.cancel()
+    if member_sync is not None:
+        member_sync.cancel()
+    team_events.close()
+    edits_left = await edit_scheduler.drain(SHUTDOWN_GRACE * 0.4)
+    calls_left = await outbound.drain(SHUTDOWN_GRACE * 0.4)
+    await outbound.stop()
+    if edits_left or calls_left:
+        logger.warning(f"Shutting down with {edits_left} edits and {calls_left} outbound calls not sent")
+
+def run():
+    """Run the Discord bot and the website in this process until SIGINT/SIGTERM"""
+    web_app = runtime.create_web_app(app, threads=HTTP_THREADS, routes=web_routes)
     try:
-        asyncio.run(run_discord_bot())
+        exit_code = asyncio.run(runtime.serve(bot, TOKEN, web_app, HTTP_HOST, HTTP_PORT, shutdown, SHUTDOWN_GRACE))
     except KeyboardInterrupt:
         logger.info("Bot stopped by user.")
-    except Exception as e:
-        logger.error(f"Unhandled exception: {e}")
\ No newline at end of file
+        exit_code = 0
+    repository.shutdown()
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,131 @@
+import time
+from collections import deque, namedtuple
+
+QueueEntry = namedtuple(
+    'QueueEntry',
+    'discord_id user_id kd_ratio platform mode squad_size guild_id channel_id enqueued_at'
+)
+
+
+class MatchmakingQueue:
+    """Queue of players waiting to be grouped into full teams.
+
+    Players are bucketed by (guild, platform, mode, squad_size). Each tick sorts a
+    bucket by K/D and walks it once, taking consecutive runs of squad_size
+    players whose K/D spread is within the allowed window, so forming teams is
+    O(n log n) per bucket rather than comparing every pair of players. The
+    allowed spread widens the longer the oldest player in a group has waited,
+    so outliers still get matched eventually.
+    """
+
+    def __init__(self, max_kd_spread=0.5, spread_growth=0.05, max_wait_samples=1000):
+        self.max_kd_spread = max_kd_spread
+        self.spread_growth = spread_growth  # Extra K/D spread allowed per second waited
+        self._buckets = {}
+        self._queued = {}
+        self._wait_samples = deque(maxlen=max_wait_samples)
+        self.matched_players = 0
+        self.formed_teams = 0
+
+    def __len__(self):
+        return len(self._queued)
+
+    def __contains__(self, discord_id):
+        return discord_id in self._queued
+
+    def enqueue(self, discord_id, user_id, kd_ratio, platform, mode, squad_size,
+                guild_id=None, channel_id=None):
+        """Add a player to the queue, returns False if they were already queued"""
+        if discord_id in self._queued:
+            return False
+        entry = QueueEntry(
+            discord_id, user_id, kd_ratio or 0.0, platform, mode, squad_size,
+            guild_id, channel_id, time.monotonic()
+        )
+        self._queued[discord_id] = entry
+        self._buckets.setdefault((guild_id, platform, mode, squad_size), {})[discord_id] = entry
+        return True
+
+    def dequeue(self, discord_id):
+        entry = self._queued.pop(discord_id, None)
+        if entry is None:
+            return None
+        key = (entry.guild_id, entry.platform, entry.mode, entry.squad_size)
+        bucket = self._buckets[key]
+        del bucket[discord_id]
+        if not bucket:
+            del self._buckets[key]
+        return entry
+
+    def requeue(self, groups):
+        """Put groups returned by form_teams() back, e.g. when saving them failed.
+
+        Entries keep their enqueued_at, so the players neither lose their
+        place nor the K/D spread they earned by waiting.
+        """
+        for group in groups:
+            for entry in group:
+                if entry.discord_id in self._queued:  # Queued again meanwhile
+                    continue
+                self._queued[entry.discord_id] = entry
+                key = (entry.guild_id, entry.platform, entry.mode, entry.squad_size)
+                self._buckets.setdefault(key, {})[entry.discord_id] = entry
+            self.matched_players -= len(group)
+            self.formed_teams -= 1
+
+    def allowed_spread(self, waited):
+        return self.max_kd_spread + self.spread_growth * waited
+
+    def form_teams(self):
+        """Group queued players into full teams and remove them from the queue"""
+        now = time.monotonic()
+        teams = []
+
+        for (guild_id, platform, mode, squad_size), bucket in list(self._buckets.items()):
+            if len(bucket) < squad_size:
+                continue
+
+            players = sorted(bucket.values(), key=lambda entry: entry.kd_ratio)
+            i = 0
+            while i + squad_size <= len(players):
+                group = players[i:i + squad_size]
+                oldest = min(entry.enqueued_at for entry in group)
+                spread = group[-1].kd_ratio - group[0].kd_ratio
+                if spread <= self.allowed_spread(now - oldest):
+                    teams.append(group)
+                    i += squad_size
+                else:
+                    i += 1
+
+        for group in teams:
+            for entry in group:
+                self.dequeue(entry.discord_id)
+                self._wait_samples.append(now - entry.enqueued_at)
+            self.matched_players += len(group)
+            self.formed_teams += 1
+
+        return teams
+
+    def depth_by_bucket(self):
+        return {
+            f"{guild_id}/{platform}/{mode}/{squad_size}": len(bucket)
+            for (guild_id, platform, mode, squad_size), bucket in self._buckets.items()
+        }
+
+    def stats(self):
+        samples = sorted(self._wait_samples)
+
+        def percentile(p):
+            if not samples:
+                return 0.0
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 3)
+
+        return {
+            "queue_depth": len(self._queued),
+            "buckets": self.depth_by_bucket(),
+            "formed_teams": self.formed_teams,
+            "matched_players": self.matched_players,
+            "time_to_match_p50": percentile(0.50),
+            "time_to_match_p95": percentile(0.95),
+            "time_to_match_max": round(samples[-1], 3) if samples else 0.0
+        }
@@ -0,0 +1,186 @@
+import asyncio
+import bisect
+import math
+import threading
+
+# Latency buckets in seconds, tight around Discord's 3 second acknowledgement window
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 5.0, 10.0, 30.0)
+
+# Database operations and event loop stalls are expected in the millisecond range
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """Bucketed histogram of observations, one series per label value"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, description, label, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = {
+                    'counts': [0] * (len(self.buckets) + 1),
+                    'sum': 0.0,
+                    'count': 0
+                }
+            series['counts'][bisect.bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def quantile(self, label_value, q):
+        """Upper bound of the bucket holding the q-quantile, None past the last bucket"""
+        series = self._series.get(label_value)
+        if not series or not series['count']:
+            return 0.0
+        rank = q * series['count']
+        seen = 0
+        for bound, count in zip(self.buckets, series['counts']):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def count_above(self, label_value, threshold):
+        """Observations that fell in buckets above threshold (threshold must be a bucket bound)"""
+        series = self._series.get(label_value)
+        if not series:
+            return 0
+        return sum(series['counts'][bisect.bisect_right(self.buckets, threshold):])
+
+    def series(self):
+        with self._lock:
+            return {
+                label_value: {'counts': list(data['counts']), 'sum': data['sum'], 'count': data['count']}
+                for label_value, data in self._series.items()
+            }
+
+
+    def samples(self):
+        for label_value, data in sorted(self.series().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), data['counts']):
+                cumulative += count
+                le = '+Inf' if bound == math.inf else repr(bound)
+                yield f'{self.name}_bucket', {self.label: label_value, 'le': le}, cumulative
+            yield f'{self.name}_sum', {self.label: label_value}, data['sum']
+            yield f'{self.name}_count', {self.label: label_value}, data['count']
+
+
+class Counter:
+    """Monotonic count, one series per label value"""
+
+    kind = 'counter'
+
+    def __init__(self, name, description, label):
+        self.name = name
+        self.description = description
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_value, value in values:
+            yield self.name, {self.label: label_value}, value
+
+
+class Gauge:
+    """Value read when metrics are collected: collect() returns a number, a {label value: number} dict or None"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, description, collect, label=None):
+        self.name = name
+        self.description = description
+        self.collect = collect
+        self.label = label
+
+    def samples(self):
+        value = self.collect()
+        if isinstance(value, dict):
+            for label_value, item in sorted(value.items()):
+                yield self.name, {self.label: label_value}, item
+        elif value is not None:
+            yield self.name, {}, value
+
+
+REGISTRY = []
+
+
+def histogram(name, description, label, buckets=LATENCY_BUCKETS):
+    """Create a histogram and register it"""
+    metric = Histogram(name, description, label, buckets)
+    REGISTRY.append(metric)
+    return metric
+
+
+def counter(name, description, label):
+    """Create a counter and register it"""
+    metric = Counter(name, description, label)
+    REGISTRY.append(metric)
+    return metric
+
+
+def gauge(name, description, collect, label=None):
+    """Register a gauge computed by collect() at scrape time"""
+    metric = Gauge(name, description, collect, label)
+    REGISTRY.append(metric)
+    return metric
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+
+def render():
+    """Every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.description}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for name, labels, value in metric.samples():
+            if labels:
+                pairs = ','.join(f'{key}="{_escape(label_value)}"' for key, label_value in labels.items())
+                lines.append(f'{name}{{{pairs}}} {_format_value(value)}')
+            else:
+                lines.append(f'{name} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+event_loop_lag = histogram(
+    'event_loop_lag_seconds', 'How late the event loop woke a sleeping task', 'loop', FAST_BUCKETS
+)
+
+
+async def watch_event_loop(interval=0.5):
+    """Sample event loop lag forever: a blocked loop wakes this task late by the time it was blocked"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        event_loop_lag.observe('main', max(0.0, loop.time() - started - interval))
@@ -0,0 +1,9 @@
+"""Create the tables that do not exist yet.
+
+Databases made before migrations existed already have user, team and
+team_member from db.create_all(); this only adds what is missing.
+"""
+
+
+def upgrade(connection, metadata):
+    metadata.create_all(connection, checkfirst=True)
@@ -0,0 +1,10 @@
+"""Guild and channel of team searches, and the guild-scoped indexes"""
+from migrations.helpers import add_column, create_index
+
+
+def upgrade(connection, metadata):
+    add_column(connection, 'team', 'guild_id', 'VARCHAR(64)')
+    add_column(connection, 'team', 'channel_id', 'VARCHAR(64)')
+    create_index(connection, 'team', 'ix_team_guild_active_mode_platform',
+                 ['guild_id', 'is_active', 'mode', 'platform'])
+    create_index(connection, 'tournament', 'ix_tournament_guild_status', ['guild_id', 'status'])
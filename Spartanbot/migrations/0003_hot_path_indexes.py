@@ -0,0 +1,16 @@
+"""Index team lookups by message ID and make team membership unique"""
+from sqlalchemy import text
+
+from migrations.helpers import create_index, has_index
+
+
+def upgrade(connection, metadata):
+    create_index(connection, 'team', 'ix_team_discord_message_id', ['discord_message_id'])
+
+    if not has_index(connection, 'team_member', 'uq_team_member_team_user'):
+        # Keep the first row of any duplicated membership before enforcing uniqueness
+        connection.execute(text(
+            'DELETE FROM team_member WHERE id NOT IN '
+            '(SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM team_member GROUP BY team_id, user_id) AS keep)'
+        ))
+        create_index(connection, 'team_member', 'uq_team_member_team_user', ['team_id', 'user_id'], unique=True)
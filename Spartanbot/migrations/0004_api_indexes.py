@@ -0,0 +1,7 @@
+"""Indexes behind the public /api/teams and /api/players listings"""
+from migrations.helpers import create_index
+
+
+def upgrade(connection, metadata):
+    create_index(connection, 'team', 'ix_team_active_id', ['is_active', 'id'])
+    create_index(connection, 'user', 'ix_user_kd_id', ['kd_ratio', 'id'])
@@ -0,0 +1,64 @@
+"""Versioned schema migrations.
+
+Each script in this package is named NNNN_description.py and defines
+upgrade(connection, metadata). Applied versions are recorded in the
+schema_version table, and every script runs in its own transaction, so an
+interrupted upgrade resumes at the first version that did not finish.
+Scripts must be safe to run against a database created from the current
+models (0001 creates missing tables straight from them).
+"""
+import importlib
+import logging
+import pkgutil
+import re
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_NAME = re.compile(r'(\d{4})_\w+$')
+
+schema_version = Table(
+    'schema_version', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('applied_at', DateTime, default=datetime.utcnow)
+)
+
+
+def scripts():
+    """(version, name, module) of every migration script, oldest first"""
+    found = []
+    for info in pkgutil.iter_modules(__path__):
+        match = SCRIPT_NAME.match(info.name)
+        if match:
+            found.append((int(match.group(1)), info.name, importlib.import_module(f'{__name__}.{info.name}')))
+    return sorted(found, key=lambda script: script[0])
+
+
+def applied_versions(engine):
+    schema_version.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        return set(connection.execute(select(schema_version.c.version)).scalars())
+
+
+def pending(engine):
+    """Scripts not applied to the database yet"""
+    applied = applied_versions(engine)
+    return [(version, name) for version, name, _ in scripts() if version not in applied]
+
+
+def upgrade(engine, metadata, target=None):
+    """Apply pending scripts up to target (all by default), returns the names applied"""
+    applied = applied_versions(engine)
+    done = []
+    for version, name, module in scripts():
+        if version in applied or (target is not None and version > target):
+            continue
+        with engine.begin() as connection:
+            module.upgrade(connection, metadata)
+            connection.execute(schema_version.insert().values(version=version, name=name))
+        logger.info(f"🗄️ Migración aplicada: {name}")
+        done.append(name)
+    return done
@@ -0,0 +1,31 @@
+from sqlalchemy import inspect, text
+
+
+def _quote(connection, table):
+    # "user" is a reserved word on PostgreSQL
+    return connection.dialect.identifier_preparer.quote(table)
+
+
+def has_column(connection, table, column):
+    return any(info['name'] == column for info in inspect(connection).get_columns(table))
+
+
+def has_index(connection, table, index):
+    inspector = inspect(connection)
+    names = {info['name'] for info in inspector.get_indexes(table)}
+    names.update(info['name'] for info in inspector.get_unique_constraints(table))
+    return index in names
+
+
+def add_column(connection, table, column, ddl_type):
+    """ALTER TABLE ... ADD COLUMN unless the column is already there"""
+    if not has_column(connection, table, column):
+        connection.execute(text(f'ALTER TABLE {_quote(connection, table)} ADD COLUMN {column} {ddl_type}'))
+
+
+def create_index(connection, table, index, columns, unique=False):
+    """CREATE [UNIQUE] INDEX unless an index or constraint with that name exists"""
+    if not has_index(connection, table, index):
+        connection.execute(text(
+            f'CREATE {"UNIQUE " if unique else ""}INDEX {index} ON {_quote(connection, table)} ({", ".join(columns)})'
+        ))
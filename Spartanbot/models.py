@@ -15,6 +15,8 @@ class User(UserMixin, db.Model):
     teams = db.relationship('Team', backref='owner', lazy=True)
     team_memberships = db.relationship('TeamMember', backref='user', lazy=True)
     
+    __table_args__ = (db.Index('ix_user_kd_id', 'kd_ratio', 'id'),)
+    
     def __repr__(self):
         return f'<User {self.username}#{self.discriminator}>'
 
@@ -28,11 +30,19 @@ class Team(db.Model):
     description = db.Column(db.Text, nullable=True)
     is_active = db.Column(db.Boolean, default=True)
     discord_message_id = db.Column(db.String(64), nullable=True)
+    guild_id = db.Column(db.String(64), nullable=True)
+    channel_id = db.Column(db.String(64), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     members = db.relationship('TeamMember', backref='team', lazy=True, cascade="all, delete-orphan")
     
+    __table_args__ = (
+        db.Index('ix_team_guild_active_mode_platform', 'guild_id', 'is_active', 'mode', 'platform'),
+        db.Index('ix_team_discord_message_id', 'discord_message_id'),
+        db.Index('ix_team_active_id', 'is_active', 'id')
+    )
+    
     def __repr__(self):
         return f'<Team {self.id} - {self.mode}>'
 
@@ -42,5 +52,90 @@ class TeamMember(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     joined_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (db.UniqueConstraint('team_id', 'user_id', name='uq_team_member_team_user'),)
+    
+    def __repr__(self):
+        return f'<TeamMember {self.user_id} in team {self.team_id}>'
+
+class GuildMember(db.Model):
+    """A registered player who is a member of a guild.
+    
+    Activision ID and K/D are copied from User so a guild's player list can be
+    read and paginated straight from the (guild_id, ...) indexes.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    guild_id = db.Column(db.String(64), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    activision_id = db.Column(db.String(40), nullable=True)
+    kd_ratio = db.Column(db.Float, nullable=False, default=0.0)
+    joined_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('guild_id', 'user_id', name='uq_guild_member'),
+        db.Index('ix_guild_member_guild_kd', 'guild_id', 'kd_ratio', 'user_id'),
+        db.Index('ix_guild_member_guild_activision', 'guild_id', 'activision_id', 'user_id'),
+        db.Index('ix_guild_member_user', 'user_id')
+    )
+    
+    def __repr__(self):
+        return f'<GuildMember {self.user_id} in guild {self.guild_id}>'
+
+
+class Tournament(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    owner_discord_id = db.Column(db.String(64), nullable=False)
+    guild_id = db.Column(db.String(64), nullable=True)
+    channel_id = db.Column(db.String(64), nullable=True)
+    mode = db.Column(db.String(30), nullable=False)
+    team_size = db.Column(db.Integer, default=4)
+    prize = db.Column(db.String(200), nullable=True)
+    description = db.Column(db.Text, nullable=True)
+    format = db.Column(db.String(10), default='single')  # 'single' or 'double' elimination
+    status = db.Column(db.String(20), default='registration')  # registration, running, finished, cancelled
+    discord_message_id = db.Column(db.String(64), nullable=True)
+    bracket_message_id = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    entries = db.relationship('TournamentEntry', backref='tournament', lazy=True, cascade="all, delete-orphan")
+    matches = db.relationship('BracketMatch', backref='tournament', lazy=True, cascade="all, delete-orphan")
+
+    __table_args__ = (db.Index('ix_tournament_guild_status', 'guild_id', 'status'),)
+
+    def __repr__(self):
+        return f'<Tournament {self.id} - {self.mode} ({self.status})>'
+
+class TournamentEntry(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    tournament_id = db.Column(db.Integer, db.ForeignKey('tournament.id'), nullable=False)
+    captain_discord_id = db.Column(db.String(64), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    members = db.Column(db.Text, nullable=True)  # Activision IDs of the teammates, comma separated
+    avg_kd = db.Column(db.Float, default=0.0)
+    seed = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TournamentEntry {self.name} in tournament {self.tournament_id}>'
+
+class BracketMatch(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    tournament_id = db.Column(db.Integer, db.ForeignKey('tournament.id'), nullable=False)
+    number = db.Column(db.Integer, nullable=False)
+    bracket = db.Column(db.String(1), nullable=False)  # W(inners), L(osers) or F(inal)
+    round = db.Column(db.Integer, nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    slot1 = db.Column(db.Integer, nullable=True)  # TournamentEntry id, 0 for a bye, NULL if not decided yet
+    slot2 = db.Column(db.Integer, nullable=True)
+    winner = db.Column(db.Integer, nullable=True)
+    loser = db.Column(db.Integer, nullable=True)
+    winner_to = db.Column(db.Integer, nullable=True)  # Number of the match the winner moves on to
+    winner_to_slot = db.Column(db.Integer, nullable=True)
+    loser_to = db.Column(db.Integer, nullable=True)
+    loser_to_slot = db.Column(db.Integer, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('tournament_id', 'number'),)
+
     def __repr__(self):
-        return f'<TeamMember {self.user_id} in team {self.team_id}>'
\ No newline at end of file
+        return f'<BracketMatch {self.number} of tournament {self.tournament_id}>'
@@ -0,0 +1,207 @@
+import asyncio
+import itertools
+import logging
+import random
+import time
+from collections import deque
+
+import aiohttp
+import discord
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, lower runs first
+PRIORITY_INTERACTION = 0  # Follow-ups the user is waiting on
+PRIORITY_EDIT = 1         # Embed edits of team, match and tournament messages
+PRIORITY_MESSAGE = 2      # Channel announcements
+PRIORITY_DM = 3           # Direct messages and the user lookups they need
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTION: "interaction",
+    PRIORITY_EDIT: "edit",
+    PRIORITY_MESSAGE: "message",
+    PRIORITY_DM: "dm"
+}
+
+
+class _Job:
+    __slots__ = ('route', 'factory', 'priority', 'future', 'enqueued_at', 'attempt')
+
+    def __init__(self, route, factory, priority, future):
+        self.route = route
+        self.factory = factory
+        self.priority = priority
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.attempt = 0
+
+
+class OutboundScheduler:
+    """Priority queue for the bot's outbound Discord calls.
+
+    Handlers hand their side effects (DMs, edits, announcements) to submit()
+    and return right away instead of awaiting them inline. A fixed number of
+    workers drains the queue by priority class. Calls sharing a route, e.g.
+    the same channel or DM recipient, run one at a time and in order, and a
+    route that hit a rate limit is paused for the retry_after Discord sent.
+    Rate limits, 5xx responses and connection errors are retried with
+    exponential backoff and full jitter.
+    """
+
+    def __init__(self, concurrency=4, max_retries=3, base_delay=0.5, max_delay=30.0, max_samples=1000):
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._queue = None
+        self._workers = []
+        self._sequence = itertools.count()
+        self._route_locks = {}
+        self._route_blocked_until = {}
+        self._depth = {priority: 0 for priority in PRIORITY_NAMES}
+        self._wait_samples = {priority: deque(maxlen=max_samples) for priority in PRIORITY_NAMES}
+        self._run_samples = {priority: deque(maxlen=max_samples) for priority in PRIORITY_NAMES}
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+
+    def start(self):
+        """Start the workers, must be called from the running event loop"""
+        if self._workers:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def drain(self, timeout=5.0):
+        """Wait up to timeout seconds for queued calls to finish, returns how many are left"""
+        if self._queue is None:
+            return 0
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                await asyncio.wait_for(self._queue.join(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+            if not any(self._depth.values()):
+                break
+            await asyncio.sleep(0.05)  # Parked jobs re-enter the queue once their delay is up
+        return sum(self._depth.values())
+
+    def submit(self, route, factory, priority=PRIORITY_DM):
+        """Queue factory() (a coroutine function) without waiting for it, failures are logged"""
+        self._enqueue(_Job(route, factory, priority, None))
+
+    async def request(self, route, factory, priority=PRIORITY_INTERACTION):
+        """Queue factory() and wait for its result"""
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(_Job(route, factory, priority, future))
+        return await future
+
+    def _enqueue(self, job, delay=0.0):
+        self.start()
+        self._depth[job.priority] += 1
+        item = (job.priority, next(self._sequence), job)
+        if delay > 0:
+            # Park the job instead of holding a worker while its route is paused
+            asyncio.get_running_loop().call_later(delay, self._queue.put_nowait, item)
+        else:
+            self._queue.put_nowait(item)
+
+    async def _worker(self):
+        while True:
+            _, _, job = await self._queue.get()
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbound worker error on {job.route}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job):
+        self._depth[job.priority] -= 1
+        blocked = self._route_blocked_until.get(job.route, 0.0) - time.monotonic()
+        if blocked > 0:
+            self._enqueue(job, blocked)
+            return
+
+        if len(self._route_locks) > 10000:
+            self._prune_routes()
+        lock = self._route_locks.setdefault(job.route, asyncio.Lock())
+        async with lock:
+            self._wait_samples[job.priority].append(time.monotonic() - job.enqueued_at)
+            started = time.monotonic()
+            try:
+                result = await job.factory()
+            except Exception as e:
+                retry_in = self._retry_delay(job, e)
+                if retry_in is None:
+                    self.failed += 1
+                    if job.future is not None:
+                        job.future.set_exception(e)
+                    else:
+                        logger.error(f"Outbound call on {job.route} failed: {e}")
+                    return
+                self.retried += 1
+                job.attempt += 1
+                self._route_blocked_until[job.route] = time.monotonic() + retry_in
+                logger.warning(f"Retrying outbound call on {job.route} in {retry_in:.2f}s ({e})")
+                self._enqueue(job, retry_in)
+                return
+            finally:
+                self._run_samples[job.priority].append(time.monotonic() - started)
+
+            self.completed += 1
+            if job.future is not None and not job.future.done():
+                job.future.set_result(result)
+
+    def _prune_routes(self):
+        now = time.monotonic()
+        for route, lock in list(self._route_locks.items()):
+            if not lock.locked() and self._route_blocked_until.get(route, 0.0) <= now:
+                del self._route_locks[route]
+                self._route_blocked_until.pop(route, None)
+
+    def _retry_delay(self, job, error):
+        """Seconds to wait before retrying, or None if the error is permanent"""
+        if job.attempt >= self.max_retries:
+            return None
+
+        if isinstance(error, discord.RateLimited):
+            return error.retry_after + random.uniform(0, self.base_delay)
+        if isinstance(error, discord.HTTPException):
+            if error.status == 429:
+                retry_after = getattr(error.response, 'headers', {}).get('Retry-After')
+                if retry_after is not None:
+                    return float(retry_after) + random.uniform(0, self.base_delay)
+            elif error.status < 500:
+                return None
+        elif not isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError, OSError)):
+            return None
+
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** job.attempt))
+
+    def stats(self):
+        def percentile(samples, p):
+            if not samples:
+                return 0.0
+            ordered = sorted(samples)
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 3)
+
+        return {
+            "workers": len(self._workers),
+            "queue_depth": {PRIORITY_NAMES[p]: depth for p, depth in self._depth.items()},
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "wait_p50": {PRIORITY_NAMES[p]: percentile(s, 0.50) for p, s in self._wait_samples.items()},
+            "wait_p95": {PRIORITY_NAMES[p]: percentile(s, 0.95) for p, s in self._wait_samples.items()},
+            "run_p95": {PRIORITY_NAMES[p]: percentile(s, 0.95) for p, s in self._run_samples.items()}
+        }
@@ -0,0 +1,131 @@
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+import discord
+
+WARZONE = 'warzone'
+BLACK_OPS = 'black_ops'
+OTHER_COD = 'other_cod'
+CATEGORIES = (WARZONE, BLACK_OPS, OTHER_COD)
+
+# Checked in order, so "Call of Duty: Warzone" counts as Warzone and not as another CoD
+MATCHERS = (
+    (WARZONE, re.compile(r'warzone', re.IGNORECASE)),
+    (BLACK_OPS, re.compile(r'black ops', re.IGNORECASE)),
+    (OTHER_COD, re.compile(r'call of duty|\bcod\b', re.IGNORECASE))
+)
+
+
+@lru_cache(maxsize=4096)
+def classify(activity_name):
+    """Category of a game name, or None if it is not Call of Duty"""
+    for category, pattern in MATCHERS:
+        if pattern.search(activity_name):
+            return category
+    return None
+
+
+def cod_activity(activities):
+    """(category, name) of the first Call of Duty activity, or (None, None)"""
+    for activity in activities:
+        if isinstance(activity, (discord.Activity, discord.Game)) and activity.name:
+            category = classify(activity.name)
+            if category:
+                return category, activity.name
+    return None, None
+
+
+class PresenceIndex:
+    """Who is playing Call of Duty in each guild, kept up to date from presence events.
+
+    Each guild has one bucket per category mapping member ID to the game name,
+    so /jugadores reads the buckets instead of scanning every member. Counts
+    are sampled periodically into a bounded history and averaged per UTC hour
+    of the day to show when people play.
+    """
+
+    def __init__(self, history_size=2016):
+        self._guilds = {}  # guild_id -> {category: {member_id: activity name}}
+        self._categories = {}  # (guild_id, member_id) -> category
+        self._history = {}  # guild_id -> deque of (timestamp, counts)
+        self._hourly = {}  # guild_id -> 24 x [samples, sum of players]
+        self._history_size = history_size
+        self._lock = threading.Lock()
+
+    def update(self, guild_id, member_id, activities):
+        """Re-file a member after a presence change"""
+        category, name = cod_activity(activities)
+        with self._lock:
+            previous = self._categories.get((guild_id, member_id))
+            if previous is not None and previous != category:
+                del self._guilds[guild_id][previous][member_id]
+            if category is None:
+                self._categories.pop((guild_id, member_id), None)
+                return
+            buckets = self._guilds.setdefault(guild_id, {c: {} for c in CATEGORIES})
+            buckets[category][member_id] = name
+            self._categories[(guild_id, member_id)] = category
+
+    def remove(self, guild_id, member_id):
+        with self._lock:
+            category = self._categories.pop((guild_id, member_id), None)
+            if category is not None:
+                del self._guilds[guild_id][category][member_id]
+
+    def rebuild(self, guild):
+        """Index every member of a guild from the cache, used on startup and on join"""
+        self.clear_guild(guild.id)
+        for member in guild.members:
+            if member.activities:
+                self.update(guild.id, member.id, member.activities)
+
+    def clear_guild(self, guild_id):
+        with self._lock:
+            for member_id in [m for c in self._guilds.pop(guild_id, {}).values() for m in c]:
+                self._categories.pop((guild_id, member_id), None)
+
+    def guild_ids(self):
+        return sorted(set(self._guilds) | set(self._history))
+
+    def players(self, guild_id):
+        """{category: [(member_id, game name)]} for a guild"""
+        with self._lock:
+            buckets = self._guilds.get(guild_id, {})
+            return {category: list(buckets.get(category, {}).items()) for category in CATEGORIES}
+
+    def counts(self, guild_id):
+        with self._lock:
+            buckets = self._guilds.get(guild_id, {})
+            return {category: len(buckets.get(category, {})) for category in CATEGORIES}
+
+    def sample(self, now=None):
+        """Record the current counts of every guild"""
+        now = now or time.time()
+        hour = time.gmtime(now).tm_hour
+        for guild_id in list(self._guilds):
+            counts = self.counts(guild_id)
+            history = self._history.setdefault(guild_id, deque(maxlen=self._history_size))
+            history.append((int(now), counts))
+            hourly = self._hourly.setdefault(guild_id, [[0, 0] for _ in range(24)])
+            hourly[hour][0] += 1
+            hourly[hour][1] += sum(counts.values())
+
+    def history(self, guild_id):
+        return list(self._history.get(guild_id, ()))
+
+    def hourly_average(self, guild_id):
+        """Average number of CoD players per UTC hour of the day"""
+        hourly = self._hourly.get(guild_id)
+        if not hourly:
+            return {}
+        return {hour: round(total / samples, 1) for hour, (samples, total) in enumerate(hourly) if samples}
+
+    def peak_hour(self, guild_id):
+        """(hour, average players) of the busiest UTC hour, or None without samples"""
+        averages = self.hourly_average(guild_id)
+        if not averages:
+            return None
+        return max(averages.items(), key=lambda item: item[1])
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+
+class PlayerProfile(namedtuple('PlayerProfile', 'id discord_id username activision_id kd_ratio created_at')):
+    """Immutable snapshot of the User columns the bot reads on every interaction"""
+    __slots__ = ()
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(
+            id=user.id,
+            discord_id=user.discord_id,
+            username=user.username,
+            activision_id=user.activision_id,
+            kd_ratio=user.kd_ratio,
+            created_at=user.created_at
+        )
+
+
+class ProfileCache:
+    """Bounded LRU cache of player profiles keyed by discord_id, with a TTL"""
+
+    def __init__(self, maxsize=1000, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, discord_id):
+        key = str(discord_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            profile, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return profile
+
+    def put(self, profile):
+        key = str(profile.discord_id)
+        with self._lock:
+            self._entries[key] = (profile, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, discord_id):
+        with self._lock:
+            self._entries.pop(str(discord_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class DisplayNameCache:
+    """Bounded LRU cache of member display names keyed by (guild_id, member_id), with a TTL"""
+
+    def __init__(self, maxsize=2000, ttl=120.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, guild_id, member_id):
+        key = (guild_id, member_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, guild_id, member_id, name):
+        key = (guild_id, member_id)
+        with self._lock:
+            self._entries[key] = (name, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        return {"size": len(self._entries), "maxsize": self.maxsize, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses}
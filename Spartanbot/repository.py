@@ -0,0 +1,764 @@
+import asyncio
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+
+from sqlalchemy import BigInteger, and_, cast, delete, func, or_, select, true, update
+from sqlalchemy.orm import Session, aliased
+
+from metrics import FAST_BUCKETS, counter, histogram
+from profile_cache import PlayerProfile
+
+logger = logging.getLogger(__name__)
+
+db_seconds = histogram('db_operation_seconds', 'Duration of repository database operations', 'operation', FAST_BUCKETS)
+db_errors = counter('db_operation_errors_total', 'Repository database operations that raised', 'operation')
+
+RosterEntry = namedtuple('RosterEntry', 'discord_id activision_id kd_ratio')
+TeamRoster = namedtuple('TeamRoster', 'team_id max_players owner members')
+ActiveSearch = namedtuple('ActiveSearch', 'team owner_discord_id member_discord_ids')
+ActiveTournament = namedtuple('ActiveTournament', 'tournament entries matches')
+TeamListing = namedtuple('TeamListing', 'team owner_activision_id joined')
+
+
+def on_shards(guild_id, shard_ids, shard_count):
+    """SQL counterpart of main.owns_guild: rows whose guild falls on shard_ids, rows without a guild on shard 0"""
+    if not shard_ids:
+        return true()
+    shard = cast(guild_id, BigInteger).op('>>')(22) % shard_count
+    owned = shard.in_(shard_ids)
+    if 0 in shard_ids:
+        owned = owned | guild_id.is_(None)
+    return owned
+
+
+class Repository:
+    """Async data-access layer for the bot.
+
+    Every method runs its database work on a bounded thread pool so the
+    discord.py event loop never waits on SQLite/PostgreSQL I/O. Each call opens
+    its own short-lived session instead of sharing Flask-SQLAlchemy's scoped
+    session between handlers.
+    """
+
+    def __init__(self, app, db, models, max_workers=4, profile_cache=None):
+        self.app = app
+        self.db = db
+        self.User = models.User
+        self.Team = models.Team
+        self.TeamMember = models.TeamMember
+        self.GuildMember = models.GuildMember
+        self.Tournament = models.Tournament
+        self.TournamentEntry = models.TournamentEntry
+        self.BracketMatch = models.BracketMatch
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+        self._engine = None
+        self.profile_cache = profile_cache
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            with self.app.app_context():
+                self._engine = self.db.engine
+        return self._engine
+
+    def _call(self, func, *args, **kwargs):
+        """Run func(session, ...) in a fresh session, committing on success"""
+        operation = func.__name__.lstrip('_')
+        started = time.perf_counter()
+        with Session(self.engine, expire_on_commit=False) as session:
+            try:
+                result = func(session, *args, **kwargs)
+                session.commit()
+                return result
+            except Exception:
+                session.rollback()
+                db_errors.inc(operation)
+                raise
+            finally:
+                db_seconds.observe(operation, time.perf_counter() - started)
+
+    async def run(self, func, *args, **kwargs):
+        """Run a session-bound function on the database executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(self._call, func, *args, **kwargs))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    # Users
+
+    def _get_user_by_discord_id(self, session, discord_id):
+        return session.execute(
+            select(self.User).where(self.User.discord_id == str(discord_id))
+        ).scalar_one_or_none()
+
+    async def get_user_by_discord_id(self, discord_id):
+        return await self.run(self._get_user_by_discord_id, discord_id)
+
+    def _upsert_user(self, session, discord_id, username, discriminator, activision_id, kd_ratio, guild_ids=()):
+        user = self._get_user_by_discord_id(session, discord_id)
+        if user:
+            user.activision_id = activision_id
+            user.kd_ratio = kd_ratio
+            user.username = username
+            user.discriminator = discriminator
+            user.updated_at = datetime.utcnow()
+        else:
+            user = self.User(
+                discord_id=str(discord_id),
+                username=username,
+                discriminator=discriminator,
+                activision_id=activision_id,
+                kd_ratio=kd_ratio
+            )
+            session.add(user)
+        session.flush()
+
+        # Keep the copies in the guild member rows in step and join the given guilds
+        session.execute(
+            update(self.GuildMember)
+            .where(self.GuildMember.user_id == user.id)
+            .values(activision_id=activision_id, kd_ratio=kd_ratio or 0.0)
+        )
+        if guild_ids:
+            known = set(session.execute(
+                select(self.GuildMember.guild_id).where(self.GuildMember.user_id == user.id)
+            ).scalars())
+            session.add_all(
+                self.GuildMember(guild_id=guild_id, user_id=user.id, activision_id=activision_id,
+                                 kd_ratio=kd_ratio or 0.0)
+                for guild_id in {str(guild_id) for guild_id in guild_ids} - known
+            )
+        return user
+
+    async def get_profile(self, discord_id):
+        """Return the PlayerProfile for discord_id, consulting the cache first"""
+        if self.profile_cache is not None:
+            profile = self.profile_cache.get(discord_id)
+            if profile is not None:
+                return profile
+
+        user = await self.get_user_by_discord_id(discord_id)
+        if user is None:
+            return None
+
+        profile = PlayerProfile.from_user(user)
+        if self.profile_cache is not None:
+            self.profile_cache.put(profile)
+        return profile
+
+    def _get_users_by_discord_ids(self, session, discord_ids):
+        return session.execute(
+            select(self.User).where(self.User.discord_id.in_(discord_ids))
+        ).scalars().all()
+
+    async def get_profiles(self, discord_ids):
+        """Return {discord_id: PlayerProfile} for the registered users among discord_ids"""
+        profiles = {}
+        missing = []
+        for discord_id in {str(discord_id) for discord_id in discord_ids}:
+            profile = self.profile_cache.get(discord_id) if self.profile_cache is not None else None
+            if profile is None:
+                missing.append(discord_id)
+            else:
+                profiles[discord_id] = profile
+
+        if missing:
+            for user in await self.run(self._get_users_by_discord_ids, missing):
+                profile = PlayerProfile.from_user(user)
+                profiles[profile.discord_id] = profile
+                if self.profile_cache is not None:
+                    self.profile_cache.put(profile)
+        return profiles
+
+    def _get_users_by_activision_ids(self, session, activision_ids):
+        return session.execute(
+            select(self.User).where(self.User.activision_id.in_(activision_ids))
+        ).scalars().all()
+
+    async def get_profiles_by_activision_ids(self, activision_ids):
+        """Return {activision_id: PlayerProfile} for the registered players among activision_ids"""
+        users = await self.run(self._get_users_by_activision_ids, list(activision_ids))
+        return {user.activision_id: PlayerProfile.from_user(user) for user in users}
+
+    async def upsert_user(self, discord_id, username, discriminator, activision_id, kd_ratio, guild_ids=()):
+        """Create or update a user, add them to guild_ids and write the new profile through to the cache"""
+        user = await self.run(
+            self._upsert_user, discord_id, username, discriminator, activision_id, kd_ratio, guild_ids
+        )
+        profile = PlayerProfile.from_user(user)
+        if self.profile_cache is not None:
+            self.profile_cache.put(profile)
+        return profile
+
+    def _players_page(self, session, guild_id, order, after, before, limit):
+        # Keyset pagination over the (guild_id, kd_ratio, user_id) or
+        # (guild_id, activision_id, user_id) index: the page starts right after
+        # (or ends right before) the key of the last (first) row shown, so the
+        # database reads one page of the guild instead of skipping OFFSET rows
+        member = self.GuildMember
+        if order == 'kd':
+            # Ties go by descending user id as well so the index order needs no extra sort
+            key = member.kd_ratio
+            forward = (key.desc(), member.user_id.desc())
+            backward = (key.asc(), member.user_id.asc())
+
+            def past(cursor):
+                return or_(key < cursor[0], and_(key == cursor[0], member.user_id < cursor[1]))
+
+            def ahead(cursor):
+                return or_(key > cursor[0], and_(key == cursor[0], member.user_id > cursor[1]))
+        else:
+            key = member.activision_id
+            forward = (key.asc(), member.user_id.asc())
+            backward = (key.desc(), member.user_id.desc())
+
+            def past(cursor):
+                return or_(key > cursor[0], and_(key == cursor[0], member.user_id > cursor[1]))
+
+            def ahead(cursor):
+                return or_(key < cursor[0], and_(key == cursor[0], member.user_id < cursor[1]))
+
+        query = (
+            select(self.User)
+            .join(member, member.user_id == self.User.id)
+            .where(member.guild_id == str(guild_id), member.activision_id.is_not(None))
+        )
+        if before is not None:
+            query = query.where(ahead(before)).order_by(*backward)
+        else:
+            if after is not None:
+                query = query.where(past(after))
+            query = query.order_by(*forward)
+
+        users = session.execute(query.limit(limit + 1)).scalars().all()
+        has_more = len(users) > limit
+        users = users[:limit]
+        if before is not None:
+            users.reverse()
+        return [PlayerProfile.from_user(user) for user in users], has_more
+
+    async def players_page(self, guild_id, order='kd', after=None, before=None, limit=15):
+        """One page of a guild's registered players, ordered by K/D or Activision ID.
+
+        after/before are the (sort value, user id) cursor of the last/first player
+        of the page being left; returns (profiles, whether more pages follow in
+        that direction).
+        """
+        return await self.run(self._players_page, guild_id, order, after, before, limit)
+
+    def _top_players_page(self, session, min_kd, guild_id, after, limit):
+        # Highest K/D first with ties by descending user id, read from the
+        # (kd_ratio, id) index or, within a guild, the (guild_id, kd_ratio, user_id) one
+        if guild_id is not None:
+            member = self.GuildMember
+            kd, user_id = member.kd_ratio, member.user_id
+            query = (
+                select(self.User)
+                .join(member, member.user_id == self.User.id)
+                .where(member.guild_id == str(guild_id), member.activision_id.is_not(None))
+            )
+        else:
+            kd, user_id = self.User.kd_ratio, self.User.id
+            query = select(self.User).where(kd.is_not(None), self.User.activision_id.is_not(None))
+
+        if min_kd is not None:
+            query = query.where(kd >= min_kd)
+        if after is not None:
+            query = query.where(or_(kd < after[0], and_(kd == after[0], user_id < after[1])))
+
+        users = session.execute(query.order_by(kd.desc(), user_id.desc()).limit(limit + 1)).scalars().all()
+        return [PlayerProfile.from_user(user) for user in users[:limit]], len(users) > limit
+
+    async def top_players_page(self, min_kd=None, guild_id=None, after=None, limit=20):
+        """One page of registered players by descending K/D, optionally within a guild.
+
+        after is the (kd_ratio, user id) cursor of the last player of the
+        previous page; returns (profiles, whether more pages follow).
+        """
+        return await self.run(self._top_players_page, min_kd, guild_id, after, limit)
+
+    # Guild membership
+
+    def _sync_guild_members(self, session, guild_id, discord_ids, chunk_size=500):
+        guild_id = str(guild_id)
+        registered = {}
+        discord_ids = [str(discord_id) for discord_id in discord_ids]
+        for start in range(0, len(discord_ids), chunk_size):
+            for user_id, activision_id, kd_ratio in session.execute(
+                select(self.User.id, self.User.activision_id, self.User.kd_ratio)
+                .where(self.User.discord_id.in_(discord_ids[start:start + chunk_size]))
+            ):
+                registered[user_id] = (activision_id, kd_ratio or 0.0)
+
+        known = set(session.execute(
+            select(self.GuildMember.user_id).where(self.GuildMember.guild_id == guild_id)
+        ).scalars())
+        gone = list(known - registered.keys())
+        for start in range(0, len(gone), chunk_size):
+            session.execute(
+                delete(self.GuildMember).where(
+                    self.GuildMember.guild_id == guild_id,
+                    self.GuildMember.user_id.in_(gone[start:start + chunk_size])
+                )
+            )
+        joined = registered.keys() - known
+        session.add_all(
+            self.GuildMember(guild_id=guild_id, user_id=user_id, activision_id=registered[user_id][0],
+                             kd_ratio=registered[user_id][1])
+            for user_id in joined
+        )
+        return len(joined), len(gone)
+
+    async def sync_guild_members(self, guild_id, discord_ids):
+        """Make the guild's member rows match the registered users among discord_ids, returns (added, removed)"""
+        return await self.run(self._sync_guild_members, guild_id, list(discord_ids))
+
+    def _add_guild_member(self, session, guild_id, discord_id):
+        user = self._get_user_by_discord_id(session, discord_id)
+        if user is None:
+            return False
+        exists = session.execute(
+            select(self.GuildMember.id).where(
+                self.GuildMember.guild_id == str(guild_id), self.GuildMember.user_id == user.id
+            )
+        ).first()
+        if not exists:
+            session.add(self.GuildMember(
+                guild_id=str(guild_id), user_id=user.id,
+                activision_id=user.activision_id, kd_ratio=user.kd_ratio or 0.0
+            ))
+        return True
+
+    async def add_guild_member(self, guild_id, discord_id):
+        """Record that a registered user joined a guild, False if they are not registered"""
+        return await self.run(self._add_guild_member, guild_id, discord_id)
+
+    def _remove_guild_member(self, session, guild_id, discord_id):
+        user_id = select(self.User.id).where(self.User.discord_id == str(discord_id)).scalar_subquery()
+        return session.execute(
+            delete(self.GuildMember).where(
+                self.GuildMember.guild_id == str(guild_id), self.GuildMember.user_id == user_id
+            )
+        ).rowcount
+
+    async def remove_guild_member(self, guild_id, discord_id):
+        return await self.run(self._remove_guild_member, guild_id, discord_id)
+
+    # Teams
+
+    def _create_team(self, session, **fields):
+        team = self.Team(**fields)
+        session.add(team)
+        session.flush()
+        return team
+
+    async def create_team(self, owner_id, platform, mode, max_players, kd_minimum=0.0,
+                          description=None, discord_message_id=None, guild_id=None, channel_id=None):
+        return await self.run(
+            self._create_team,
+            owner_id=owner_id,
+            platform=platform,
+            mode=mode,
+            kd_minimum=kd_minimum,
+            max_players=max_players,
+            description=description,
+            discord_message_id=discord_message_id,
+            guild_id=str(guild_id) if guild_id else None,
+            channel_id=str(channel_id) if channel_id else None,
+            is_active=True
+        )
+
+    def _add_member(self, session, team_id, user_id):
+        team = session.get(self.Team, team_id)
+        if not team:
+            return None
+        # (team_id, user_id) is unique, joining twice returns the existing row
+        member = session.execute(
+            select(self.TeamMember).where(self.TeamMember.team_id == team.id, self.TeamMember.user_id == user_id)
+        ).scalar_one_or_none()
+        if member is not None:
+            return member
+        member = self.TeamMember(team_id=team.id, user_id=user_id)
+        session.add(member)
+        session.flush()
+        return member
+
+    async def add_member(self, team_id, user_id):
+        return await self.run(self._add_member, team_id, user_id)
+
+    def _deactivate_team_by_message_id(self, session, discord_message_id):
+        team = session.execute(
+            select(self.Team).where(self.Team.discord_message_id == discord_message_id)
+        ).scalars().first()
+        if team:
+            team.is_active = False
+        return team
+
+    async def deactivate_team_by_message_id(self, discord_message_id):
+        return await self.run(self._deactivate_team_by_message_id, discord_message_id)
+
+    def _update_team(self, session, team_id, **fields):
+        team = session.get(self.Team, team_id)
+        if team:
+            for name, value in fields.items():
+                setattr(team, name, value)
+        return team
+
+    async def deactivate_team(self, team_id):
+        return await self.run(self._update_team, team_id, is_active=False)
+
+    async def set_team_message_id(self, team_id, discord_message_id):
+        return await self.run(self._update_team, team_id, discord_message_id=discord_message_id)
+
+    def _deactivate_teams(self, session, team_ids=(), discord_message_ids=()):
+        count = 0
+        if team_ids:
+            count += session.execute(
+                update(self.Team)
+                .where(self.Team.id.in_(team_ids), self.Team.is_active.is_(True))
+                .values(is_active=False)
+            ).rowcount
+        if discord_message_ids:
+            count += session.execute(
+                update(self.Team)
+                .where(self.Team.discord_message_id.in_(discord_message_ids), self.Team.is_active.is_(True))
+                .values(is_active=False)
+            ).rowcount
+        return count
+
+    async def deactivate_teams(self, team_ids=(), discord_message_ids=()):
+        """Mark many teams inactive in one UPDATE per key type, returns the rows changed"""
+        return await self.run(
+            self._deactivate_teams, list(team_ids), [str(message_id) for message_id in discord_message_ids]
+        )
+
+    def _get_team_roster(self, session, team_id):
+        owner = aliased(self.User)
+        player = aliased(self.User)
+        rows = session.execute(
+            select(
+                self.Team.max_players,
+                owner.discord_id, owner.activision_id, owner.kd_ratio,
+                player.discord_id, player.activision_id, player.kd_ratio
+            )
+            .outerjoin(owner, owner.id == self.Team.owner_id)
+            .outerjoin(self.TeamMember, self.TeamMember.team_id == self.Team.id)
+            .outerjoin(player, player.id == self.TeamMember.user_id)
+            .where(self.Team.id == team_id)
+            .order_by(self.TeamMember.joined_at, self.TeamMember.id)
+        ).all()
+        if not rows:
+            return None
+
+        max_players = rows[0][0]
+        owner_entry = RosterEntry(*rows[0][1:4])
+        members = [RosterEntry(*row[4:7]) for row in rows if row[4] is not None]
+        return TeamRoster(team_id, max_players, owner_entry, members)
+
+    async def get_team_roster(self, team_id):
+        """Load owner and members of a team with their Activision IDs and K/D in one query"""
+        return await self.run(self._get_team_roster, team_id)
+
+    def _load_active_searches(self, session):
+        owner = aliased(self.User)
+        # Private matches and tournaments store synthetic "<guild>_<timestamp>" IDs
+        # instead of a message ID, so only rows with a plain snowflake are searches
+        search_filter = (
+            self.Team.is_active.is_(True),
+            self.Team.discord_message_id.is_not(None),
+            ~self.Team.discord_message_id.contains('_', autoescape=True)
+        )
+
+        teams = session.execute(
+            select(self.Team, owner.discord_id)
+            .join(owner, owner.id == self.Team.owner_id)
+            .where(*search_filter)
+        ).all()
+
+        active_ids = select(self.Team.id).where(*search_filter)
+        members = {}
+        for team_id, discord_id in session.execute(
+            select(self.TeamMember.team_id, self.User.discord_id)
+            .join(self.User, self.User.id == self.TeamMember.user_id)
+            .where(self.TeamMember.team_id.in_(active_ids))
+            .order_by(self.TeamMember.joined_at, self.TeamMember.id)
+        ):
+            members.setdefault(team_id, []).append(discord_id)
+
+        return [
+            ActiveSearch(team, owner_discord_id, members.get(team.id, []))
+            for team, owner_discord_id in teams
+        ]
+
+    async def load_active_searches(self):
+        """Bulk-load every active team search with its roster in two queries"""
+        return await self.run(self._load_active_searches)
+
+    def _open_teams_page(self, session, platform, mode, min_kd, guild_id, after, limit):
+        owner = aliased(self.User)
+        joined = (
+            select(func.count(self.TeamMember.id))
+            .where(self.TeamMember.team_id == self.Team.id)
+            .scalar_subquery()
+        )
+        query = (
+            select(self.Team, owner.activision_id, joined)
+            .join(owner, owner.id == self.Team.owner_id)
+            .where(
+                self.Team.is_active.is_(True),
+                self.Team.discord_message_id.is_not(None),
+                ~self.Team.discord_message_id.contains('_', autoescape=True)
+            )
+        )
+        if guild_id is not None:
+            query = query.where(self.Team.guild_id == str(guild_id))
+        if platform:
+            query = query.where(self.Team.platform == platform)
+        if mode:
+            query = query.where(self.Team.mode == mode)
+        if min_kd is not None:
+            query = query.where(self.Team.kd_minimum >= min_kd)
+        if after is not None:
+            query = query.where(self.Team.id < after)
+
+        rows = session.execute(query.order_by(self.Team.id.desc()).limit(limit + 1)).all()
+        return [TeamListing(*row) for row in rows[:limit]], len(rows) > limit
+
+    async def open_teams_page(self, platform=None, mode=None, min_kd=None, guild_id=None, after=None, limit=20):
+        """One page of active team searches, newest first, with how many players joined each.
+
+        after is the team id of the last search of the previous page; returns
+        (listings, whether more pages follow).
+        """
+        return await self.run(self._open_teams_page, platform, mode, min_kd, guild_id, after, limit)
+
+    def _create_full_teams(self, session, teams):
+        team_ids = []
+        for owner_id, platform, mode, member_ids, guild_id, channel_id in teams:
+            team = self.Team(
+                owner_id=owner_id,
+                platform=platform,
+                mode=mode,
+                guild_id=str(guild_id) if guild_id else None,
+                channel_id=str(channel_id) if channel_id else None,
+                max_players=len(member_ids) + 1,
+                is_active=False  # Already complete, nobody else can join
+            )
+            session.add(team)
+            session.flush()
+            session.add_all(self.TeamMember(team_id=team.id, user_id=user_id) for user_id in member_ids)
+            team_ids.append(team.id)
+        return team_ids
+
+    async def create_full_teams(self, teams):
+        """Insert complete teams, given as (owner_id, platform, mode, member_ids, guild_id, channel_id), in one transaction"""
+        return await self.run(self._create_full_teams, teams)
+
+    # Tournaments
+
+    def _create_tournament(self, session, **fields):
+        tournament = self.Tournament(**fields)
+        session.add(tournament)
+        session.flush()
+        return tournament
+
+    async def create_tournament(self, owner_discord_id, mode, team_size, prize, format,
+                                description=None, guild_id=None, channel_id=None):
+        return await self.run(
+            self._create_tournament,
+            owner_discord_id=str(owner_discord_id),
+            mode=mode,
+            team_size=team_size,
+            prize=prize,
+            format=format,
+            description=description,
+            guild_id=str(guild_id) if guild_id else None,
+            channel_id=str(channel_id) if channel_id else None,
+            status='registration'
+        )
+
+    def _get_tournament(self, session, tournament_id):
+        return session.get(self.Tournament, tournament_id)
+
+    async def get_tournament(self, tournament_id):
+        return await self.run(self._get_tournament, tournament_id)
+
+    def _update_tournament(self, session, tournament_id, **fields):
+        tournament = session.get(self.Tournament, tournament_id)
+        if tournament:
+            for name, value in fields.items():
+                setattr(tournament, name, value)
+        return tournament
+
+    async def update_tournament(self, tournament_id, **fields):
+        return await self.run(self._update_tournament, tournament_id, **fields)
+
+    def _expire_tournaments(self, session, tournament_ids):
+        return session.execute(
+            update(self.Tournament)
+            .where(
+                self.Tournament.id.in_(tournament_ids),
+                self.Tournament.status.in_(('registration', 'running'))
+            )
+            .values(status='expired', updated_at=datetime.utcnow())
+        ).rowcount
+
+    async def expire_tournaments(self, tournament_ids):
+        """Close tournaments that saw no activity for too long, in one UPDATE"""
+        return await self.run(self._expire_tournaments, list(tournament_ids))
+
+    def _add_tournament_entry(self, session, tournament_id, captain_discord_id, name, members, avg_kd):
+        tournament = session.get(self.Tournament, tournament_id)
+        if tournament is None or tournament.status != 'registration':
+            return None, 0
+
+        entries = self.TournamentEntry.tournament_id == tournament_id
+        already_registered = session.execute(
+            select(self.TournamentEntry.id)
+            .where(entries, self.TournamentEntry.captain_discord_id == str(captain_discord_id))
+        ).first()
+        if already_registered:
+            return None, 0
+
+        entry = self.TournamentEntry(
+            tournament_id=tournament_id,
+            captain_discord_id=str(captain_discord_id),
+            name=name,
+            members=members,
+            avg_kd=avg_kd
+        )
+        session.add(entry)
+        session.flush()
+        count = session.execute(select(func.count()).where(entries)).scalar_one()
+        return entry, count
+
+    async def add_tournament_entry(self, tournament_id, captain_discord_id, name, members, avg_kd):
+        """Register a team, returns (entry, total entries) or (None, 0) if not allowed"""
+        return await self.run(
+            self._add_tournament_entry, tournament_id, captain_discord_id, name, members, avg_kd
+        )
+
+    def _get_tournament_with_entry_count(self, session, tournament_id):
+        count = select(func.count()).where(self.TournamentEntry.tournament_id == tournament_id).scalar_subquery()
+        return tuple(session.execute(
+            select(self.Tournament, count).where(self.Tournament.id == tournament_id)
+        ).one())
+
+    async def get_tournament_with_entry_count(self, tournament_id):
+        """(tournament, number of entries) in one query, used to render the registration message"""
+        return await self.run(self._get_tournament_with_entry_count, tournament_id)
+
+    def _list_tournament_entries(self, session, tournament_id):
+        return session.execute(
+            select(self.TournamentEntry)
+            .where(self.TournamentEntry.tournament_id == tournament_id)
+            .order_by(self.TournamentEntry.id)
+        ).scalars().all()
+
+    async def list_tournament_entries(self, tournament_id):
+        return await self.run(self._list_tournament_entries, tournament_id)
+
+    def _save_bracket(self, session, tournament_id, seeds, records):
+        # Closing registration is the guard: of two concurrent generations only
+        # the one whose UPDATE still finds the tournament in registration saves
+        started = session.execute(
+            update(self.Tournament)
+            .where(self.Tournament.id == tournament_id, self.Tournament.status == 'registration')
+            .values(status='running', updated_at=datetime.utcnow())
+        ).rowcount
+        if not started:
+            return False
+        for entry in self._list_tournament_entries(session, tournament_id):
+            entry.seed = seeds.get(entry.id)
+        session.add_all(self.BracketMatch(tournament_id=tournament_id, **record) for record in records)
+        return True
+
+    async def save_bracket(self, tournament_id, seeds, records):
+        """Store the seeds and every match of a freshly generated bracket.
+
+        Returns False, saving nothing, if the tournament already left registration.
+        """
+        return await self.run(self._save_bracket, tournament_id, seeds, records)
+
+    def _update_bracket_matches(self, session, tournament_id, records):
+        by_number = {record['number']: record for record in records}
+        matches = session.execute(
+            select(self.BracketMatch).where(
+                self.BracketMatch.tournament_id == tournament_id,
+                self.BracketMatch.number.in_(by_number)
+            )
+        ).scalars().all()
+        for match in matches:
+            for name, value in by_number[match.number].items():
+                setattr(match, name, value)
+
+    async def update_bracket_matches(self, tournament_id, records):
+        """Write back only the matches touched by a reported result"""
+        return await self.run(self._update_bracket_matches, tournament_id, records)
+
+    def _expire_stale(self, session, search_cutoff, tournament_cutoff, shard_ids, shard_count):
+        # Private match views do not survive a restart, so none of their rows can
+        # be used anymore; searches and tournaments only once their TTL has passed.
+        # Rows of guilds run by another process are left for that process to sweep
+        teams = session.execute(
+            update(self.Team)
+            .where(
+                self.Team.is_active.is_(True),
+                on_shards(self.Team.guild_id, shard_ids, shard_count),
+                self.Team.discord_message_id.contains('_', autoescape=True)
+                | (self.Team.created_at < search_cutoff)
+            )
+            .values(is_active=False)
+        ).rowcount
+        tournaments = session.execute(
+            update(self.Tournament)
+            .where(
+                self.Tournament.status.in_(('registration', 'running')),
+                self.Tournament.updated_at < tournament_cutoff,
+                on_shards(self.Tournament.guild_id, shard_ids, shard_count)
+            )
+            .values(status='expired', updated_at=datetime.utcnow())
+        ).rowcount
+        return teams, tournaments
+
+    async def expire_stale(self, search_cutoff, tournament_cutoff, shard_ids=None, shard_count=None):
+        """Startup sweep of rows that expired while the bot was down, returns (teams, tournaments)
+
+        With shard_ids only the guilds on those shards (out of shard_count) are swept.
+        """
+        return await self.run(self._expire_stale, search_cutoff, tournament_cutoff, shard_ids, shard_count)
+
+    def _load_active_tournaments(self, session):
+        tournaments = session.execute(
+            select(self.Tournament).where(
+                self.Tournament.status.in_(('registration', 'running')),
+                self.Tournament.discord_message_id.is_not(None)
+            )
+        ).scalars().all()
+        running_ids = [t.id for t in tournaments if t.status == 'running']
+
+        entries = {}
+        matches = {}
+        if running_ids:
+            for entry in session.execute(
+                select(self.TournamentEntry).where(self.TournamentEntry.tournament_id.in_(running_ids))
+            ).scalars():
+                entries.setdefault(entry.tournament_id, []).append(entry)
+            for match in session.execute(
+                select(self.BracketMatch).where(self.BracketMatch.tournament_id.in_(running_ids))
+            ).scalars():
+                matches.setdefault(match.tournament_id, []).append(match)
+
+        return [
+            ActiveTournament(t, entries.get(t.id, []), matches.get(t.id, []))
+            for t in tournaments
+        ]
+
+    async def load_active_tournaments(self):
+        """Tournaments still taking entries or being played, with brackets for the running ones"""
+        return await self.run(self._load_active_tournaments)
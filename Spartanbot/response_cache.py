@@ -0,0 +1,103 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import time
+from collections import OrderedDict, namedtuple
+
+from aiohttp import web
+
+CachedResponse = namedtuple('CachedResponse', 'body gzipped etag expires_at')
+
+
+class ResponseCache:
+    """Short-TTL cache of rendered JSON responses for the public API.
+
+    Each distinct query is rendered once per TTL: the JSON body, its gzip
+    encoding and a weak ETag are computed when the entry is filled and reused
+    for every request until it expires. Concurrent misses for the same query
+    wait on the first one instead of each hitting the database, so the query
+    count per minute depends on how many distinct filters visitors use, not
+    on how many visitors poll.
+    """
+
+    def __init__(self, ttl=5.0, maxsize=512, min_gzip_size=512):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.min_gzip_size = min_gzip_size
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.not_modified = 0
+
+    async def get(self, key, produce):
+        """Cached response for key, calling the coroutine function produce() to fill it"""
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            entry = self.render(await produce())
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Retrieved here so waiters-less failures are not logged as unhandled
+            raise
+        finally:
+            del self._inflight[key]
+
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        future.set_result(entry)
+        return entry
+
+    def render(self, data):
+        body = json.dumps(data, separators=(',', ':'), default=str).encode()
+        etag = 'W/"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        gzipped = gzip.compress(body, compresslevel=6) if len(body) >= self.min_gzip_size else None
+        return CachedResponse(body, gzipped, etag, time.monotonic() + self.ttl)
+
+    def respond(self, request, entry):
+        """aiohttp response for entry: 304 on a matching If-None-Match, gzipped if the client accepts it"""
+        headers = {
+            'ETag': entry.etag,
+            'Cache-Control': f'public, max-age={int(self.ttl)}',
+            'Vary': 'Accept-Encoding'
+        }
+        if_none_match = request.headers.get('If-None-Match', '')
+        candidates = {tag.strip() for tag in if_none_match.split(',')}
+        if entry.etag in candidates or entry.etag[2:] in candidates or '*' in candidates:
+            self.not_modified += 1
+            return web.Response(status=304, headers=headers)
+
+        body = entry.body
+        if entry.gzipped is not None and 'gzip' in request.headers.get('Accept-Encoding', ''):
+            body = entry.gzipped
+            headers['Content-Encoding'] = 'gzip'
+        return web.Response(body=body, content_type='application/json', headers=headers)
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "not_modified": self.not_modified,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0
+        }
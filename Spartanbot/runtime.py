@@ -0,0 +1,153 @@
+import asyncio
+import io
+import logging
+import signal
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote_to_bytes
+
+import discord
+from aiohttp import web
+from multidict import CIMultiDict
+
+logger = logging.getLogger(__name__)
+
+# Set by the server from the message body or recomputed by aiohttp
+_SKIPPED_RESPONSE_HEADERS = {'content-length', 'transfer-encoding', 'connection'}
+
+
+class WSGIHandler:
+    """aiohttp handler that serves a WSGI app (the Flask site) from a thread pool.
+
+    The request body is read on the event loop, the WSGI call runs in a pool
+    thread so a slow view never blocks the gateway, and the collected body is
+    sent back as one aiohttp response.
+    """
+
+    def __init__(self, wsgi_app, executor):
+        self.wsgi_app = wsgi_app
+        self.executor = executor
+
+    async def __call__(self, request):
+        body = await request.read()
+        environ = self.environ(request, body)
+        status, headers, chunks = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self._call, environ
+        )
+        code, _, reason = status.partition(' ')
+        response_headers = CIMultiDict(
+            (name, value) for name, value in headers if name.lower() not in _SKIPPED_RESPONSE_HEADERS
+        )
+        return web.Response(body=chunks, status=int(code), reason=reason or None, headers=response_headers)
+
+    def _call(self, environ):
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = status
+            started['headers'] = headers
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            body = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return started['status'], started['headers'], body
+
+    @staticmethod
+    def environ(request, body):
+        path = request.raw_path.split('?', 1)[0]
+        environ = {
+            'REQUEST_METHOD': request.method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': unquote_to_bytes(path).decode('latin-1'),
+            'QUERY_STRING': request.query_string,
+            'SERVER_NAME': request.url.host or 'localhost',
+            'SERVER_PORT': str(request.url.port or 80),
+            'SERVER_PROTOCOL': f"HTTP/{request.version.major}.{request.version.minor}",
+            'REMOTE_ADDR': request.remote or '',
+            'CONTENT_TYPE': request.headers.get('Content-Type', ''),
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': request.scheme,
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False
+        }
+        for name in request.headers:
+            if name.lower() in ('content-type', 'content-length'):
+                continue
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            if key not in environ:
+                environ[key] = ','.join(request.headers.getall(name))
+        return environ
+
+
+def create_web_app(wsgi_app, threads=8, routes=()):
+    """aiohttp application with the given native routes, falling back to wsgi_app for everything else"""
+    executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="http")
+    web_app = web.Application()
+    web_app.router.add_routes(routes)
+    web_app.router.add_route('*', '/{path:.*}', WSGIHandler(wsgi_app, executor))
+
+    async def shutdown_executor(_):
+        executor.shutdown(wait=True)
+    web_app.on_cleanup.append(shutdown_executor)
+    return web_app
+
+
+async def serve(bot, token, web_app, host, port, on_shutdown, grace=10.0):
+    """Run bot and web_app on this event loop until SIGINT/SIGTERM or the bot stops.
+
+    On the way out on_shutdown() gets up to grace seconds to stop background
+    work and flush what is queued, then the gateway connection is closed and
+    the web server stops after finishing the requests in flight. Returns the
+    process exit code: 1 if the bot stopped by itself, 0 otherwise.
+    """
+    runner = web.AppRunner(web_app, access_log=None, shutdown_timeout=grace)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"🌐 Servidor web escuchando en http://{host}:{port}")
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except NotImplementedError:  # Windows, Ctrl+C still raises KeyboardInterrupt
+            pass
+
+    bot_task = asyncio.create_task(bot.start(token))
+    stop_task = asyncio.create_task(stopping.wait())
+    await asyncio.wait({bot_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+
+    exit_code = 0
+    if bot_task.done():
+        exit_code = 1
+        error = bot_task.exception()
+        if isinstance(error, discord.LoginFailure):
+            logger.error("Invalid Discord token provided. Please check your .env file.")
+        elif error is not None:
+            logger.error(f"Error starting bot: {error}")
+        else:
+            logger.error("Discord connection closed unexpectedly")
+    stop_task.cancel()
+
+    logger.info("🛑 Deteniendo el bot y el servidor web...")
+    try:
+        await asyncio.wait_for(on_shutdown(), grace)
+    except asyncio.TimeoutError:
+        logger.warning(f"Shutdown tasks did not finish within {grace:.0f}s")
+    except Exception as e:
+        logger.error(f"Error during shutdown: {e}")
+
+    await bot.close()
+    if not bot_task.done():
+        bot_task.cancel()
+    await asyncio.gather(bot_task, return_exceptions=True)
+    await runner.cleanup()
+    logger.info("👋 Bot y servidor web detenidos")
+    return exit_code
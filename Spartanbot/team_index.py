@@ -0,0 +1,94 @@
+import heapq
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+
+OpenTeam = namedtuple('OpenTeam', 'search_id guild_id platform mode kd_min free_slots')
+
+
+class OpenTeamIndex:
+    """In-memory index of open team searches.
+
+    Searches are bucketed by (guild, platform, mode) and each bucket keeps a list of
+    (kd_min, search_id) sorted by the minimum K/D, holding only teams with free
+    slots. Finding the teams a player can join is then a bisect per bucket
+    instead of a scan over every search. The index is kept up to date
+    incrementally by the handlers that create, join and cancel searches.
+    """
+
+    def __init__(self):
+        self._teams = {}
+        self._buckets = {}
+        self._guild_keys = {}  # guild_id -> bucket keys of that guild
+
+    def __len__(self):
+        return len(self._teams)
+
+    def __contains__(self, search_id):
+        return search_id in self._teams
+
+    def get(self, search_id):
+        return self._teams.get(search_id)
+
+    def add(self, search_id, guild_id, platform, mode, kd_min, free_slots):
+        self.remove(search_id)
+        team = OpenTeam(search_id, guild_id, platform, mode, kd_min or 0.0, free_slots)
+        self._teams[search_id] = team
+        if free_slots > 0:
+            self._insert(team)
+
+    def update_slots(self, search_id, free_slots):
+        team = self._teams.get(search_id)
+        if team is None or team.free_slots == free_slots:
+            return
+        if team.free_slots > 0:
+            self._discard(team)
+        team = team._replace(free_slots=free_slots)
+        self._teams[search_id] = team
+        if free_slots > 0:
+            self._insert(team)
+
+    def remove(self, search_id):
+        team = self._teams.pop(search_id, None)
+        if team is not None and team.free_slots > 0:
+            self._discard(team)
+
+    def clear(self):
+        self._teams.clear()
+        self._buckets.clear()
+        self._guild_keys.clear()
+
+    def eligible(self, kd_ratio, guild_id, platform=None, mode=None):
+        """Open teams of a guild whose minimum K/D is at most kd_ratio, lowest requirement first"""
+        keys = [
+            key for key in self._guild_keys.get(guild_id, ())
+            if (platform is None or key[1] == platform) and (mode is None or key[2] == mode)
+        ]
+        ranges = []
+        for key in keys:
+            bucket = self._buckets[key]
+            ranges.append(bucket[:bisect_right(bucket, kd_ratio, key=lambda entry: entry[0])])
+        return [self._teams[search_id] for _, search_id in heapq.merge(*ranges)]
+
+    def _insert(self, team):
+        key = (team.guild_id, team.platform, team.mode)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = []
+            self._guild_keys.setdefault(team.guild_id, set()).add(key)
+        insort(bucket, (team.kd_min, team.search_id))
+
+    def _discard(self, team):
+        key = (team.guild_id, team.platform, team.mode)
+        bucket = self._buckets.get(key)
+        if not bucket:
+            return
+        entry = (team.kd_min, team.search_id)
+        i = bisect_left(bucket, entry)
+        if i < len(bucket) and bucket[i] == entry:
+            del bucket[i]
+        if not bucket:
+            del self._buckets[key]
+            guild_keys = self._guild_keys[team.guild_id]
+            guild_keys.discard(key)
+            if not guild_keys:
+                del self._guild_keys[team.guild_id]
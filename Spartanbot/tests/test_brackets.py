@@ -0,0 +1,99 @@
+import random
+from collections import Counter
+
+import pytest
+
+from brackets import BYE, GRAND_FINAL, LOSERS, WINNERS, Bracket, seed_order
+
+
+def play_out(bracket, pick=lambda match: match.slots[0]):
+    """Report every playable match until the bracket has a champion, returns the losses per entry"""
+    losses = Counter()
+    while bracket.playable():
+        match = bracket.playable()[0]
+        winner = pick(match)
+        loser = match.slots[1] if match.slots[0] == winner else match.slots[0]
+        bracket.report(match.number, winner)
+        losses[loser] += 1
+    return losses
+
+
+def test_seed_order_keeps_top_seeds_apart():
+    assert seed_order(8) == [1, 8, 4, 5, 2, 7, 3, 6]
+
+
+def test_top_seeds_get_the_byes():
+    bracket = Bracket.build([10, 20, 30, 40, 50])
+    first_round = [match for match in bracket.ordered() if match.bracket == WINNERS and match.round == 1]
+    byes = {match.winner for match in first_round if BYE in match.slots}
+    assert byes == {10, 20, 30}
+    # Seeds 2 and 3 both got a bye, so their second-round match is ready at once
+    assert [match.slots for match in bracket.playable()] == [[40, 50], [20, 30]]
+
+
+def test_single_elimination_with_byes_has_one_champion():
+    bracket = Bracket.build([1, 2, 3])
+    losses = play_out(bracket)
+    assert bracket.champion == 1
+    assert bracket.final.bracket == WINNERS
+    assert losses == Counter({2: 1, 3: 1})
+
+
+def test_double_elimination_routes_losers_and_skips_the_reset():
+    bracket = Bracket.build([1, 2, 3, 4], double=True)
+    (semi_a, semi_b) = bracket.playable()
+    bracket.report(semi_a.number, 1)
+    bracket.report(semi_b.number, 2)
+
+    losers_first = [match for match in bracket.ordered() if match.bracket == LOSERS][0]
+    assert sorted(losers_first.slots) == [3, 4]
+
+    losses = play_out(bracket)
+    # The winners bracket champion wins the grand final, so the reset is decided by a bye
+    reset = bracket.final
+    assert reset.bracket == GRAND_FINAL and reset.round == 2
+    assert BYE in reset.slots
+    assert bracket.champion == 1
+    assert losses[1] == 0
+
+
+def test_double_elimination_plays_the_reset_when_the_losers_side_wins():
+    bracket = Bracket.build([1, 2, 3, 4], double=True)
+    grand_final = [match for match in bracket.ordered() if match.bracket == GRAND_FINAL][0]
+
+    def pick(match):
+        # Entry 1 wins everything except the first grand final and the reset
+        if match.bracket == GRAND_FINAL:
+            return match.slots[1] if match is grand_final else match.slots[0]
+        return 1 if 1 in match.slots else match.slots[0]
+
+    losses = play_out(bracket, pick)
+    assert bracket.final.playable is False
+    assert set(bracket.final.slots) == set(grand_final.slots)
+    assert bracket.champion == grand_final.winner
+    assert losses[1] == 2
+
+
+@pytest.mark.parametrize('double', [False, True])
+@pytest.mark.parametrize('size', range(2, 13))
+def test_every_entry_but_the_champion_is_knocked_out(size, double):
+    bracket = Bracket.build(list(range(1, size + 1)), double=double)
+    rng = random.Random(size)
+    losses = play_out(bracket, lambda match: rng.choice(match.slots))
+
+    champion = bracket.champion
+    assert champion is not None
+    eliminated = 2 if double else 1
+    assert all(losses[entry] == eliminated for entry in range(1, size + 1) if entry != champion)
+    assert losses[champion] < eliminated
+    assert BYE not in losses
+
+
+def test_report_rejects_matches_that_are_not_ready():
+    bracket = Bracket.build([1, 2, 3, 4])
+    final = bracket.final
+    with pytest.raises(ValueError):
+        bracket.report(final.number, 1)
+    semi = bracket.playable()[0]
+    with pytest.raises(ValueError):
+        bracket.report(semi.number, 99)
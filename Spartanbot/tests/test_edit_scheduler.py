@@ -0,0 +1,61 @@
+import asyncio
+
+import discord
+
+from edit_scheduler import EditScheduler
+
+
+class Message:
+    """Sent message as discord.py returns it: the view is only there as action rows"""
+
+    def __init__(self, embed, view):
+        self.id = 1
+        self.embeds = [embed]
+        self.components = [discord.ActionRow(row) for row in view.to_components()]
+        self.edits = []
+
+    async def edit(self, **payload):
+        self.edits.append(payload)
+
+
+def make_view():
+    view = discord.ui.View(timeout=None)
+    view.add_item(discord.ui.Button(label="Inscribirse", custom_id="register", style=discord.ButtonStyle.green))
+    view.add_item(discord.ui.Button(label="Actualizar", custom_id="update"))
+    return view
+
+
+def make_embed(count):
+    embed = discord.Embed(title="🎮 Partida Privada")
+    embed.add_field(name="✅ Jugadores Inscritos", value=str(count), inline=False)
+    return embed
+
+
+async def render_once(count, disable=False):
+    """Schedule one render of a private match message showing 0 players"""
+    view = make_view()
+    message = Message(make_embed(0), view)
+    scheduler = EditScheduler(window=0)
+    for item in view.children:
+        item.disabled = disable
+    scheduler.schedule(message, lambda: {'embed': make_embed(count), 'view': view})
+    await scheduler.drain()
+    return scheduler, message
+
+
+def test_unchanged_render_with_view_is_skipped():
+    scheduler, message = asyncio.run(render_once(0))
+    assert scheduler.skipped == 1
+    assert scheduler.sent == 0
+    assert message.edits == []
+
+
+def test_changed_embed_is_sent():
+    scheduler, message = asyncio.run(render_once(1))
+    assert scheduler.sent == 1
+    assert scheduler.skipped == 0
+
+
+def test_disabled_view_is_sent():
+    scheduler, message = asyncio.run(render_once(0, disable=True))
+    assert scheduler.sent == 1